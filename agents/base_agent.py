@@ -4,6 +4,11 @@ from langchain_core.callbacks import CallbackManagerForLLMRun
 from langchain_core.pydantic_v1 import Field
 from langchain_core.outputs import LLMResult
 from config.settings import settings
+from knowledge_base.token_budget import count_tokens, compress_text, format_input, get_budget
+from evaluation.instrumentation import timed
+from agents.rate_limiter import deepseek_limiter
+from agents.model_router import model_router, route_hint
+from config.settings import ModelProvider
 from typing import Any, Dict, List, Optional, Union, Iterator
 import requests
 import logging
@@ -23,6 +28,7 @@ class DeepSeekLLM(BaseLLM):
     max_tokens: int = 2048
     api_base: str = "https://api.deepseek.com/v1"
     request_timeout: int = 30
+    rate_limited: bool = True  # 本地模型不占用DeepSeek配额
 
     @property
     def _llm_type(self) -> str:
@@ -47,6 +53,7 @@ class DeepSeekLLM(BaseLLM):
         return LLMResult(generations=[[{"text": r} for r in responses]])
 
     @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=2, max=10))
+    @timed("llm", "deepseek")
     def _call(
             self,
             prompt: str,
@@ -66,6 +73,9 @@ class DeepSeekLLM(BaseLLM):
             "max_tokens": self.max_tokens,
             **kwargs
         }
+        estimated = count_tokens(prompt)
+        if self.rate_limited:
+            deepseek_limiter.acquire(estimated)
         try:
             response = requests.post(
                 f"{self.api_base}/chat/completions",
@@ -73,8 +83,16 @@ class DeepSeekLLM(BaseLLM):
                 json=payload,
                 timeout=self.request_timeout
             )
+            if response.status_code == 429 and self.rate_limited:
+                deepseek_limiter.on_rate_limited(
+                    deepseek_limiter.parse_retry_after(response.headers.get("Retry-After"))
+                )
             response.raise_for_status()
-            return response.json()["choices"][0]["message"]["content"]
+            data = response.json()
+            if self.rate_limited:
+                usage = data.get("usage") or {}
+                deepseek_limiter.record_usage(estimated, usage.get("total_tokens", estimated))
+            return data["choices"][0]["message"]["content"]
         except requests.exceptions.RequestException as e:
             logger.error(f"DeepSeek API 请求失败: {str(e)}")
             raise
@@ -83,6 +101,46 @@ class DeepSeekLLM(BaseLLM):
             raise ValueError("无效的 API 响应")
 
 
+class RoutedLLM(DeepSeekLLM):
+    """
+    路由版 DeepSeek LLM：简单步骤走本地模型（不重试，失败立即回退），复杂步骤走 DeepSeek
+    """
+    local_llm: DeepSeekLLM
+    hint: Optional[str] = None  # "simple"/"complex"，已知步骤类型时跳过分类
+
+    @property
+    def _llm_type(self) -> str:
+        return "deepseek-routed"
+
+    def _call(
+            self,
+            prompt: str,
+            stop: Optional[List[str]] = None,
+            run_manager: Optional[CallbackManagerForLLMRun] = None,
+            **kwargs: Any,
+    ) -> str:
+        local_call = DeepSeekLLM._call.retry_with(stop=stop_after_attempt(1))
+        return model_router.route(
+            prompt,
+            local=lambda: local_call(self.local_llm, prompt, stop=stop, **kwargs),
+            remote=lambda: DeepSeekLLM._call(self, prompt, stop=stop, run_manager=run_manager, **kwargs),
+            hint=self.hint
+        )
+
+
+def build_local_llm() -> DeepSeekLLM:
+    """本地 OpenAI 兼容模型服务（如 llama.cpp server）"""
+    return DeepSeekLLM(
+        api_key="local",
+        api_base=settings.LOCAL_LLM_BASE,
+        model=settings.LOCAL_LLM_MODEL,
+        temperature=settings.LLM_TEMPERATURE,
+        max_tokens=settings.LLM_MAX_TOKENS,
+        request_timeout=settings.LOCAL_LLM_TIMEOUT,
+        rate_limited=False
+    )
+
+
 class BaseAgent:
     """
     Agent 基类（DeepSeek 版本）
@@ -92,33 +150,44 @@ class BaseAgent:
     - 集成日志和错误处理
     """
 
-    def __init__(self, name: str, system_prompt: str):
+    def __init__(self, name: str, system_prompt: str, route: Optional[str] = None):
         """
         :param name: Agent 名称（用于日志标识）
         :param system_prompt: 系统角色设定提示词
+        :param route: 步骤路由提示（"simple"/"complex"，启用 USE_LOCAL_LLM 时生效，为空时按用户消息自动判断）
         """
         self.name = name
+        self.route = route
         self.llm = self._init_llm()
         self.prompt = ChatPromptTemplate.from_messages([
             ("system", system_prompt),
             ("user", "{input}")
         ])
+        self.system_tokens = count_tokens(system_prompt)
+        self.token_budget = get_budget(name)
 
     def _init_llm(self) -> BaseLLM:
-        """初始化 DeepSeek LLM"""
+        """初始化 LLM（启用 USE_LOCAL_LLM 时按步骤复杂度路由到本地模型）"""
+        if settings.MODEL_PROVIDER == ModelProvider.LOCAL:
+            return build_local_llm()
         if not settings.DEEPSEEK_API_KEY:
             raise ValueError("未配置 DEEPSEEK_API_KEY")
-        return DeepSeekLLM(
+        params = dict(
             api_key=settings.DEEPSEEK_API_KEY,
+            api_base=settings.DEEPSEEK_API_BASE,
             model=settings.LLM_MODEL,
             temperature=settings.LLM_TEMPERATURE,
             max_tokens=settings.LLM_MAX_TOKENS
         )
+        if settings.USE_LOCAL_LLM:
+            return RoutedLLM(local_llm=build_local_llm(), **params)
+        return DeepSeekLLM(**params)
 
-    def run(self, input_data: Union[str, Dict[str, Any]]) -> Dict[str, Any]:
+    def run(self, input_data: Union[str, Dict[str, Any]], route: Optional[str] = None) -> Dict[str, Any]:
         """
         执行 Agent 任务
         :param input_data: 输入数据（字符串或字典）
+        :param route: 本次步骤的路由提示（默认取 Agent 的路由提示）
         :return: 标准化输出 {
             "output": str,
             "metadata": dict,
@@ -126,21 +195,22 @@ class BaseAgent:
         }
         """
         try:
-            if isinstance(input_data, dict):
-                input_str = str(input_data)
-            else:
-                input_str = input_data
+            input_str = self._prepare_input(input_data)
+            prompt_tokens = self.system_tokens + count_tokens(input_str)
 
             # 构造调用链
             chain = self.prompt | self.llm
-            response = chain.invoke({"input": input_str})
+            with route_hint(route or self.route):
+                response = chain.invoke({"input": input_str})
 
             self._log_success(input_str, response)
             return {
                 "output": response,
                 "metadata": {
                     "model": settings.LLM_MODEL,
-                    "agent": self.name
+                    "agent": self.name,
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": count_tokens(response)
                 }
             }
         except Exception as e:
@@ -151,14 +221,31 @@ class BaseAgent:
                 "metadata": {}
             }
 
+    def _prepare_input(self, input_data: Union[str, Dict[str, Any]]) -> str:
+        """格式化输入并压缩至 Agent 的 token 预算以内"""
+        input_str = format_input(input_data)
+        available = self.token_budget - self.system_tokens
+        if available < settings.MIN_INPUT_TOKENS:
+            logger.warning(
+                "Agent [%s] 系统提示词 (%d tokens) 已接近或超出预算 %d，输入按下限 %d tokens 保留",
+                self.name, self.system_tokens, self.token_budget, settings.MIN_INPUT_TOKENS
+            )
+            available = settings.MIN_INPUT_TOKENS
+        input_tokens = count_tokens(input_str)
+        if input_tokens > available:
+            input_str = compress_text(input_str, available)
+            logger.info(
+                "Agent [%s] 输入超出预算，已压缩: %d -> %d tokens",
+                self.name, input_tokens, count_tokens(input_str)
+            )
+        return input_str
+
     def _log_success(self, input_data: str, output: str):
-        """记录成功日志"""
-        logger.info(
-            f"\n=== Agent [{self.name}] 执行完成 ===\n"
-            f"输入: {input_data[:200]}...\n"
-            f"输出: {output[:300]}...\n"
-            f"模型: {settings.LLM_MODEL}\n"
-            "=" * 50
+        """记录成功日志（DEBUG 级别采样输出，截断与格式化仅在记录时执行）"""
+        logger.debug(
+            "Agent [%s] 执行完成, 模型: %s\n输入: %.200s...\n输出: %.300s...",
+            self.name, settings.LLM_MODEL, input_data, output,
+            extra={"agent": self.name}
         )
 
 
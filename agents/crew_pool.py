@@ -0,0 +1,156 @@
+"""
+Crew 实例池：
+1. Crew/Agent/Task 均为可变对象，kickoff 期间会写入任务输出与重试计数，同一实例不能并发使用
+2. 池内实例按需创建（不超过上限），归还时重置运行状态，避免每个请求重新构建
+3. 取出/归还时做健康检查：执行异常、结构不完整或复用次数达到上限的实例直接丢弃
+"""
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Deque, Dict, Iterable, Optional
+
+from config.settings import settings
+from evaluation.instrumentation import registry
+
+logger = logging.getLogger(__name__)
+
+# 单次 kickoff 写入的任务状态及其初始值
+_TASK_STATE = {
+    "output": None,
+    "used_tools": 0,
+    "tools_errors": 0,
+    "delegations": 0,
+    "retry_count": 0,
+    "start_time": None,
+    "end_time": None,
+}
+
+
+class CrewPool:
+    def __init__(
+            self,
+            factory: Callable[[], object],
+            size: int = settings.CREW_POOL_SIZE,
+            acquire_timeout: float = settings.CREW_POOL_ACQUIRE_TIMEOUT,
+            max_uses: int = settings.CREW_POOL_MAX_USES,
+            seed: Iterable[object] = ()
+    ):
+        """
+        :param factory: 构建新 crew 实例的函数
+        :param size: 实例数上限（即单进程内可并行的分析数）
+        :param seed: 已构建好的实例，直接放入池中
+        """
+        self.factory = factory
+        self.size = max(1, size)
+        self.acquire_timeout = acquire_timeout
+        self.max_uses = max_uses
+        self._idle: Deque[object] = deque()
+        self._uses: Dict[int, int] = {}
+        self._created = 0
+        self._cond = threading.Condition()
+        for crew in list(seed)[:self.size]:
+            self._register(crew)
+            self._idle.append(crew)
+
+    def _register(self, crew):
+        self._uses[id(crew)] = 0
+        self._created += 1
+
+    def _discard(self, crew, reason: str):
+        self._uses.pop(id(crew), None)
+        self._created -= 1
+        logger.info(f"丢弃crew实例: {reason}")
+
+    def _healthy(self, crew) -> bool:
+        agents = getattr(crew, "agents", None)
+        tasks = getattr(crew, "tasks", None)
+        return bool(agents) and bool(tasks) and all(
+            getattr(task, "agent", None) is not None for task in tasks
+        ) and all(getattr(agent, "llm", None) is not None for agent in agents)
+
+    @staticmethod
+    def reset(crew) -> None:
+        """清除上一次 kickoff 留下的任务状态与工具使用计数"""
+        for task in crew.tasks:
+            for name, value in _TASK_STATE.items():
+                if hasattr(task, name):
+                    setattr(task, name, value)
+        for agent in crew.agents:
+            for tool in getattr(agent, "tools", None) or []:
+                if hasattr(tool, "current_usage_count"):
+                    tool.current_usage_count = 0
+
+    def _update_gauges(self):
+        registry.set_gauge("crew_pool_instances", self._created, help_text="已创建的crew实例数")
+        registry.set_gauge("crew_pool_idle", len(self._idle), help_text="空闲的crew实例数")
+
+    def _checkout(self, timeout: Optional[float]):
+        """取出空闲实例；无空闲且未达上限时返回 None，由调用方在锁外构建"""
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        with self._cond:
+            while True:
+                while self._idle:
+                    crew = self._idle.pop()
+                    if self._healthy(crew):
+                        return crew
+                    self._discard(crew, "健康检查未通过")
+                if self._created < self.size:
+                    self._created += 1  # 预占名额
+                    return None
+                remaining = deadline - time.monotonic() if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError(f"等待crew实例超时（{timeout}秒，上限 {self.size} 个）")
+                self._cond.wait(remaining)
+
+    def _build(self):
+        try:
+            crew = self.factory()
+        except Exception:
+            with self._cond:
+                self._created -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._uses[id(crew)] = 0
+        logger.info(f"新建crew实例（当前 {self._created}/{self.size}）")
+        return crew
+
+    def _checkin(self, crew, failed: bool):
+        with self._cond:
+            self._uses[id(crew)] = self._uses.get(id(crew), 0) + 1
+            if failed:
+                self._discard(crew, "执行异常")
+            elif self._uses[id(crew)] >= self.max_uses:
+                self._discard(crew, f"已复用 {self.max_uses} 次")
+            else:
+                try:
+                    self.reset(crew)
+                    self._idle.append(crew)
+                except Exception as e:
+                    self._discard(crew, f"重置失败: {e}")
+            self._update_gauges()
+            self._cond.notify()
+
+    @contextmanager
+    def acquire(self, timeout: Optional[float] = None):
+        """独占一个 crew 实例，退出时归还"""
+        start = time.perf_counter()
+        crew = self._checkout(self.acquire_timeout if timeout is None else timeout)
+        if crew is None:
+            crew = self._build()
+        registry.observe("crew_pool_wait_seconds", time.perf_counter() - start,
+                         help_text="获取crew实例的等待时间（秒）")
+        with self._cond:
+            self._update_gauges()
+        failed = True
+        try:
+            yield crew
+            failed = False
+        finally:
+            self._checkin(crew, failed)
+
+    def stats(self) -> Dict[str, int]:
+        with self._cond:
+            return {"size": self.size, "created": self._created, "idle": len(self._idle)}
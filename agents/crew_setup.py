@@ -1,10 +1,16 @@
 from crewai import Agent, Task, Crew, LLM
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Union
 from pydantic import BaseModel, Field
 import logging
 from crewai.tools import tool
 from datetime import datetime
 import os
+from config.settings import settings
+from knowledge_base.token_budget import compress_observation, count_tokens
+from evaluation.instrumentation import timed
+from agents.rate_limiter import deepseek_limiter
+from agents.model_router import model_router, user_turn
+from agents.prefetch import load_financials, search_knowledge
 logger = logging.getLogger(__name__)
 
 
@@ -29,22 +35,20 @@ def query_knowledge_base(question: str) -> List[Dict]:
     Returns:
         List[Dict]: 查询结果列表
     """
-    from knowledge_base.retriever import retriever
-    return retriever.query(question)
+    return search_knowledge(question)
 
 
 @tool
-def fetch_financial_data(company_code: str) -> Dict:
+def fetch_financial_data(company_code: str) -> Union[Dict, str]:
     """获取公司财务数据工具
 
     Args:
         company_code (str): 公司股票代码
 
     Returns:
-        Dict: 财务数据字典
+        Union[Dict, str]: 财务数据字典；超出 TOOL_OUTPUT_MAX_TOKENS 时为压缩后的文本
     """
-    from tools.wind_tools import get_company_financials
-    return get_company_financials(company_code)
+    return compress_observation(load_financials(company_code))
 
 
 # 设置工具属性
@@ -52,46 +56,124 @@ query_knowledge_base.result_as_answer = True
 query_knowledge_base.max_usage_count = 10
 
 
-# ----------------------------
-# 创建Agent和Crew（完全兼容Task类规范）
-# ----------------------------
-def setup_agents_and_crew() -> Crew:
-    LLM_DS = LLM(
+def log_step_tokens(step_output) -> None:
+    """记录每个Agent步骤的token数（CrewAI step_callback）"""
+    text = getattr(step_output, "text", None) or str(step_output)
+    logger.info("Agent步骤完成: %s, tokens=%d", type(step_output).__name__, count_tokens(text))
+
+
+def _messages_text(messages) -> str:
+    return messages if isinstance(messages, str) else "\n".join(str(m.get("content", "")) for m in messages)
+
+
+class CrewLLM(LLM):
+    """CrewAI LLM（增加调用耗时埋点，与 DeepSeekLLM 共享跨进程限流）"""
+    rate_limited = True
+
+    def call(self, messages, *args, **kwargs):
+        if not self.rate_limited:
+            with timed("llm", self.model):
+                return super().call(messages, *args, **kwargs)
+        estimated = count_tokens(_messages_text(messages))
+        deepseek_limiter.acquire(estimated)
+        try:
+            with timed("llm", self.model):
+                result = super().call(messages, *args, **kwargs)
+        except Exception as e:
+            if getattr(e, "status_code", None) == 429:
+                headers = getattr(getattr(e, "response", None), "headers", None) or {}
+                deepseek_limiter.on_rate_limited(deepseek_limiter.parse_retry_after(headers.get("retry-after")))
+            raise
+        deepseek_limiter.record_usage(estimated, estimated + count_tokens(str(result)))
+        return result
+
+
+class RoutedCrewLLM(CrewLLM):
+    """按步骤复杂度路由：简单步骤走本地模型，失败回退 DeepSeek"""
+
+    def __init__(self, *args, local_llm: CrewLLM = None, hint: Optional[str] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.local_llm = local_llm
+        self.hint = hint
+
+    def call(self, messages, *args, **kwargs):
+        if self.local_llm is None:
+            return super().call(messages, *args, **kwargs)
+        return model_router.route(
+            _messages_text(messages),
+            local=lambda: self.local_llm.call(messages, *args, **kwargs),
+            remote=lambda: CrewLLM.call(self, messages, *args, **kwargs),
+            hint=self.hint,
+            step=user_turn(messages)
+        )
+
+
+def build_crew_llm(hint: Optional[str] = None) -> CrewLLM:
+    """构建 Crew 使用的 LLM（启用 USE_LOCAL_LLM 时附带本地路由）"""
+    local_llm = None
+    if settings.USE_LOCAL_LLM:
+        local_llm = CrewLLM(
+            model=f"openai/{settings.LOCAL_LLM_MODEL}",
+            base_url=settings.LOCAL_LLM_BASE,
+            api_key="local",
+            timeout=settings.LOCAL_LLM_TIMEOUT,
+            stream=False,
+        )
+        local_llm.rate_limited = False
+    return RoutedCrewLLM(
         model='openai/deepseek-chat',
-        base_url='https://api.deepseek.com/v1',
+        base_url=settings.DEEPSEEK_API_BASE,
         api_key=os.getenv("DEEPSEEK_API_KEY"),
         stream=False,
+        local_llm=local_llm,
+        hint=hint
     )
+
+
+# ----------------------------
+# 创建Agent和Crew（完全兼容Task类规范）
+# ----------------------------
+def setup_agents_and_crew() -> Crew:
+    # 研究与审查任务均为分析/校验步骤，固定走 DeepSeek
+    LLM_DS = build_crew_llm(hint="complex")
+    # 工具参数整理等格式化步骤优先走本地模型
+    LLM_TOOLS = build_crew_llm(hint="simple") if settings.USE_LOCAL_LLM else None
+    # 工具带使用计数，每个crew实例持有独立副本（见 agents/crew_pool.py）
+    kb_tool = query_knowledge_base.model_copy()
+    financial_tool = fetch_financial_data.model_copy()
     # 定义Agents（包含所有必填字段）
     research_agent = Agent(
         role="行业研究员",
         goal="生成准确的行业分析报告",
         backstory="资深金融分析师，擅长挖掘行业数据",
-        tools=[query_knowledge_base, fetch_financial_data],
+        tools=[kb_tool, financial_tool],
         verbose=True,
         allow_delegation=False,
         max_iter=15,
-        max_rpm=10,
         llm=LLM_DS,
+        function_calling_llm=LLM_TOOLS,
         allow_code_execution=False,
-        respect_context_window=True
+        respect_context_window=True,
+        step_callback=log_step_tokens
     )
 
     review_agent = Agent(
         role="风控专家",
         goal="确保报告数据准确性",
         backstory="前四大会计师事务所审计师",
-        tools=[query_knowledge_base],
+        tools=[kb_tool],
         verbose=True,
         max_iter=15,
-        max_rpm=10,
         llm=LLM_DS,
-        allow_code_execution=False
+        function_calling_llm=LLM_TOOLS,
+        allow_code_execution=False,
+        respect_context_window=True,
+        step_callback=log_step_tokens
     )
 
     # 定义Tasks（完整参数配置）
     research_task = Task(
-        description="分析{company}在{industry}行业的表现",
+        description="分析{company}（证券代码：{company_code}）在{industry}行业的表现",
         expected_output="完整的Markdown格式分析报告",
         agent=research_agent,
         human_input=False,
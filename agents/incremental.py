@@ -0,0 +1,132 @@
+"""
+增量分析：
+1. 采集本次分析的输入（万得财务数据、知识库文档）并计算指纹
+2. 与报告库中上一版本的指纹对比，找出受影响的章节
+3. 仅对受影响章节重新调用Agent，其余章节沿用上一版本
+4. 获取失败的输入、重新生成失败章节所依赖的输入沿用上一版本指纹，下次分析时重试
+"""
+import logging
+from typing import Any, Callable, Dict, List, Optional
+
+from config.settings import settings
+from .base_agent import BaseAgent
+from .prefetch import load_financials, search_knowledge
+from .report_model import Report, ReportSection
+from knowledge_base.report_store import ReportStore, fingerprint, report_store
+
+logger = logging.getLogger(__name__)
+
+SECTION_PROMPT = (
+    "你是一名资深行业分析师。根据提供的最新数据，重写分析报告中的指定章节。"
+    "只输出该章节正文（Markdown），不要输出章节标题，禁止虚构数据，必须标注数据来源。"
+)
+
+
+def collect_inputs(company: str, industry: str, company_code: Optional[str] = None) -> Dict[str, Any]:
+    """采集报告依赖的外部输入（获取失败的输入不包含在结果中）"""
+    inputs: Dict[str, Any] = {}
+    financials = load_financials(company_code) if company_code else {}
+    if isinstance(financials, dict) and financials.get("error"):
+        logger.warning(f"财务数据获取失败，沿用上一版本: {company}({company_code}) {financials['error']}")
+    else:
+        inputs["financials"] = financials
+    # 与研究Agent的工具调用使用相同参数，请求内共享预取结果
+    inputs["knowledge"] = [chunk for question in (company, industry)
+                           for chunk in search_knowledge(question)]
+    return inputs
+
+
+def input_fingerprints(inputs: Dict[str, Any]) -> Dict[str, str]:
+    """计算各输入指纹（知识库片段与顺序无关）"""
+    fingerprints = {}
+    if "financials" in inputs:
+        fingerprints["financials"] = fingerprint(inputs["financials"])
+    if "knowledge" in inputs:
+        fingerprints["knowledge"] = fingerprint(
+            sorted(fingerprint(c.get("content", "")) for c in inputs["knowledge"]))
+    return fingerprints
+
+
+def _keep_previous(fingerprints: Dict[str, str], previous: Dict[str, str], names) -> None:
+    """指定输入沿用上一版本指纹（上一版本没有的直接去掉，下次视为新增）"""
+    for name in names:
+        if name in previous:
+            fingerprints[name] = previous[name]
+        else:
+            fingerprints.pop(name, None)
+
+
+class IncrementalAnalyzer(BaseAgent):
+    def __init__(self, store: ReportStore = report_store):
+        super().__init__(name="增量分析Agent", system_prompt=SECTION_PROMPT, route="complex")
+        self.store = store
+
+    def refresh_sections(self, report: Report, sections: List[str],
+                         inputs: Dict[str, Any], company: str, industry: str) -> List[str]:
+        """重新生成指定章节，返回实际更新的章节"""
+        updated = []
+        for title in sections:
+            deps = settings.REPORT_SECTION_INPUTS.get(title, list(inputs))
+            section = report.find_section(title)
+            response = self.run({
+                "公司": company,
+                "行业": industry,
+                "章节": title,
+                "上一版本内容": section.text if section else "",
+                **{f"最新数据[{name}]": inputs[name] for name in deps if name in inputs}
+            }, route=settings.REPORT_SECTION_ROUTES.get(title, "complex"))
+            if response.get("error") or not response["output"]:
+                logger.warning(f"章节重新生成失败: {title}")
+                continue
+            if section is None:
+                report.sections.append(ReportSection(title=title, level=2,
+                                                     body=response["output"].strip("\n").splitlines()))
+            else:
+                report.replace_section(section.title, response["output"])
+            updated.append(title)
+        return updated
+
+    def analyze(self, company: str, industry: str, company_code: Optional[str],
+                full_run: Callable[[], str], incremental: bool = True) -> Dict:
+        """
+        执行分析并保存新版本
+        :param full_run: 完整分析（如 crew.kickoff），无可复用版本时调用
+        :return: {"report": str, "mode": "full"|"incremental"|"reused",
+                  "sections": List[str], "version": str}
+        """
+        inputs = collect_inputs(company, industry, company_code)
+        fingerprints = input_fingerprints(inputs)
+        previous = self.store.latest(company, industry) if incremental else None
+
+        if previous is None:
+            text, mode, sections = full_run(), "full", []
+        else:
+            # 本次未获取到的输入视为未变化
+            _keep_previous(fingerprints, previous["fingerprints"],
+                           set(previous["fingerprints"]) - set(fingerprints))
+            changed = ReportStore.changed_inputs(previous["fingerprints"], fingerprints)
+            affected = ReportStore.affected_sections(changed)
+            sections = []
+            if affected:
+                logger.info(f"增量分析 {company}: 输入变化={sorted(changed)}, 重新生成章节={affected}")
+                report = Report.parse(previous["report"])
+                sections = self.refresh_sections(report, affected, inputs, company, industry)
+                failed = [title for title in affected if title not in sections]
+                _keep_previous(fingerprints, previous["fingerprints"],
+                               {name for title in failed
+                                for name in settings.REPORT_SECTION_INPUTS.get(title, list(inputs))})
+            if sections:
+                text, mode = report.render(), "incremental"
+            else:
+                text, mode = previous["report"], "reused"
+
+        if mode == "reused":
+            version = previous["version"]
+        else:
+            version = self.store.save(company, industry, text, fingerprints, {
+                "mode": mode,
+                "sections": sections,
+                "base_version": previous["version"] if previous else None,
+                "company_code": company_code
+            })["version"]
+        return {"report": text, "mode": mode, "sections": sections, "version": version}
@@ -0,0 +1,107 @@
+"""
+模型路由：
+1. 按步骤复杂度（最后一条用户消息，系统提示词与角色设定不参与）将步骤分为简单/复杂，调用方可显式指定
+2. 简单步骤发往本地 CPU 模型（llama.cpp 等 OpenAI 兼容服务），失败时回退到远程 deepseek-chat
+3. 按路由记录延迟，并估算节省的 DeepSeek 费用
+"""
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Union
+
+from config.settings import settings
+from evaluation.instrumentation import registry
+from knowledge_base.token_budget import count_tokens
+
+logger = logging.getLogger(__name__)
+
+LOCAL, REMOTE = "local", "remote"
+
+_route_hint: ContextVar[Optional[str]] = ContextVar("route_hint", default=None)
+
+
+@contextmanager
+def route_hint(hint: Optional[str]):
+    """在当前步骤范围内指定路由（"simple"/"complex"），LLM 未显式指定时生效"""
+    token = _route_hint.set(hint)
+    try:
+        yield
+    finally:
+        _route_hint.reset(token)
+
+
+def user_turn(prompt: Union[str, List[Dict]]) -> str:
+    """
+    提取最后一条用户消息
+    字符串提示词为 LangChain 对话模板格式（"System: ...\nHuman: ..."），消息列表取最后一条 user 消息
+    """
+    if isinstance(prompt, str):
+        idx = prompt.rfind("Human: ")
+        return prompt[idx + len("Human: "):] if idx >= 0 else prompt
+    for message in reversed(prompt):
+        if message.get("role") == "user":
+            return str(message.get("content", ""))
+    return ""
+
+
+class ModelRouter:
+    def __init__(
+            self,
+            simple_max_tokens: int = settings.ROUTER_SIMPLE_MAX_TOKENS,
+            complex_keywords=None,
+            enabled: bool = settings.USE_LOCAL_LLM
+    ):
+        self.simple_max_tokens = simple_max_tokens
+        self.complex_keywords = complex_keywords or settings.ROUTER_COMPLEX_KEYWORDS
+        self.enabled = enabled
+
+    def classify(self, prompt: str, hint: Optional[str] = None, step: Optional[str] = None) -> str:
+        """
+        判断步骤应走的路由
+        :param hint: 调用方已知的步骤类型（"simple" 直接走本地，"complex" 直接走远程），默认取 route_hint 上下文
+        :param step: 用于关键词判断的步骤文本（默认为提示词中最后一条用户消息）
+        """
+        hint = hint or _route_hint.get()
+        if not self.enabled or hint == "complex":
+            return REMOTE
+        if hint == "simple":
+            return LOCAL
+        if count_tokens(prompt) > self.simple_max_tokens:  # 完整提示词超出本地模型处理能力
+            return REMOTE
+        step = user_turn(prompt) if step is None else step
+        if any(kw in step for kw in self.complex_keywords):
+            return REMOTE
+        return LOCAL
+
+    def route(self, prompt: str, local: Callable[[], str], remote: Callable[[], str],
+              hint: Optional[str] = None, step: Optional[str] = None) -> str:
+        """按分类调用本地或远程模型，本地失败时回退远程"""
+        if self.classify(prompt, hint, step) == LOCAL:
+            start = time.perf_counter()
+            try:
+                result = local()
+                self._record(LOCAL, time.perf_counter() - start, prompt, result)
+                return result
+            except Exception as e:
+                logger.warning(f"本地模型调用失败，回退到远程模型: {e}")
+                registry.inc("llm_route_fallback_total", help_text="本地模型失败回退次数")
+
+        start = time.perf_counter()
+        result = remote()
+        self._record(REMOTE, time.perf_counter() - start, prompt, result)
+        return result
+
+    @staticmethod
+    def _record(route: str, duration: float, prompt: str, result) -> None:
+        registry.observe("llm_route_duration_seconds", duration, {"route": route},
+                         help_text="按路由统计的LLM调用耗时（秒）")
+        registry.inc("llm_route_total", labels={"route": route}, help_text="按路由统计的LLM调用次数")
+        if route == LOCAL:
+            price = settings.DEEPSEEK_PRICE_PER_M_TOKENS
+            saved = (count_tokens(prompt) * price["input"] + count_tokens(str(result)) * price["output"]) / 1e6
+            registry.inc("llm_route_saved_cost_cny", saved, help_text="本地路由节省的DeepSeek费用估算（元）")
+
+
+# 单例模式
+model_router = ModelRouter()
@@ -0,0 +1,39 @@
+"""
+研究Agent工具的推测预取：
+请求到达时即可确定 Agent 几乎必然发起的工具调用（财务数据、公司/行业知识库检索），
+在 LLM 规划首个步骤的同时并发执行，Agent 实际调用时直接命中请求级备忘录。
+"""
+import logging
+from typing import Dict, List, Optional
+
+from config.settings import settings
+from .request_memo import RequestMemo, memoized
+from evaluation.instrumentation import timed
+
+logger = logging.getLogger(__name__)
+
+
+@memoized("query_knowledge_base")
+def search_knowledge(question: str) -> List[Dict]:
+    """知识库检索（query_knowledge_base 工具的实现）"""
+    from knowledge_base.retriever import retriever
+    with timed("tool", "query_knowledge_base"):
+        return retriever.query(question, max_tokens=settings.RETRIEVAL_TOKEN_BUDGET)
+
+
+@memoized("fetch_financial_data")
+def load_financials(company_code: str) -> Dict:
+    """万得财务数据（fetch_financial_data 工具的实现，返回原始数据，压缩在工具出口进行）"""
+    from tools.wind_tools import get_company_financials
+    with timed("tool", "fetch_financial_data"):
+        return get_company_financials.invoke(company_code)
+
+
+def prefetch_analysis_inputs(memo: RequestMemo, company: str, industry: str,
+                             company_code: Optional[str] = None) -> None:
+    """提交研究Agent大概率会用到的工具调用"""
+    if company_code:
+        memo.prefetch(load_financials, company_code)
+    for question in (company, industry):
+        memo.prefetch(search_knowledge, question)
+    logger.info(f"已预取 {company}({company_code or '-'}) / {industry} 的工具调用")
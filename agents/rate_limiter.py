@@ -0,0 +1,120 @@
+"""
+DeepSeek 跨进程自适应限流：
+1. 请求数/分钟与 token 数/分钟双令牌桶，状态保存在本地文件，多个 uvicorn worker 共享
+2. 文件锁（fcntl.flock）保证多进程并发更新一致
+3. 收到 429 时按 Retry-After 暂停全部进程并下调速率，成功后逐步恢复（AIMD）
+"""
+import fcntl
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from typing import Dict, Optional
+
+from config.settings import Settings
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimitTimeout(TimeoutError):
+    """等待配额超时"""
+
+
+class SharedRateLimiter:
+    def __init__(
+            self,
+            name: str = "deepseek",
+            rpm: int = Settings.DEEPSEEK_RPM,
+            tpm: int = Settings.DEEPSEEK_TPM,
+            state_dir: str = Settings.RATE_LIMIT_STATE_DIR,
+            max_wait: float = Settings.RATE_LIMIT_MAX_WAIT_SEC
+    ):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.max_wait = max_wait
+        Path(state_dir).mkdir(parents=True, exist_ok=True)
+        self.path = Path(state_dir) / f"{name}.json"
+        self.lock_path = Path(state_dir) / f"{name}.lock"
+
+    @contextmanager
+    def _state(self):
+        """在文件锁内读取并回写限流状态"""
+        with open(self.lock_path, "a+") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                try:
+                    state = json.loads(self.path.read_text())
+                except (FileNotFoundError, ValueError):
+                    state = {"requests": self.rpm, "tokens": self.tpm, "updated": time.time(),
+                             "blocked_until": 0.0, "factor": 1.0}
+                yield state
+                tmp = self.path.with_suffix(f".{os.getpid()}.tmp")
+                tmp.write_text(json.dumps(state))
+                tmp.replace(self.path)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _refill(self, state: Dict, now: float):
+        elapsed = max(0.0, now - state["updated"])
+        factor = state["factor"]
+        state["requests"] = min(self.rpm, state["requests"] + elapsed * self.rpm / 60 * factor)
+        state["tokens"] = min(self.tpm, state["tokens"] + elapsed * self.tpm / 60 * factor)
+        state["updated"] = now
+
+    def acquire(self, tokens: int = 0):
+        """阻塞直到获得 1 次请求与 tokens 个 token 的配额"""
+        tokens = min(tokens, self.tpm)
+        deadline = time.time() + self.max_wait
+        while True:
+            with self._state() as state:
+                now = time.time()
+                self._refill(state, now)
+                wait = state["blocked_until"] - now
+                if wait <= 0:
+                    if state["requests"] >= 1 and state["tokens"] >= tokens:
+                        state["requests"] -= 1
+                        state["tokens"] -= tokens
+                        return
+                    rate = state["factor"] / 60
+                    wait = max((1 - state["requests"]) / (self.rpm * rate),
+                               (tokens - state["tokens"]) / (self.tpm * rate))
+            if time.time() + wait > deadline:
+                raise RateLimitTimeout(f"等待DeepSeek配额超时（需等待{wait:.1f}s）")
+            time.sleep(min(max(wait, 0.05), 1.0))
+
+    def record_usage(self, estimated: int, actual: int):
+        """按实际 token 用量修正预扣的 token 配额，并缓慢恢复速率"""
+        with self._state() as state:
+            state["tokens"] = min(self.tpm, state["tokens"] - (actual - estimated))
+            state["factor"] = min(1.0, state["factor"] + 0.05)
+
+    def on_rate_limited(self, retry_after: Optional[float] = None):
+        """收到 429：全部进程暂停至 Retry-After，并下调速率"""
+        with self._state() as state:
+            now = time.time()
+            pause = retry_after if retry_after is not None else 60 / max(self.rpm * state["factor"], 1)
+            state["blocked_until"] = max(state["blocked_until"], now + pause)
+            state["factor"] = max(0.1, state["factor"] * 0.5)
+            state["requests"] = 0
+            logger.warning("DeepSeek限流(429)，暂停 %.1fs，速率系数降至 %.2f", pause, state["factor"])
+
+    @staticmethod
+    def parse_retry_after(value: Optional[str]) -> Optional[float]:
+        """解析 Retry-After 头（秒数或 HTTP 日期）"""
+        if value is None:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+
+# 单例模式
+deepseek_limiter = SharedRateLimiter()
@@ -1,7 +1,11 @@
 from .base_agent import BaseAgent
+from .report_model import Report
 from tools.report_tools import ReportTools
+import logging
 import yaml
-from typing import Dict
+from typing import Any, Dict, Union
+
+logger = logging.getLogger(__name__)
 
 with open("config/prompts/report_agent.yaml") as f:
     prompt_config = yaml.safe_load(f)
@@ -11,7 +15,8 @@ class ReportAgent(BaseAgent):
     def __init__(self):
         super().__init__(
             name="报告生成Agent",
-            system_prompt=prompt_config["system_prompt"]
+            system_prompt=prompt_config["system_prompt"],
+            route="complex"
         )
         self.tools = [
             ReportTools().generate_chart,
@@ -34,23 +39,53 @@ class ReportAgent(BaseAgent):
             **prompt_vars
         })
 
+        # 只解析一次，各版本均为章节树的视图
+        report = Report.parse(result["output"])
         return {
-            "professional": self._format_report(result["output"], "专业版"),
-            "executive": self._extract_summary(result["output"]),
-            "investor": self._add_disclaimer(result["output"])
+            "professional": report.professional("专业版"),
+            "executive": report.executive(),
+            "investor": report.investor(),
+            "structured": report.to_dict()
         }
 
-    def _format_report(self, raw: str, version: str) -> str:
-        """按版本格式化报告"""
-        # 实际实现应更复杂，这里简化为添加版本头
-        return f"# {version}报告\n{raw}"
+    def regenerate_section(self, report: Report, section: str, comment: str) -> bool:
+        """
+        按审查意见只重新生成单个章节
+        :param report: 已解析的报告
+        :param section: 章节标题
+        :param comment: 针对该章节的审查意见
+        :return: 是否成功替换
+        """
+        target = report.find_section(section)
+        if target is None:
+            logger.warning(f"未找到章节: {section}")
+            return False
 
-    def _extract_summary(self, report: str) -> str:
-        """提取关键点生成高管摘要"""
-        import re
-        key_points = re.findall(r"【关键结论】(.+?)【详细分析】", report, re.DOTALL)
-        return "高管摘要:\n" + ("\n".join(key_points) if key_points else report[:500])
+        outline = "、".join(s.title for s in report.walk())
+        response = self.run(
+            f"报告章节结构：{outline}\n"
+            f"请根据审查意见仅重写章节「{target.title}」的正文，不要输出标题和其他章节。\n"
+            f"审查意见：{comment}\n"
+            f"原文：\n{target.text}"
+        )
+        if response.get("error") or not response["output"]:
+            return False
+        return report.replace_section(target.title, response["output"])
 
-    def _add_disclaimer(self, report: str) -> str:
-        """为投资者版添加风险声明"""
-        return report + "\n\n---\n*投资有风险，过往业绩不预示未来表现*"
\ No newline at end of file
+    def apply_review(self, report: Union[Report, Dict[str, Any]], comments: Dict[str, str]) -> Dict:
+        """
+        按章节应用审查意见，只重新生成被意见涉及的章节
+        :param report: 已解析的报告，或 generate_reports 返回的 structured 字段
+        :param comments: {章节标题: 审查意见}
+        :return: 重新生成后的各版本报告
+        """
+        if isinstance(report, dict):
+            report = Report.from_dict(report)
+        for section, comment in comments.items():
+            self.regenerate_section(report, section, comment)
+        return {
+            "professional": report.professional("专业版"),
+            "executive": report.executive(),
+            "investor": report.investor(),
+            "structured": report.to_dict()
+        }
\ No newline at end of file
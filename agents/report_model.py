@@ -0,0 +1,139 @@
+"""
+结构化报告模型：
+1. LLM 输出只解析一次，构建章节树（支持 Markdown 标题与【章节】标记）
+2. 各版本报告作为章节树的视图渲染，不复制原文
+3. 支持按章节替换内容，实现局部重新生成
+"""
+import re
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, Iterator, List, Optional
+
+_HEADING_RE = re.compile(r"^(#{1,6})\s*(.+?)\s*#*\s*$|^\s*【(.+?)】\s*(.*)$")
+
+# 高管摘要优先提取的章节
+SUMMARY_SECTIONS = ("关键结论", "核心结论", "核心财务指标")
+
+
+@dataclass
+class ReportSection:
+    title: str
+    level: int
+    body: List[str] = field(default_factory=list)
+    children: List["ReportSection"] = field(default_factory=list)
+    marker: str = "#"  # "#" 表示Markdown标题，"【】" 表示方括号标记
+    inline: bool = False  # 正文首行与【】标记同行
+
+    @property
+    def text(self) -> str:
+        return "\n".join(self.body).strip()
+
+    def heading(self) -> str:
+        if self.marker == "【】":
+            return f"【{self.title}】"
+        return f"{'#' * self.level} {self.title}"
+
+    def walk(self) -> Iterator["ReportSection"]:
+        yield self
+        for child in self.children:
+            yield from child.walk()
+
+    def render_lines(self) -> Iterator[str]:
+        if self.inline and self.body:
+            yield self.heading() + self.body[0]
+            yield from self.body[1:]
+        else:
+            yield self.heading()
+            yield from self.body
+        for child in self.children:
+            yield from child.render_lines()
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ReportSection":
+        children = [cls.from_dict(c) for c in data.get("children", [])]
+        return cls(**{**data, "children": children})
+
+
+@dataclass
+class Report:
+    preamble: List[str] = field(default_factory=list)
+    sections: List[ReportSection] = field(default_factory=list)
+
+    @classmethod
+    def parse(cls, text: str) -> "Report":
+        """单次扫描构建章节树"""
+        report = cls()
+        stack: List[ReportSection] = []
+        for line in text.splitlines():
+            match = _HEADING_RE.match(line)
+            if not match:
+                (stack[-1].body if stack else report.preamble).append(line)
+                continue
+            if match.group(1):
+                section = ReportSection(title=match.group(2), level=len(match.group(1)))
+            else:
+                # 【章节】标记作为顶层Markdown标题的下一级
+                level = (stack[0].level + 1) if stack and stack[0].marker == "#" else 2
+                section = ReportSection(title=match.group(3), level=level, marker="【】")
+                if match.group(4):
+                    section.body.append(match.group(4))
+                    section.inline = True
+            while stack and stack[-1].level >= section.level:
+                stack.pop()
+            (stack[-1].children if stack else report.sections).append(section)
+            stack.append(section)
+        return report
+
+    def walk(self) -> Iterator[ReportSection]:
+        for section in self.sections:
+            yield from section.walk()
+
+    def find_section(self, name: str) -> Optional[ReportSection]:
+        """按标题查找章节（精确匹配优先，其次包含匹配）"""
+        candidates = list(self.walk())
+        for section in candidates:
+            if section.title == name:
+                return section
+        for section in candidates:
+            if name in section.title or section.title in name:
+                return section
+        return None
+
+    def replace_section(self, name: str, body: str) -> bool:
+        """替换章节正文（保留子章节）"""
+        section = self.find_section(name)
+        if section is None:
+            return False
+        section.body = body.strip("\n").splitlines()
+        section.inline = False
+        return True
+
+    def render_lines(self) -> Iterator[str]:
+        yield from self.preamble
+        for section in self.sections:
+            yield from section.render_lines()
+
+    def render(self) -> str:
+        return "\n".join(self.render_lines())
+
+    def to_dict(self) -> Dict[str, Any]:
+        """可JSON序列化的章节树，可由 from_dict 还原"""
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Report":
+        return cls(preamble=list(data.get("preamble", [])),
+                   sections=[ReportSection.from_dict(s) for s in data.get("sections", [])])
+
+    # ---------- 版本视图 ----------
+    def professional(self, version: str = "专业版") -> str:
+        return f"# {version}报告\n{self.render()}"
+
+    def executive(self, max_chars: int = 500) -> str:
+        key_points = [s.text for name in SUMMARY_SECTIONS
+                      for s in self.walk() if s.title == name and s.text]
+        if not key_points:
+            return "高管摘要:\n" + self.render()[:max_chars]
+        return "高管摘要:\n" + "\n".join(key_points)
+
+    def investor(self, disclaimer: str = "*投资有风险，过往业绩不预示未来表现*") -> str:
+        return f"{self.render()}\n\n---\n{disclaimer}"
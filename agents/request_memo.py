@@ -0,0 +1,187 @@
+"""
+请求级工具结果备忘录：
+1. 每次分析请求持有独立的备忘录（ContextVar 传递，不跨请求共享）
+2. 可预先并发提交工具调用（推测预取），Agent 实际调用时直接取结果
+3. 研究/风控等多个Agent以相同参数调用工具时，同一请求内只执行一次
+4. 按工具配置结果有效期（TTL）与条目上限（LRU淘汰），每次请求结束记录命中统计
+"""
+import functools
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from config.settings import settings
+from evaluation.instrumentation import registry
+
+logger = logging.getLogger(__name__)
+
+_executor = ThreadPoolExecutor(max_workers=settings.PREFETCH_WORKERS, thread_name_prefix="prefetch")
+
+
+def _normalize(value: Any) -> Hashable:
+    """字符串合并空白并忽略大小写，容器递归归一化"""
+    if isinstance(value, str):
+        return " ".join(value.split()).casefold()
+    if isinstance(value, dict):
+        return tuple(sorted((k, _normalize(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple, set)):
+        items = [_normalize(v) for v in value]
+        return tuple(sorted(items, key=repr) if isinstance(value, set) else items)
+    return value
+
+
+def memo_key(tool: str, args: Tuple, kwargs: Dict) -> Tuple:
+    return (tool, _normalize(args), _normalize(kwargs))
+
+
+class ToolMemo:
+    """单个工具的结果缓存（LRU + TTL）"""
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[Tuple, Tuple[Future, float]]" = OrderedDict()
+        self.stats = {"hits": 0, "misses": 0, "prefetched": 0, "expired": 0, "evicted": 0}
+
+    def get(self, key: Tuple) -> Optional[Future]:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        future, created = entry
+        if future.done() and time.monotonic() - created > self.ttl:
+            del self.entries[key]
+            self.stats["expired"] += 1
+            return None
+        self.entries.move_to_end(key)
+        return future
+
+    def put(self, key: Tuple, future: Future) -> None:
+        self.entries[key] = (future, time.monotonic())
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.stats["evicted"] += 1
+
+
+class RequestMemo:
+    def __init__(self, policies: Optional[Dict[str, Dict]] = None):
+        self.policies = policies or settings.TOOL_MEMO_POLICIES
+        self._tools: Dict[str, ToolMemo] = {}
+        self._lock = threading.Lock()
+
+    def _tool(self, tool: str) -> ToolMemo:
+        if tool not in self._tools:
+            policy = {**settings.TOOL_MEMO_DEFAULT, **self.policies.get(tool, {})}
+            self._tools[tool] = ToolMemo(policy["ttl"], policy["max_entries"])
+        return self._tools[tool]
+
+    def _discard(self, memo: ToolMemo, key: Tuple, future: Future) -> None:
+        """失败结果不缓存（条目已被替换时不动）"""
+        with self._lock:
+            entry = memo.entries.get(key)
+            if entry is not None and entry[0] is future:
+                del memo.entries[key]
+
+    @property
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {tool: dict(memo.stats) for tool, memo in self._tools.items()}
+
+    def prefetch(self, func: Callable, *args: Any, **kwargs: Any) -> Future:
+        """在后台线程提前执行 @memoized 工具调用（继承当前请求上下文）"""
+        tool, impl = func.tool_name, func.__wrapped__
+        key = memo_key(tool, args, kwargs)
+        with self._lock:
+            memo = self._tool(tool)
+            future = memo.get(key)
+            submitted = future is None
+            if submitted:
+                future = _executor.submit(copy_context().run, impl, *args, **kwargs)
+                memo.put(key, future)
+                memo.stats["prefetched"] += 1
+        if submitted:
+            # 已完成的 future 会立即在当前线程执行回调，需在锁外注册
+            future.add_done_callback(lambda f: f.exception() is not None and self._discard(memo, key, f))
+        return future
+
+    def call(self, tool: str, func: Callable, *args: Any, **kwargs: Any) -> Any:
+        """取已有结果（含进行中的预取），否则立即执行并记录"""
+        key = memo_key(tool, args, kwargs)
+        with self._lock:
+            memo = self._tool(tool)
+            future = memo.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                memo.put(key, future)
+                memo.stats["misses"] += 1
+            else:
+                memo.stats["hits"] += 1
+
+        if not owner:
+            try:
+                return future.result()
+            except Exception as e:
+                logger.warning(f"缓存结果不可用，重新调用 {tool}: {e}")
+                result = func(*args, **kwargs)
+                retried = Future()
+                retried.set_result(result)
+                with self._lock:
+                    entry = memo.entries.get(key)
+                    if entry is None or entry[0] is future:
+                        memo.put(key, retried)  # 以重新调用的结果替换失败条目
+                return result
+
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            future.set_exception(e)
+            self._discard(memo, key, future)
+            raise
+        future.set_result(result)
+        return result
+
+
+_current_memo: ContextVar[Optional[RequestMemo]] = ContextVar("request_memo", default=None)
+
+
+@contextmanager
+def request_memo():
+    """开启请求级备忘录，结束时记录各工具命中统计"""
+    memo = RequestMemo()
+    token = _current_memo.set(memo)
+    try:
+        yield memo
+    finally:
+        _current_memo.reset(token)
+        for tool, stats in memo.stats.items():
+            for kind in ("hits", "misses"):
+                registry.inc(f"tool_memo_{kind}_total", stats[kind], {"tool": tool},
+                             help_text=f"请求级工具备忘录 {kind} 次数")
+        logger.info("工具备忘录统计: %s", memo.stats)
+
+
+def memoized_call(tool: str, func: Callable, *args: Any, **kwargs: Any) -> Any:
+    """在请求上下文中通过备忘录调用工具，无请求上下文时直接调用"""
+    memo = _current_memo.get()
+    if memo is None:
+        return func(*args, **kwargs)
+    return memo.call(tool, func, *args, **kwargs)
+
+
+def memoized(tool: str):
+    """
+    工具实现的请求级备忘录装饰器
+    :param tool: 工具名，对应 TOOL_MEMO_POLICIES 中的配置
+    """
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            return memoized_call(tool, func, *args, **kwargs)
+        wrapper.tool_name = tool
+        return wrapper
+    return decorator
@@ -11,7 +11,8 @@ class ResearchAgent(BaseAgent):
     def __init__(self):
         super().__init__(
             name="行业研究Agent",
-            system_prompt=prompt_config["system_prompt"]
+            system_prompt=prompt_config["system_prompt"],
+            route="complex"
         )
         self.tools = [
             retriever.query,
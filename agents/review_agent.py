@@ -3,6 +3,7 @@ from typing import Dict, List
 import logging
 import yaml
 from config.settings import Settings
+from knowledge_base.text_normalizer import contains_any, normalize
 from langchain.tools import tool
 from langchain_core.prompts import ChatPromptTemplate
 
@@ -15,7 +16,8 @@ class ReviewAgent(BaseAgent):
     def __init__(self):
         super().__init__(
             name="风控审查Agent",
-            system_prompt=prompt_config["system_prompt"]
+            system_prompt=prompt_config["system_prompt"],
+            route="complex"
         )
         self.tools = [
             self._check_financial_consistency,
@@ -56,8 +58,9 @@ class ReviewAgent(BaseAgent):
             "low": ["增长", "稳健", "领先"]
         }
         risk_score = 0
+        normalized = normalize(report)  # 统一繁简、全半角后匹配，全文只归一化一次
         for level, keywords in risk_keywords.items():
-            if any(kw in report for kw in keywords):
+            if contains_any(normalized, keywords, normalized=True):
                 risk_score += {"high": 3, "medium": 2, "low": 1}[level]
         return "高风险" if risk_score >= 4 else "中风险" if risk_score >= 2 else "低风险"
 
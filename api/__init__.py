@@ -0,0 +1,4 @@
+from .coalescing import SingleFlight
+from .compression import CompressionMiddleware
+
+__all__ = ["CompressionMiddleware", "SingleFlight"]
@@ -0,0 +1,60 @@
+"""
+相同分析请求合并（single-flight）：
+1. 归一化后参数相同的并发请求只执行一次分析，后到的请求挂到进行中的任务上等待同一结果
+2. 分析任务独立于发起请求运行，首个请求的客户端断开不影响其他等待者
+3. 记录每个任务的等待请求数与当前等待总数（Prometheus 指标），并随结果返回给各请求
+"""
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+from agents.request_memo import memo_key
+from evaluation.instrumentation import registry
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self._waiters: Dict[Hashable, int] = {}
+
+    @staticmethod
+    def key(**params) -> Hashable:
+        return memo_key("analyze", (), params)
+
+    def _update_gauge(self):
+        registry.set_gauge("coalesced_waiting", sum(self._waiters.values()), {"flight": self.name},
+                           help_text="当前挂在进行中任务上的等待请求数")
+
+    def _finish(self, key: Hashable, task: asyncio.Task):
+        self._inflight.pop(key, None)
+        waiters = self._waiters.pop(key, 0)
+        task.coalesced_waiters = waiters  # 回调先于等待者恢复执行，run 返回时可读取
+        registry.observe("coalesced_waiters", waiters, {"flight": self.name},
+                         help_text="每个任务合并的等待请求数")
+        self._update_gauge()
+
+    def inflight(self, key: Hashable) -> bool:
+        """是否已有相同任务在执行（调用 run 前判断，本次请求将合并到该任务）"""
+        return key in self._inflight
+
+    async def run(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool, int]:
+        """执行或加入进行中的任务，返回 (结果, 是否为合并请求, 该任务合并的等待请求数)"""
+        task = self._inflight.get(key)
+        shared = task is not None
+        if shared:
+            self._waiters[key] += 1
+            registry.inc("coalesced_requests_total", labels={"flight": self.name},
+                         help_text="合并到进行中任务的请求数")
+            self._update_gauge()
+            logger.info(f"合并到进行中的{self.name}任务，当前等待: {self._waiters[key]}")
+        else:
+            task = asyncio.ensure_future(func())
+            self._inflight[key] = task
+            self._waiters[key] = 0
+            task.add_done_callback(lambda t: self._finish(key, t))
+        # shield：单个请求取消时任务继续执行，其他等待者不受影响
+        result = await asyncio.shield(task)
+        return result, shared, task.coalesced_waiters
@@ -0,0 +1,82 @@
+"""
+响应压缩中间件：
+1. 客户端支持时优先使用 brotli，否则 gzip
+2. 仅压缩超过阈值的文本类响应（JSON/文本/SVG），PNG 等已压缩内容直接透传
+3. 流式响应不缓冲，原样透传
+"""
+import gzip
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from config.settings import Settings
+
+try:
+    import brotli
+except ImportError:  # brotli 为可选依赖（pyproject 中的 compression 附加依赖）
+    brotli = None
+
+COMPRESSIBLE_TYPES = ("application/json", "text/", "image/svg+xml")
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    accepted = {part.split(";")[0].strip().lower() for part in accept_encoding.split(",")}
+    if "br" in accepted and brotli is not None:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=Settings.BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=Settings.GZIP_LEVEL)
+
+
+class CompressionMiddleware:
+    def __init__(self, app: ASGIApp, minimum_size: int = Settings.COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: Optional[Message] = None
+        passthrough = False
+
+        async def wrapped_send(message: Message):
+            nonlocal start, passthrough
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            headers = MutableHeaders(raw=start["headers"])
+            body = message.get("body", b"")
+            if (message.get("more_body", False)
+                    or "content-encoding" in headers
+                    or not headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES)
+                    or len(body) < self.minimum_size):
+                passthrough = True  # 流式、已编码、非文本或过小的响应原样透传
+                await send(start)
+                await send(message)
+                return
+
+            compressed = compress(body, encoding)
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(compressed))
+            headers.add_vary_header("Accept-Encoding")
+            await send(start)
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, wrapped_send)
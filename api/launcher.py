@@ -0,0 +1,143 @@
+"""
+生产启动器：
+- single: 单进程 uvicorn
+- prefork: 父进程预加载 embedding 模型后 fork 工作进程，模型权重以写时复制方式共享；
+  Chroma 客户端在各工作进程内打开（索引文件经操作系统页缓存共享）
+- embed-service: 独立 embedding 服务进程（Unix socket，合并批量推理），各 uvicorn worker 远程调用
+
+用法:
+    python -m api.launcher --mode prefork --workers 4
+"""
+import argparse
+import gc
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+from typing import Dict
+
+from config.log_config import setup_logging, shutdown_logging
+from config.settings import Settings
+
+logger = logging.getLogger(__name__)
+
+MODES = ("single", "prefork", "embed-service")
+
+
+def run_single(host: str, port: int):
+    import uvicorn
+    uvicorn.run("app:app", host=host, port=port, log_level="info", timeout_keep_alive=60)
+
+
+def _worker_threads(workers: int) -> int:
+    return max(1, (os.cpu_count() or 1) // workers)
+
+
+def run_prefork(host: str, port: int, workers: int):
+    import uvicorn
+    from app import app
+
+    Settings.shared_embedding_model()  # 父进程加载模型权重，子进程共享
+    gc.collect()
+    gc.freeze()  # 预加载对象移出GC跟踪，避免子进程GC写入导致页面复制
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+
+    children: Dict[int, int] = {}
+    stopping = False
+
+    def spawn(slot: int):
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            code = 0
+            try:
+                import torch
+                torch.set_num_threads(_worker_threads(workers))  # 避免多个工作进程争抢CPU核
+            except ImportError:
+                pass
+            try:
+                config = uvicorn.Config(app, log_level="info", timeout_keep_alive=60)
+                uvicorn.Server(config).run(sockets=[sock])
+            except BaseException:
+                logger.exception(f"工作进程 {slot} 异常退出")
+                code = 1
+            finally:
+                shutdown_logging()
+                os._exit(code)
+        children[pid] = slot
+        logger.info(f"工作进程 {slot} 已启动: pid={pid}")
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for slot in range(workers):
+        spawn(slot)
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        slot = children.pop(pid, None)
+        if slot is not None and not stopping:
+            logger.warning(f"工作进程 {slot} 退出(status={status})，重新启动")
+            spawn(slot)
+    sock.close()
+
+
+def run_embed_service(host: str, port: int, workers: int, socket_path: str = Settings.EMBEDDING_SOCKET_PATH):
+    import uvicorn
+    from knowledge_base.embedding_service import serve, wait_ready
+
+    service = multiprocessing.get_context("spawn").Process(target=serve, args=(socket_path,),
+                                                           name="embedding-service", daemon=True)
+    service.start()
+    try:
+        wait_ready(socket_path)
+        # workers=1 时 uvicorn 在当前进程内运行（配置已加载），直接修改配置；
+        # 多个工作进程以 spawn 方式启动，重新加载配置时读取环境变量
+        Settings.USE_EMBEDDING_SERVICE = True
+        Settings.EMBEDDING_SOCKET_PATH = socket_path
+        os.environ["USE_EMBEDDING_SERVICE"] = "true"
+        os.environ["EMBEDDING_SOCKET_PATH"] = socket_path
+        uvicorn.run("app:app", host=host, port=port, workers=workers, log_level="info", timeout_keep_alive=60)
+    finally:
+        service.terminate()
+        service.join(timeout=10)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mode", choices=MODES, default=Settings.SERVE_MODE)
+    parser.add_argument("--workers", type=int, default=Settings.SERVE_WORKERS)
+    parser.add_argument("--host", default=Settings.SERVE_HOST)
+    parser.add_argument("--port", type=int, default=Settings.SERVE_PORT)
+    args = parser.parse_args()
+
+    setup_logging()
+    logger.info(f"启动模式: {args.mode}, workers={args.workers}")
+    if args.mode == "prefork":
+        run_prefork(args.host, args.port, args.workers)
+    elif args.mode == "embed-service":
+        run_embed_service(args.host, args.port, args.workers)
+    else:
+        run_single(args.host, args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,34 @@
-from fastapi import FastAPI, HTTPException, status
+from fastapi import FastAPI, Header, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, ORJSONResponse, PlainTextResponse
 from pydantic import BaseModel
 from datetime import datetime
+import hmac
 import logging
 from typing import Optional, Dict, Any
 import os
+import threading
 from config.settings import Settings
+from config.log_config import setup_logging
+from evaluation.instrumentation import RequestTrace, registry, start_trace
+from evaluation.collector import emitter
+from evaluation.profiler import profiling
+from api.coalescing import SingleFlight
+from api.compression import CompressionMiddleware
+from agents.prefetch import prefetch_analysis_inputs
+from agents.request_memo import request_memo
+from knowledge_base.sharding import industry_scope
 # 初始化FastAPI应用
 app = FastAPI(
     title="金融分析智能体API",
     description="提供公司行业分析报告的AI智能体服务",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
+app.add_middleware(CompressionMiddleware)
 
-# 配置日志
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+# 配置日志（异步队列输出，JSON格式附带请求ID）
+setup_logging()
 logger = logging.getLogger(__name__)
 
 
@@ -24,8 +36,10 @@ logger = logging.getLogger(__name__)
 class AnalysisRequest(BaseModel):
     company: str
     industry: str
+    company_code: Optional[str] = None  # 证券代码（如 300750.SZ），用于检测财务数据变化
     priority: Optional[str] = "normal"
     deadline: Optional[str] = None
+    incremental: bool = False  # 基于上一版本报告增量更新
 
 
 class AnalysisResponse(BaseModel):
@@ -36,22 +50,19 @@ class AnalysisResponse(BaseModel):
 
 
 def check_knowledge_initialized():
-    from chromadb import PersistentClient
-    client = PersistentClient(path=Settings.VECTOR_DB_PATH)
-    if not client.list_collections():
+    from knowledge_base.retriever import retriever  # 同时预加载embedding模型与索引
+    if not retriever.document_count:
         raise RuntimeError("知识库未初始化！请先运行 scripts/deploy_vectordb.py")
 
 @app.on_event("startup")
 async def startup():
     check_knowledge_initialized()
     logger.info("知识库验证通过")
+    from knowledge_base.retriever import retriever
+    retriever.start_watch()  # 在服务进程（prefork 下为各工作进程）内轮询 CURRENT
 
-# 初始化Crew（延迟导入避免LLM配置冲突）
-def initialize_crew():
-    """延迟初始化Crew以正确处理LLM配置"""
-    from agents.crew_setup import crew
-
-    # 确保LLM配置正确
+def configure_crew(crew):
+    """确保LLM配置正确"""
     for agent in crew.agents:
         if hasattr(agent, 'llm'):
             if isinstance(agent.llm, str):
@@ -59,22 +70,47 @@ def initialize_crew():
                     agent.llm = {
                         "model": "deepseek-chat",
                         "api_key": os.getenv("DEEPSEEK_API_KEY"),
-                        "base_url": "https://api.deepseek.com/v1"
+                        "base_url": Settings.DEEPSEEK_API_BASE
                     }
                     logger.info(f"已配置DeepSeek模型: {agent.role}")
 
     return crew
 
 
-# 全局crew实例（延迟初始化）
-_crew = None
+# 初始化Crew实例池（延迟导入避免LLM配置冲突）
+def initialize_crew_pool():
+    """延迟初始化Crew实例池，每个实例以正确的LLM配置构建"""
+    from agents.crew_pool import CrewPool
+    from agents.crew_setup import crew, setup_agents_and_crew
+
+    return CrewPool(
+        factory=lambda: configure_crew(setup_agents_and_crew()[2]),
+        seed=[configure_crew(crew)]  # 复用导入时已构建的实例
+    )
+
+
+# 全局crew实例池（延迟初始化）
+_crew_pool = None
+_crew_pool_lock = threading.Lock()
+_analyzer = None
+_analysis_flight = SingleFlight("analyze")  # 相同参数的并发分析只执行一次
+
+
+def get_analyzer():
+    global _analyzer
+    if _analyzer is None:
+        from agents.incremental import IncrementalAnalyzer
+        _analyzer = IncrementalAnalyzer()
+    return _analyzer
 
 
-def get_crew():
-    global _crew
-    if _crew is None:
-        _crew = initialize_crew()
-    return _crew
+def get_crew_pool():
+    global _crew_pool
+    if _crew_pool is None:
+        with _crew_pool_lock:  # 分析在工作线程中执行，避免并发初始化
+            if _crew_pool is None:
+                _crew_pool = initialize_crew_pool()
+    return _crew_pool
 
 
 # 健康检查端点
@@ -83,6 +119,97 @@ async def health_check():
     return {"status": "OK"}
 
 
+# 指标导出端点（Prometheus 抓取）
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+
+# 历史报告查询
+@app.get("/reports/{company}/{industry}")
+async def get_report(company: str, industry: str, version: Optional[str] = None):
+    from knowledge_base.report_store import report_store
+    record = (report_store.load(company, industry, version) if version
+              else report_store.latest(company, industry))
+    if record is None:
+        raise HTTPException(status_code=404, detail="报告不存在")
+    record["versions"] = report_store.versions(company, industry)
+    return record
+
+
+# 知识库快照热切换（构建新快照后调用，或由 CURRENT 轮询自动触发）
+@app.post("/admin/knowledge/reload")
+def reload_knowledge(version: Optional[str] = None, x_admin_token: Optional[str] = Header(None)):
+    # 未配置令牌时禁用管理接口
+    if not Settings.ADMIN_TOKEN or not hmac.compare_digest(x_admin_token or "", Settings.ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="无权限")
+    from knowledge_base.retriever import retriever
+    try:
+        return retriever.reload(version)
+    except (ValueError, FileNotFoundError) as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+# 分析请求剖析结果（flamegraph: folded stacks；spans: 调用链时间树）
+@app.get("/profiles/{request_id}")
+async def get_profile(request_id: str, view: str = "flamegraph"):
+    from evaluation.profiler import profile_store
+    path = profile_store.path(request_id, view)
+    if path is None:
+        raise HTTPException(status_code=404, detail="剖析结果不存在")
+    media_type = "application/json" if view == "spans" else "text/plain; charset=utf-8"
+    return FileResponse(path, media_type=media_type)
+
+
+# 图表等生成产物（按内容哈希寻址，可长期缓存）
+@app.get("/artifacts/{artifact_id}")
+async def get_artifact(artifact_id: str):
+    from tools.chart_renderer import MIME_TYPES, renderer
+    path = renderer.artifact_path(artifact_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="产物不存在")
+    return FileResponse(path, media_type=MIME_TYPES[path.suffix[1:]],
+                        headers={"Cache-Control": "public, max-age=31536000, immutable"})
+
+
+def run_analysis(request: AnalysisRequest, trace: RequestTrace, profile: bool = False) -> Dict[str, Any]:
+    """执行一次完整分析（工作线程中运行，结果由合并的请求共享）"""
+    # 获取crew实例池（每次分析独占一个实例，不同分析可并行）
+    crew_pool = get_crew_pool()
+
+    # 构建输入参数
+    inputs = {
+        "company": request.company,
+        "industry": request.industry,
+        "company_code": request.company_code or "未提供",
+        "crewai_trigger_payload": {
+            "priority": request.priority,
+            "deadline": request.deadline
+        }
+    }
+    run_metrics = {}
+
+    def full_run() -> str:
+        with crew_pool.acquire() as crew:
+            analysis_report = crew.kickoff(inputs=inputs)
+        token_usage = getattr(analysis_report, "token_usage", None)
+        if token_usage is not None:
+            run_metrics["token_usage"] = token_usage.model_dump()
+        return str(analysis_report)
+
+    # 执行分析（结果按版本保存，增量模式下仅重新生成受影响章节）
+    # 请求到达即并发预取研究Agent必然用到的工具结果
+    with start_trace(trace), profiling(trace, profile), request_memo() as memo, industry_scope(request.industry):
+        prefetch_analysis_inputs(memo, request.company, request.industry, request.company_code)
+        outcome = get_analyzer().analyze(
+            request.company, request.industry, request.company_code,
+            full_run, incremental=request.incremental
+        )
+    if profile:
+        run_metrics["profile"] = f"/profiles/{trace.request_id}"
+    return {**outcome, **run_metrics, "request_id": trace.request_id}
+
+
 # 核心分析端点
 @app.post(
     "/analyze",
@@ -93,8 +220,8 @@ async def health_check():
         400: {"description": "无效输入参数"}
     }
 )
-async def analyze_company(request: AnalysisRequest):
-    """执行公司行业分析"""
+async def analyze_company(request: AnalysisRequest, x_profile: Optional[str] = Header(None)):
+    """执行公司行业分析（请求头 X-Profile: 1 开启性能剖析）"""
     result = {
         "status": "success",
         "report": None,
@@ -105,6 +232,7 @@ async def analyze_company(request: AnalysisRequest):
         },
         "error": None
     }
+    trace = RequestTrace()
 
     try:
         # 验证输入
@@ -116,26 +244,35 @@ async def analyze_company(request: AnalysisRequest):
 
         logger.info(f"开始分析 {request.company} ({request.industry})")
 
-        # 获取已正确配置的crew实例
-        crew = get_crew()
-
-        # 构建输入参数
-        inputs = {
-            "company": request.company,
-            "industry": request.industry,
-            "crewai_trigger_payload": {
-                "priority": request.priority,
-                "deadline": request.deadline
-            }
-        }
-
-        # 执行分析
-        analysis_report = crew.kickoff(inputs=inputs)
+        profile = Settings.PROFILE_ANALYSIS or (x_profile or "").lower() in ("1", "true")
+        key = SingleFlight.key(
+            company=request.company, industry=request.industry,
+            company_code=request.company_code, incremental=request.incremental,
+            profile=profile  # 剖析请求需要实际执行一次，不合并到未剖析的任务
+        )
+        # 先标记是否为合并请求：合并到的任务失败时同样不上报自己的空调用链
+        result["metrics"]["coalesced"] = _analysis_flight.inflight(key)
+        outcome, shared, waiters = await _analysis_flight.run(
+            key, lambda: run_in_threadpool(run_analysis, request, trace, profile)
+        )
+        result["metrics"]["coalesced"] = shared
+        result["metrics"]["coalesced_waiters"] = waiters
+        if shared:
+            # 合并请求未实际执行分析，只引用执行该分析的请求，不重复计入token消耗
+            result["metrics"]["coalesced_with"] = outcome["request_id"]
+        else:
+            for name in ("token_usage", "profile"):
+                if outcome.get(name) is not None:
+                    result["metrics"][name] = outcome[name]
 
         # 处理结果
+        report_text = outcome["report"]
         result["report"] = {
-            "summary": analysis_report[:500],  # 截断长文本
-            "full_report": analysis_report if len(analysis_report) <= 2000 else None
+            "summary": report_text[:500],  # 截断长文本，完整报告通过 /reports 获取
+            "full_report": report_text if len(report_text) <= 2000 else None,
+            "version": outcome["version"],
+            "mode": outcome["mode"],
+            "regenerated_sections": outcome["sections"]
         }
 
         logger.info(f"分析完成: {request.company}")
@@ -154,6 +291,20 @@ async def analyze_company(request: AnalysisRequest):
         result["metrics"]["duration_sec"] = round(
             (end_time - start_time).total_seconds(), 2
         )
+        if not result["metrics"].get("coalesced"):
+            # 合并请求没有自己的调用链，不上报，避免统计中出现空阶段的分析
+            result["metrics"]["trace"] = trace.summary()
+            emitter.emit(
+                "analyze",
+                result["metrics"]["trace"]["total_ms"],
+                status=result["status"],
+                stages={k: v["total_ms"] for k, v in result["metrics"]["trace"]["stages"].items()}
+            )
+        registry.observe(
+            "request_duration_seconds", result["metrics"]["duration_sec"],
+            {"endpoint": "/analyze", "status": result["status"]},
+            help_text="分析请求总耗时（秒）"
+        )
 
     # 根据状态返回不同HTTP状态码
     if result["status"] == "error":
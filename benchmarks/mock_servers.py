@@ -0,0 +1,177 @@
+"""
+基准测试用本地模拟服务：
+1. DeepSeek chat completions（OpenAI 兼容，可配置首包延迟与逐 token 流式输出）
+2. 万得 /api/fina、/api/market、/server/ping 及 /company/financials
+
+单独启动:
+    python -m benchmarks.mock_servers --llm-port 18001 --wind-port 18002 --latency-ms 800
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+REPORT_TEXT = (
+    "## 核心财务指标\n- 营业收入: 4003亿元（数据来源：万得）\n- 净利润: 441亿元\n"
+    "## 行业对比分析\n公司市场份额保持领先，毛利率高于行业平均。\n"
+    "## 财务数据验证\n三张表勾稽关系一致。\n"
+    "## 风险提示\n原材料价格波动；竞争加剧；海外政策变化。\n"
+    "## 数据来源说明\n万得、公司年报。"
+)
+
+
+class _JSONHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, fmt, *args):  # 压测时关闭访问日志
+        pass
+
+    def _read_json(self) -> Dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _send_json(self, body: Dict, status: int = 200):
+        payload = json.dumps(body, ensure_ascii=False).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+class DeepSeekHandler(_JSONHandler):
+    """模拟 DeepSeek /v1/chat/completions"""
+    latency_ms: float = 500
+    token_ms: float = 5
+    jitter: float = 0.1
+
+    def _answer(self, prompt: str) -> str:
+        if "validating the output" in prompt:  # CrewAI guardrail 校验
+            return 'Thought: 校验完成\nFinal Answer: {"valid": true, "feedback": null}'
+        return f"Thought: 已完成分析\nFinal Answer: {REPORT_TEXT}"
+
+    def do_POST(self):
+        if not self.path.endswith("/chat/completions"):
+            self._send_json({"error": "not found"}, 404)
+            return
+        body = self._read_json()
+        prompt = "\n".join(str(m.get("content", "")) for m in body.get("messages", []))
+        answer = self._answer(prompt)
+        tokens = list(answer)
+        time.sleep(self.latency_ms / 1000 * random.uniform(1 - self.jitter, 1 + self.jitter))
+
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        usage = {"prompt_tokens": len(prompt) // 2, "completion_tokens": len(tokens),
+                 "total_tokens": len(prompt) // 2 + len(tokens)}
+        if body.get("stream"):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            for token in tokens:
+                time.sleep(self.token_ms / 1000)
+                chunk = {"id": completion_id, "object": "chat.completion.chunk", "model": body.get("model"),
+                         "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}]}
+                self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode())
+                self.wfile.flush()
+            final = {"id": completion_id, "object": "chat.completion.chunk", "model": body.get("model"),
+                     "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}], "usage": usage}
+            self.wfile.write(f"data: {json.dumps(final)}\n\ndata: [DONE]\n\n".encode())
+            self.close_connection = True
+            return
+
+        time.sleep(self.token_ms * len(tokens) / 1000)
+        self._send_json({
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": answer},
+                         "finish_reason": "stop"}],
+            "usage": usage
+        })
+
+
+class WindHandler(_JSONHandler):
+    """模拟万得数据接口"""
+    latency_ms: float = 50
+
+    @staticmethod
+    def _financials(code: str) -> Dict:
+        seed = sum(map(ord, code))
+        return {
+            "oper_revenue": 1e9 + seed * 1e6, "net_profit": 1e8 + seed * 1e5,
+            "total_assets": 5e9 + seed * 1e6, "total_liab": 3e9 + seed * 1e6,
+            "net_cash_flows_oper": 2e8 + seed * 1e5
+        }
+
+    def do_GET(self):
+        time.sleep(self.latency_ms / 1000)
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        if url.path.endswith("/server/ping"):
+            self._send_json({"data": "pong"})
+        elif url.path.endswith("/api/market"):
+            codes = query.get("codes", [""])[0].split(",")
+            self._send_json({"data": [{"code": c, "last_price": 100 + len(c)} for c in codes if c]})
+        elif url.path.endswith("/company/financials"):
+            fin = self._financials(query.get("code", [""])[0])
+            self._send_json({
+                "balance": {"total_assets": fin["total_assets"], "total_liabilities": fin["total_liab"]},
+                "income": {"revenue": fin["oper_revenue"], "net_profit": fin["net_profit"]},
+                "cashflow": {"net_cash_flow": fin["net_cash_flows_oper"]}
+            })
+        else:
+            self._send_json({"error_code": 404, "error_msg": "not found"}, 404)
+
+    def do_POST(self):
+        time.sleep(self.latency_ms / 1000)
+        if not self.path.endswith("/api/fina"):
+            self._send_json({"error_code": 404, "error_msg": "not found"}, 404)
+            return
+        body = self._read_json()
+        self._send_json({"error_code": 0, "data": self._financials(str(body.get("codes", "")))})
+
+
+def serve(handler, port: int = 0, **attrs) -> Tuple[ThreadingHTTPServer, str]:
+    """在后台线程启动模拟服务，返回 (server, base_url)"""
+    handler_cls = type(handler.__name__, (handler,), attrs)
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler_cls)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def start_mock_servers(llm_port: int = 0, wind_port: int = 0, latency_ms: float = 500,
+                       token_ms: float = 5, wind_latency_ms: float = 50) -> Dict[str, Optional[object]]:
+    """同时启动 DeepSeek 与万得模拟服务"""
+    llm_server, llm_url = serve(DeepSeekHandler, llm_port, latency_ms=latency_ms, token_ms=token_ms)
+    wind_server, wind_url = serve(WindHandler, wind_port, latency_ms=wind_latency_ms)
+    return {
+        "servers": [llm_server, wind_server],
+        "deepseek_api_base": f"{llm_url}/v1",
+        "wind_api_base": wind_url
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--llm-port", type=int, default=18001)
+    parser.add_argument("--wind-port", type=int, default=18002)
+    parser.add_argument("--latency-ms", type=float, default=500, help="LLM首包延迟")
+    parser.add_argument("--token-ms", type=float, default=5, help="逐token输出间隔")
+    parser.add_argument("--wind-latency-ms", type=float, default=50)
+    args = parser.parse_args()
+
+    mocks = start_mock_servers(args.llm_port, args.wind_port, args.latency_ms, args.token_ms, args.wind_latency_ms)
+    print(f"DEEPSEEK_API_BASE={mocks['deepseek_api_base']}")
+    print(f"WIND_API_BASE={mocks['wind_api_base']}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,271 @@
+"""
+端到端基准测试：
+1. 启动本地 DeepSeek/万得模拟服务，应用全部外部调用指向模拟服务
+2. 测量知识库写入吞吐（docs/sec）、检索 QPS、/analyze 吞吐与 p95 延迟
+3. 可选对比多进程部署方式（prefork / embed-service）的启动耗时、总内存（PSS）与吞吐
+4. 结果按 git commit 保存到 benchmarks/results/，并可与基线对比
+
+用法:
+    python -m benchmarks.run_benchmarks --concurrency 4 --requests 20 --baseline <commit>
+    python -m benchmarks.run_benchmarks --layouts prefork embed-service --workers 4
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List
+
+from benchmarks.mock_servers import start_mock_servers
+
+RESULTS_DIR = Path(__file__).parent / "results"
+ROOT_DIR = Path(__file__).resolve().parent.parent
+
+COMPANIES = ["宁德时代", "比亚迪", "隆基绿能", "贵州茅台", "中芯国际", "海康威视"]
+INDUSTRIES = ["新能源", "汽车", "光伏", "白酒", "半导体", "安防"]
+TOPICS = ["毛利率", "营业收入", "现金流", "资产负债率", "研发投入", "市场份额", "原材料价格", "海外扩张"]
+
+# 越大越好的指标，其余视为越小越好
+HIGHER_IS_BETTER = {"docs_per_sec", "qps", "throughput_rps"}
+
+
+def percentile(values: List[float], pct: float) -> float:
+    values = sorted(values)
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def synthetic_documents(n: int):
+    """生成中文合成语料"""
+    from langchain_core.documents import Document
+    rng = random.Random(42)
+    docs = []
+    for i in range(n):
+        company, industry = rng.choice(COMPANIES), rng.choice(INDUSTRIES)
+        sentences = [
+            f"{company}{rng.randint(2019, 2024)}年{rng.choice(TOPICS)}同比变化{rng.uniform(-30, 50):.1f}%。"
+            for _ in range(8)
+        ]
+        docs.append(Document(page_content="".join(sentences),
+                             metadata={"source": "benchmark", "company": company, "industry": industry, "id": i}))
+    return docs
+
+
+def run_concurrent(func: Callable[[int], None], total: int, concurrency: int) -> Dict:
+    """并发执行 total 次 func，返回吞吐与延迟分布"""
+    latencies, errors = [], 0
+
+    def timed_call(i):
+        start = time.perf_counter()
+        try:
+            func(i)
+            return time.perf_counter() - start, False
+        except Exception:
+            return time.perf_counter() - start, True
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for latency, failed in pool.map(timed_call, range(total)):
+            latencies.append(latency)
+            errors += failed
+    elapsed = time.perf_counter() - started
+    return {
+        "total": total,
+        "errors": errors,
+        "elapsed_sec": round(elapsed, 3),
+        "throughput": round(total / elapsed, 3),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2)
+    }
+
+
+def bench_ingestion(retriever, docs, batch_size: int) -> Dict:
+    start = time.perf_counter()
+    for i in range(0, len(docs), batch_size):
+        retriever.add_documents(docs[i:i + batch_size])
+    elapsed = time.perf_counter() - start
+    return {"docs": len(docs), "elapsed_sec": round(elapsed, 3), "docs_per_sec": round(len(docs) / elapsed, 2)}
+
+
+def bench_retrieval(retriever, queries: int, concurrency: int) -> Dict:
+    rng = random.Random(7)
+    questions = [f"{rng.choice(COMPANIES)}的{rng.choice(TOPICS)}变化趋势" for _ in range(queries)]
+    stats = run_concurrent(lambda i: retriever.query(questions[i]), queries, concurrency)
+    stats["qps"] = stats.pop("throughput")
+    return stats
+
+
+def process_tree_pss_mb(pid: int) -> float:
+    """进程树的比例集内存（PSS，共享页面按进程数均摊，Linux）"""
+    def children(p: int) -> List[int]:
+        result = []
+        for task in Path(f"/proc/{p}/task").glob("*/children"):
+            result += [int(c) for c in task.read_text().split()]
+        return result
+
+    total_kb, stack = 0, [pid]
+    while stack:
+        current = stack.pop()
+        try:
+            for line in Path(f"/proc/{current}/smaps_rollup").read_text().splitlines():
+                if line.startswith("Pss:"):
+                    total_kb += int(line.split()[1])
+            stack += children(current)
+        except OSError:
+            continue
+    return round(total_kb / 1024, 1)
+
+
+def bench_analyze(env: Dict[str, str], port: int, requests_total: int, concurrency: int,
+                  command: List[str] = None) -> Dict:
+    import requests
+
+    command = command or [sys.executable, "-m", "uvicorn", "app:app", "--port", str(port), "--log-level", "warning"]
+    started = time.perf_counter()
+    proc = subprocess.Popen(command, cwd=ROOT_DIR, env=env)
+    base = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.time() + 120
+        while time.time() < deadline:
+            try:
+                if requests.get(f"{base}/health", timeout=1).ok:
+                    break
+            except requests.RequestException:
+                time.sleep(0.5)
+        else:
+            raise RuntimeError("应用启动超时")
+        startup_sec = round(time.perf_counter() - started, 2)
+
+        def analyze(i):
+            resp = requests.post(f"{base}/analyze", json={
+                "company": COMPANIES[i % len(COMPANIES)],
+                "industry": INDUSTRIES[i % len(INDUSTRIES)]
+            }, timeout=600)
+            resp.raise_for_status()
+
+        stats = run_concurrent(analyze, requests_total, concurrency)
+        stats["throughput_rps"] = stats.pop("throughput")
+        stats["startup_sec"] = startup_sec
+        stats["pss_mb"] = process_tree_pss_mb(proc.pid)
+        return stats
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+
+
+def bench_layout(mode: str, env: Dict[str, str], port: int, workers: int,
+                 requests_total: int, concurrency: int) -> Dict:
+    """以指定部署方式启动应用并测量 /analyze"""
+    command = [sys.executable, "-m", "api.launcher", "--mode", mode, "--workers", str(workers),
+               "--host", "127.0.0.1", "--port", str(port)]
+    env = {**env, "EMBEDDING_SOCKET_PATH": os.path.join(tempfile.mkdtemp(prefix="bench_sock_"), "embedding.sock")}
+    stats = bench_analyze(env, port, requests_total, concurrency, command=command)
+    stats["workers"] = workers
+    return stats
+
+
+def compare(current: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """逐项对比基线，返回输出行（回归项标注 REGRESSION）"""
+    lines = [f"对比基线 {baseline.get('commit')} → {current.get('commit')}"]
+    for section, metrics in current["results"].items():
+        base_metrics = baseline.get("results", {}).get(section, {})
+        for name, value in metrics.items():
+            base = base_metrics.get(name)
+            if not isinstance(value, (int, float)) or not isinstance(base, (int, float)) or not base:
+                continue
+            if not (name in HIGHER_IS_BETTER or name.endswith("_ms")):
+                continue
+            change = (value - base) / base
+            worse = -change if name in HIGHER_IS_BETTER else change
+            flag = "  REGRESSION" if worse > tolerance else ""
+            lines.append(f"{section}.{name}: {base} → {value} ({change:+.1%}){flag}")
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=20, help="/analyze 请求总数")
+    parser.add_argument("--docs", type=int, default=500, help="写入文档数")
+    parser.add_argument("--batch-size", type=int, default=64, help="写入批大小")
+    parser.add_argument("--queries", type=int, default=200, help="检索请求数")
+    parser.add_argument("--llm-latency-ms", type=float, default=500)
+    parser.add_argument("--token-ms", type=float, default=2)
+    parser.add_argument("--wind-latency-ms", type=float, default=50)
+    parser.add_argument("--app-port", type=int, default=18080)
+    parser.add_argument("--skip", action="append", default=[], choices=["ingestion", "retrieval", "analyze"])
+    parser.add_argument("--layouts", nargs="*", default=[], choices=["single", "prefork", "embed-service"],
+                        help="对比的部署方式")
+    parser.add_argument("--workers", type=int, default=2, help="多进程部署的工作进程数")
+    parser.add_argument("--baseline", help="基线commit或结果文件路径")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="判定回归的相对变化阈值")
+    args = parser.parse_args()
+
+    mocks = start_mock_servers(latency_ms=args.llm_latency_ms, token_ms=args.token_ms,
+                               wind_latency_ms=args.wind_latency_ms)
+    vector_db = tempfile.mkdtemp(prefix="bench_chroma_")
+    env = {
+        **os.environ,
+        "DEEPSEEK_API_BASE": mocks["deepseek_api_base"],
+        "DEEPSEEK_API_KEY": os.environ.get("DEEPSEEK_API_KEY", "benchmark"),
+        "OPENAI_API_KEY": os.environ.get("OPENAI_API_KEY", "benchmark"),
+        "WIND_API_BASE": mocks["wind_api_base"],
+        "WIND_API_KEY": os.environ.get("WIND_API_KEY", "benchmark"),
+        "VECTOR_DB_PATH": vector_db,
+        "VECTOR_SNAPSHOT_DIR": os.path.join(vector_db, "snapshots")
+    }
+    os.environ.update(env)  # 须在导入 config.settings 之前设置
+
+    from knowledge_base.retriever import retriever
+
+    results = {}
+    docs = synthetic_documents(args.docs)
+    # 检索与 /analyze 依赖已写入的知识库，故写入始终执行
+    results["ingestion"] = bench_ingestion(retriever, docs, args.batch_size)
+    if "retrieval" not in args.skip:
+        results["retrieval"] = bench_retrieval(retriever, args.queries, args.concurrency)
+    if "analyze" not in args.skip:
+        results["analyze"] = bench_analyze(env, args.app_port, args.requests, args.concurrency)
+    for mode in args.layouts:
+        results[f"layout_{mode}"] = bench_layout(mode, env, args.app_port, args.workers,
+                                                 args.requests, args.concurrency)
+
+    record = {
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("baseline", "skip", "layouts")},
+        "results": results
+    }
+    RESULTS_DIR.mkdir(exist_ok=True)
+    out_path = RESULTS_DIR / f"{record['commit']}.json"
+    out_path.write_text(json.dumps(record, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+    print(f"结果已保存: {out_path}")
+
+    if args.baseline:
+        base_path = Path(args.baseline)
+        if not base_path.exists():
+            base_path = RESULTS_DIR / f"{args.baseline}.json"
+        baseline = json.loads(base_path.read_text(encoding="utf-8"))
+        report = compare(record, baseline, args.tolerance)
+        print("\n".join(report))
+        if any("REGRESSION" in line for line in report):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""
+日志配置：
+1. 请求线程只把日志记录放入队列，格式化与终端/文件 I/O 由后台线程完成；队列写满时丢弃而不阻塞
+2. JSON 结构化输出（LOG_FORMAT=json），自动附带当前请求ID，extra 字段原样输出
+3. DEBUG 日志及带 extra={"sample_rate": r} 的热点日志按比例采样
+4. 同一日志器重复配置不会重复添加处理器；fork 出的子进程自动重建后台线程
+
+用法:
+    from config.log_config import setup_logging
+    setup_logging()                                      # 根日志器
+    logger = install("deploy_vectordb", log_file="...")  # 独立日志器（脚本）
+"""
+import atexit
+import logging
+import os
+import queue
+import random
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, List, Optional, Union
+
+import orjson
+
+from config.settings import Settings
+from evaluation.instrumentation import current_trace, registry
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# LogRecord 自带属性，其余属性视为 extra 字段
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {
+    "message", "asctime", "request_id", "route", "sample_rate"
+}
+
+
+class RequestContextFilter(logging.Filter):
+    """附加当前请求ID（需在请求线程中执行）"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        trace = current_trace()
+        record.request_id = trace.request_id if trace else None
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """按比例保留 DEBUG 及标记了 sample_rate 的记录"""
+
+    def __init__(self, rate: float = Settings.LOG_SAMPLE_RATE):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        rate = getattr(record, "sample_rate", None)
+        if rate is None:
+            if record.levelno > logging.DEBUG:
+                return True
+            rate = self.rate
+        return rate >= 1 or random.random() < rate
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            "thread": record.threadName
+        }
+        if getattr(record, "request_id", None):
+            entry["request_id"] = record.request_id
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return orjson.dumps(entry, default=str).decode("utf-8")
+
+
+class _Router:
+    """后台线程按日志器把记录分发给各自的输出处理器"""
+
+    def __init__(self):
+        self.routes: Dict[str, List[logging.Handler]] = {}
+
+    def handle(self, record: logging.LogRecord):
+        for handler in self.routes.get(record.route, ()):
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+
+class _State:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.router = _Router()
+        self.queue: Optional[queue.Queue] = None
+        self.listener: Optional[QueueListener] = None
+
+    def start(self):
+        self.queue = queue.Queue(Settings.LOG_QUEUE_SIZE)
+        self.listener = QueueListener(self.queue, self.router)
+        self.listener.start()
+
+    def stop(self):
+        if self.listener is not None:
+            self.listener.stop()  # 写出队列中剩余的记录
+            self.listener = None
+
+    def after_fork(self):
+        # 后台线程不会随 fork 复制，子进程重建队列与线程
+        self.lock = threading.Lock()
+        if self.listener is not None:
+            self.start()
+
+
+_state = _State()
+atexit.register(_state.stop)
+os.register_at_fork(after_in_child=_state.after_fork)
+
+
+class AsyncQueueHandler(QueueHandler):
+    def __init__(self, route: str):
+        super().__init__(None)
+        self.route = route
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # 请求线程只合并消息参数，JSON 序列化留给后台线程
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        record.route = self.route
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            _state.queue.put_nowait(record)
+        except queue.Full:
+            registry.inc("log_records_dropped_total", help_text="日志队列写满丢弃的记录数")
+
+
+def _formatter(json_format: Optional[bool]) -> logging.Formatter:
+    if json_format is None:
+        json_format = Settings.LOG_FORMAT == "json"
+    return JsonFormatter() if json_format else logging.Formatter(TEXT_FORMAT)
+
+
+def install(
+        name: Optional[str] = None,
+        level: Union[int, str] = Settings.LOG_LEVEL,
+        log_file: Optional[str] = None,
+        json_format: Optional[bool] = None
+) -> logging.Logger:
+    """为日志器挂载异步队列处理器（终端 + 可选文件），重复调用只更新级别"""
+    logger = logging.getLogger(name)
+    logger.setLevel(level)
+    route = name or "root"
+    with _state.lock:
+        if route in _state.router.routes:
+            return logger
+        if _state.listener is None:
+            _state.start()
+
+        formatter = _formatter(json_format)
+        handlers: List[logging.Handler] = [logging.StreamHandler()]
+        if log_file:
+            os.makedirs(os.path.dirname(log_file) or ".", exist_ok=True)
+            handlers.append(logging.FileHandler(log_file, encoding="utf-8", delay=True))
+        for handler in handlers:
+            handler.setFormatter(formatter)
+        _state.router.routes[route] = handlers
+
+        handler = AsyncQueueHandler(route)
+        handler.addFilter(SamplingFilter())  # 先采样，丢弃的记录不再取请求上下文
+        handler.addFilter(RequestContextFilter())
+        logger.addHandler(handler)
+        if name:
+            logger.propagate = False  # 已有独立输出，避免根日志器重复打印
+    return logger
+
+
+def setup_logging(level: Union[int, str] = Settings.LOG_LEVEL, log_file: Optional[str] = None) -> logging.Logger:
+    """配置根日志器（服务进程入口调用）"""
+    return install(None, level, log_file)
+
+
+def shutdown_logging():
+    """写出队列中剩余的日志（os._exit 等跳过 atexit 的退出路径前调用）"""
+    with _state.lock:
+        _state.stop()
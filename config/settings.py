@@ -15,34 +15,187 @@ class Settings:
     # ========== API Keys ==========
     DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY")
     LANGSMITH_API_KEY = os.getenv("LANGSMITH_API_KEY")
+    WIND_API_KEY = os.getenv("WIND_API_KEY")
+    ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")  # 管理接口令牌（请求头 X-Admin-Token），未配置时管理接口不可用
+
+    # ========== API Endpoints ==========
+    DEEPSEEK_API_BASE = os.getenv("DEEPSEEK_API_BASE", "https://api.deepseek.com/v1")
+    WIND_API_BASE = os.getenv("WIND_API_BASE", "https://api.wind.com.cn/data/v3")
 
     # ========== Model Configuration ==========
     MODEL_PROVIDER = ModelProvider.DEEPSEEK  # 核心切换点
 
     # DeepSeek模型参数（最新可用模型）
     EMBEDDING_MODEL = "deepseek-embedding"  # 官方API提供的embedding模型
+    LOCAL_EMBEDDING_MODEL = "BAAI/bge-small-zh-v1.5"  # 本地检索/评估使用的中文embedding模型
+    EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")  # torch | onnx（int8量化，需先导出）
     LLM_MODEL = "deepseek-chat"  # 官方API提供的对话模型
     LLM_TEMPERATURE = 0.3  # 控制生成随机性
     LLM_MAX_TOKENS = 4096  # 最大token限制
 
+    # DeepSeek配额（所有进程共享）
+    DEEPSEEK_RPM = int(os.getenv("DEEPSEEK_RPM", "60"))  # 每分钟请求数
+    DEEPSEEK_TPM = int(os.getenv("DEEPSEEK_TPM", "200000"))  # 每分钟token数
+    RATE_LIMIT_MAX_WAIT_SEC = 120  # 等待配额的最长时间
+
     # ========== Paths ==========
     DATA_DIR = os.path.join(os.path.dirname(__file__), "../data")
-    VECTOR_DB_PATH = os.path.join(DATA_DIR, "vector_db/chroma")  # 区分不同embedding模型
+    VECTOR_DB_PATH = os.getenv("VECTOR_DB_PATH", os.path.join(DATA_DIR, "vector_db/chroma"))  # 区分不同embedding模型
+    EVAL_DIR = os.path.join(DATA_DIR, "eval")  # 评估集与评估报告
+    CHART_CACHE_DIR = os.path.join(DATA_DIR, "charts")  # 图表渲染缓存
+    REPORT_STORE_DIR = os.path.join(DATA_DIR, "reports")  # 历史报告（按公司/行业/日期版本化）
+    ONNX_EMBEDDING_DIR = os.getenv("ONNX_EMBEDDING_DIR", os.path.join(DATA_DIR, "models/bge-small-zh-v1.5-onnx"))
+    ONNX_EMBEDDING_FILE = "model_int8.onnx"
+    RATE_LIMIT_STATE_DIR = os.getenv("RATE_LIMIT_STATE_DIR", os.path.join(DATA_DIR, "run"))  # 跨进程限流状态
 
     # ========== RAG Parameters ==========
     RETRIEVE_TOP_K = 5  # 检索返回的文档数量
     SIMILARITY_THRESHOLD = 0.75  # 相似度阈值
+    LEXICAL_WEIGHT = 0.1  # 查询词命中比例对排序的加权（0 表示仅按向量相似度排序）
+
+    # ========== Vector Index ==========
+    VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma")  # chroma | faiss | numpy（小语料精确检索）
+    VECTOR_COLLECTION = "langchain"  # 与 LangChain 建立的历史知识库集合名一致
+    INDEX_PARAMS = {  # 索引构建/检索参数（构建参数仅在新建索引时生效）
+        "chroma": {"space": "cosine", "max_neighbors": 16, "ef_construction": 200, "ef_search": 64},
+        "faiss": {"type": "hnsw", "M": 32, "ef_construction": 200, "ef_search": 64, "nlist": 256, "nprobe": 16},
+        "numpy": {}
+    }
+    SHARD_SEARCH_WORKERS = 4  # 跨行业分片并发检索线程数
+    VECTOR_SNAPSHOT_DIR = os.getenv("VECTOR_SNAPSHOT_DIR", os.path.join(DATA_DIR, "vector_db/snapshots"))
+    SNAPSHOT_WATCH_INTERVAL_SEC = 10  # 轮询 CURRENT 的间隔（0 关闭自动切换）
+    SNAPSHOT_DRAIN_TIMEOUT_SEC = 60  # 切换后等待旧快照查询完成的最长时间
+    SNAPSHOT_KEEP = 3  # 保留的快照数量
+
+    # ========== Token Budget ==========
+    PROMPT_TOKEN_BUDGETS = {  # 各Agent单次提示词token预算
+        "default": 6000,
+        "行业研究Agent": 8000,
+        "风控审查Agent": 6000,
+        "报告生成Agent": 8000
+    }
+    MIN_INPUT_TOKENS = 256  # 系统提示词超出预算时，用户输入至少保留的token数
+    RETRIEVAL_TOKEN_BUDGET = 3000  # 检索片段装入上下文的token上限
+    TOOL_OUTPUT_MAX_TOKENS = 1500  # 工具输出超过此值时压缩
+
+    # ========== Tool Prefetch & Memo ==========
+    PREFETCH_WORKERS = 4  # 推测预取工具调用的线程数
+    TOOL_MEMO_DEFAULT = {"ttl": 300, "max_entries": 64}  # 请求级工具备忘录：结果有效期（秒）与条目上限
+    TOOL_MEMO_POLICIES = {
+        "query_knowledge_base": {"ttl": 600, "max_entries": 128},
+        "fetch_financial_data": {"ttl": 120, "max_entries": 16}
+    }
+
+    # ========== Crew Pool ==========
+    CREW_POOL_SIZE = int(os.getenv("CREW_POOL_SIZE", "4"))  # 单进程内可并行的分析数（crew实例按需创建）
+    CREW_POOL_ACQUIRE_TIMEOUT = 300  # 实例全部占用时的最长等待（秒）
+    CREW_POOL_MAX_USES = 50  # 实例复用次数上限，达到后重建
+
+    # ========== Report Rendering ==========
+    CHART_RENDER_WORKERS = 2  # 图表渲染进程数
+    CHART_CACHE_SIZE = 256  # 内存中缓存的图表数量
+    CHART_DISK_CACHE_SIZE = 5000  # 磁盘上保留的图表数量（按最近使用淘汰）
+    ARTIFACT_URL_PREFIX = "/artifacts"  # 图表以引用形式返回的地址前缀
+    REPORT_SECTION_INPUTS = {  # 报告章节依赖的输入，输入变化时仅重新生成相关章节
+        "核心财务指标": ["financials"],
+        "行业对比分析": ["knowledge"],
+        "风险提示": ["financials", "knowledge"],
+        "数据来源说明": ["financials", "knowledge"]
+    }
+    REPORT_SECTION_ROUTES = {"数据来源说明": "simple"}  # 章节重新生成的路由，未配置的章节走 DeepSeek
+
+    # ========== API Responses ==========
+    COMPRESSION_MIN_SIZE = 1024  # 超过该字节数的文本响应才压缩
+    GZIP_LEVEL = 6
+    BROTLI_QUALITY = 5  # 兼顾压缩率与CPU开销
+
+    # ========== Deployment ==========
+    SERVE_MODE = os.getenv("SERVE_MODE", "single")  # single | prefork | embed-service
+    SERVE_WORKERS = int(os.getenv("SERVE_WORKERS", "2"))
+    SERVE_HOST = os.getenv("SERVE_HOST", "0.0.0.0")
+    SERVE_PORT = int(os.getenv("SERVE_PORT", "8000"))
+    USE_EMBEDDING_SERVICE = os.getenv("USE_EMBEDDING_SERVICE", "false").lower() == "true"  # 由启动器设置
+    EMBEDDING_SOCKET_PATH = os.getenv("EMBEDDING_SOCKET_PATH", os.path.join(DATA_DIR, "run/embedding.sock"))
+    EMBEDDING_SERVICE_MAX_BATCH = 64  # embedding服务单次前向的最大文本数
+    _embedding_model = None
+
+    # ========== Embedding Batching ==========
+    EMBEDDING_BATCH_MAX_SIZE = 32  # 查询向量化单批最大条数（1 表示关闭微批）
+    EMBEDDING_BATCH_MAX_WAIT_MS = 5  # 首条查询到达后等待后续查询的最长时间
+    EMBEDDING_QUERY_TIMEOUT_SEC = 30  # 单条查询等待向量化结果的最长时间
+    EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", "0"))  # CPU推理线程数（0 使用torch默认）
+
+    # ========== Digi-Key Scraper ==========
+    DIGIKEY_BASE_URL = "https://www.digikey.com"
+    DIGIKEY_CACHE_DIR = os.path.join(DATA_DIR, "cache/digikey")  # 详情页HTTP缓存（ETag/Last-Modified）
+    DIGIKEY_CONCURRENCY_PER_HOST = 4  # 单主机并发请求数
+    DIGIKEY_MIN_INTERVAL_SEC = 0.5  # 同一主机相邻请求最小间隔
+    DIGIKEY_TIMEOUT = 10
+    DIGIKEY_USER_AGENT = "financial-agent/1.0 (+research crawler)"
+
+    # ========== Logging ==========
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+    LOG_FORMAT = os.getenv("LOG_FORMAT", "json")  # json | text
+    LOG_DIR = os.path.join(DATA_DIR, "logs")
+    LOG_QUEUE_SIZE = 10000  # 日志队列容量，写满时丢弃（不阻塞请求线程）
+    LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0.01"))  # DEBUG及热点日志的采样比例
+
+    # ========== Monitoring ==========
+    COLLECTOR_HOST = "127.0.0.1"  # 本地监控采集器地址
+    COLLECTOR_PORT = int(os.getenv("COLLECTOR_PORT", "9125"))
+    MONITOR_WINDOW_SEC = 300  # 滚动统计窗口
+    MONITOR_BUFFER_SIZE = 10000  # 每个指标的环形缓冲区容量
+    ALERT_COOLDOWN_SEC = 60  # 同一指标重复报警间隔
+    PROFILE_ANALYSIS = os.getenv("PROFILE_ANALYSIS", "false").lower() == "true"  # 所有分析请求开启剖析（单个请求用 X-Profile 头）
+    PROFILE_INTERVAL_MS = 5  # 调用栈采样间隔
+    PROFILE_DIR = os.path.join(DATA_DIR, "profiles")
+    PROFILE_KEEP = 200  # 保留最近的剖析结果数
+    ALERT_THRESHOLDS = {  # 按事件名配置，未配置的使用default
+        "default": {"p95_ms": 5000, "error_rate": 0.2, "min_samples": 5},
+        "analyze": {"p95_ms": 120000, "p99_ms": 300000, "error_rate": 0.2, "min_samples": 3},
+        "analyze.llm": {"p95_ms": 90000, "min_samples": 3},
+        "analyze.retrieval": {"p95_ms": 2000, "min_samples": 5}
+    }
 
     # ========== Experimental Features ==========
-    USE_LOCAL_LLM = False  # 是否启用本地备用模型
+    USE_LOCAL_LLM = os.getenv("USE_LOCAL_LLM", "false").lower() == "true"  # 简单步骤路由到本地模型
+
+    # ========== Model Routing ==========
+    LOCAL_LLM_BASE = os.getenv("LOCAL_LLM_BASE", "http://127.0.0.1:8080/v1")  # llama.cpp等OpenAI兼容服务
+    LOCAL_LLM_MODEL = os.getenv("LOCAL_LLM_MODEL", "qwen2.5-1.5b-instruct")
+    LOCAL_LLM_TIMEOUT = 20
+    ROUTER_SIMPLE_MAX_TOKENS = 800  # 超过此长度的提示词视为复杂步骤
+    ROUTER_COMPLEX_KEYWORDS = ["分析", "评估", "审查", "风险", "报告", "对比", "预测"]
+    DEEPSEEK_PRICE_PER_M_TOKENS = {"input": 2.0, "output": 8.0}  # 元/百万token，用于估算节省费用
 
     @classmethod
     def get_embedding_model(cls):
-        """根据配置返回embedding模型实例"""
+        """根据配置返回embedding模型实例（启用embedding服务时返回远程客户端）"""
+        if cls.USE_EMBEDDING_SERVICE:
+            from knowledge_base.embedding_service import RemoteEmbeddings
+            return RemoteEmbeddings(cls.EMBEDDING_SOCKET_PATH)
+        return cls.load_embedding_model()
+
+    @classmethod
+    def shared_embedding_model(cls):
+        """进程内共享的embedding模型（prefork模式下由父进程预加载）"""
+        if cls._embedding_model is None:
+            cls._embedding_model = cls.get_embedding_model()
+        return cls._embedding_model
+
+    @classmethod
+    def load_embedding_model(cls, backend: str = None):
+        """在当前进程加载本地embedding模型"""
+        if (backend or cls.EMBEDDING_BACKEND) == "onnx":
+            from knowledge_base.onnx_embeddings import OnnxEmbeddings
+            return OnnxEmbeddings(cls.ONNX_EMBEDDING_DIR, cls.ONNX_EMBEDDING_FILE)
         if cls.MODEL_PROVIDER == ModelProvider.DEEPSEEK:
             from langchain_community.embeddings import HuggingFaceEmbeddings
+            if cls.EMBEDDING_THREADS:
+                import torch
+                torch.set_num_threads(cls.EMBEDDING_THREADS)
             return HuggingFaceEmbeddings(
-                model_name="BAAI/bge-small-zh-v1.5",  # 中文优化的小模型
+                model_name=cls.LOCAL_EMBEDDING_MODEL,  # 中文优化的小模型
                 model_kwargs={"device": "cpu"},
                 encode_kwargs={"normalize_embeddings": True}
             )
@@ -1,4 +1,5 @@
 from .monitor import monitor
 from .metrics import EvaluationMetrics
+from .instrumentation import registry, timed
 
-__all__ = ["monitor", "EvaluationMetrics"]
\ No newline at end of file
+__all__ = ["monitor", "EvaluationMetrics", "registry", "timed"]
\ No newline at end of file
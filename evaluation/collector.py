@@ -0,0 +1,186 @@
+"""
+本地事件驱动监控采集器（无需 LangSmith）：
+1. 应用通过本地 UDP 推送运行事件（发送即返回，采集器未启动时静默丢弃）
+2. 采集器在内存环形缓冲区中维护滚动窗口 p50/p95/p99
+3. 每条事件到达即检查阈值，秒级触发报警
+"""
+import json
+import logging
+import math
+import socket
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+from config.settings import Settings
+
+logger = logging.getLogger(__name__)
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """最近秩法计算百分位（输入需已排序）"""
+    if not sorted_values:
+        return 0.0
+    idx = max(0, math.ceil(pct / 100 * len(sorted_values)) - 1)
+    return sorted_values[idx]
+
+
+class RollingWindow:
+    """基于环形缓冲区的滚动时间窗口"""
+
+    def __init__(self, window_sec: int, max_events: int):
+        self.window_sec = window_sec
+        self.events: Deque[Tuple[float, float, bool]] = deque(maxlen=max_events)
+        self._lock = threading.Lock()
+
+    def add(self, ts: float, latency_ms: float, error: bool):
+        with self._lock:
+            self.events.append((ts, latency_ms, error))
+
+    def stats(self, now: Optional[float] = None) -> Dict:
+        """计算窗口内的计数、错误率与延迟百分位"""
+        cutoff = (now or time.time()) - self.window_sec
+        with self._lock:
+            while self.events and self.events[0][0] < cutoff:
+                self.events.popleft()
+            events = list(self.events)
+        latencies = sorted(e[1] for e in events)
+        errors = sum(1 for e in events if e[2])
+        return {
+            "count": len(events),
+            "error_rate": errors / len(events) if events else 0.0,
+            "p50_ms": percentile(latencies, 50),
+            "p95_ms": percentile(latencies, 95),
+            "p99_ms": percentile(latencies, 99)
+        }
+
+
+class MetricsCollector:
+    """运行事件采集与阈值报警"""
+
+    def __init__(
+            self,
+            window_sec: int = Settings.MONITOR_WINDOW_SEC,
+            max_events: int = Settings.MONITOR_BUFFER_SIZE,
+            thresholds: Dict[str, Dict[str, float]] = None,
+            alert_cooldown_sec: int = Settings.ALERT_COOLDOWN_SEC
+    ):
+        self.window_sec = window_sec
+        self.max_events = max_events
+        self.thresholds = thresholds or Settings.ALERT_THRESHOLDS
+        self.alert_cooldown_sec = alert_cooldown_sec
+        self.windows: Dict[str, RollingWindow] = {}
+        self.alert_handlers: List[Callable[[str, Dict], None]] = []
+        self._last_alert: Dict[Tuple[str, str], float] = {}
+        self._lock = threading.Lock()
+
+    def _window(self, key: str) -> RollingWindow:
+        window = self.windows.get(key)
+        if window is None:
+            with self._lock:
+                window = self.windows.setdefault(key, RollingWindow(self.window_sec, self.max_events))
+        return window
+
+    def ingest(self, event: Dict):
+        """
+        接收一条运行事件
+        :param event: {"name": str, "latency_ms": float, "status": "success"|"error",
+                       "ts": float, "stages": {stage: latency_ms}}
+        """
+        ts = event.get("ts") or time.time()
+        error = event.get("status") == "error"
+        name = event["name"]
+        self._window(name).add(ts, float(event["latency_ms"]), error)
+        self._check(name, ts)
+
+        for stage, latency_ms in (event.get("stages") or {}).items():
+            key = f"{name}.{stage}"
+            self._window(key).add(ts, float(latency_ms), False)
+            self._check(key, ts)
+
+    def _check(self, key: str, now: float):
+        limits = self.thresholds.get(key) or self.thresholds["default"]
+        stats = self._window(key).stats(now)
+        if stats["count"] < limits.get("min_samples", 1):
+            return
+        for metric, limit in limits.items():
+            if metric == "min_samples" or stats.get(metric, 0) <= limit:
+                continue
+            last = self._last_alert.get((key, metric), 0)
+            if now - last < self.alert_cooldown_sec:
+                continue
+            self._last_alert[(key, metric)] = now
+            message = f"{key} {metric}={stats[metric]:.2f} 超过阈值 {limit}"
+            for handler in self.alert_handlers:
+                try:
+                    handler(message, stats)
+                except Exception as e:
+                    logger.error(f"报警处理失败: {e}")
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """所有窗口的当前统计"""
+        now = time.time()
+        return {key: window.stats(now) for key, window in list(self.windows.items())}
+
+
+class CollectorServer:
+    """本地 UDP 事件接收服务（后台线程）"""
+
+    def __init__(self, collector: MetricsCollector,
+                 host: str = Settings.COLLECTOR_HOST, port: int = Settings.COLLECTOR_PORT):
+        self.collector = collector
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind((host, port))
+        self.sock.settimeout(1.0)
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._serve, name="metrics-collector", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        logger.info("监控采集器已启动: udp://%s:%d", *self.sock.getsockname())
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join(timeout=2)
+        self.sock.close()
+
+    def _serve(self):
+        while not self._stopped.is_set():
+            try:
+                payload, _ = self.sock.recvfrom(65536)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            try:
+                self.collector.ingest(json.loads(payload))
+            except (ValueError, KeyError) as e:
+                logger.warning(f"无效监控事件: {e}")
+
+
+class EventEmitter:
+    """应用侧事件推送（非阻塞 UDP，发送失败不影响请求）"""
+
+    def __init__(self, host: str = Settings.COLLECTOR_HOST, port: int = Settings.COLLECTOR_PORT):
+        self.address = (host, port)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setblocking(False)
+
+    def emit(self, name: str, latency_ms: float, status: str = "success",
+             stages: Optional[Dict[str, float]] = None):
+        event = {
+            "name": name,
+            "latency_ms": latency_ms,
+            "status": status,
+            "ts": time.time(),
+            "stages": stages or {}
+        }
+        try:
+            self.sock.sendto(json.dumps(event, ensure_ascii=False).encode(), self.address)
+        except OSError as e:
+            logger.debug(f"监控事件发送失败: {e}")
+
+
+# 单例模式
+emitter = EventEmitter()
@@ -0,0 +1,273 @@
+"""
+进程内性能埋点：
+1. 低开销直方图记录各热点阶段耗时（LLM、检索、向量化、万得、工具调用）
+2. 按请求记录调用链耗时明细
+3. 以 Prometheus 文本格式导出指标
+"""
+import bisect
+import itertools
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Dict, List, Optional, Tuple
+
+# 延迟分桶（秒），覆盖毫秒级检索到分钟级LLM调用
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """固定分桶直方图（线程安全，observe 为 O(log n)）"""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[idx] += 1
+            self.sum += value
+            self.count += 1
+
+    def snapshot(self) -> Tuple[List[int], float, int]:
+        with self._lock:
+            return list(self.counts), self.sum, self.count
+
+
+class MetricsRegistry:
+    """指标注册表：直方图、计数器、仪表盘"""
+
+    def __init__(self, namespace: str = "financial_agent"):
+        self.namespace = namespace
+        self._histograms: Dict[str, Dict[LabelKey, Histogram]] = {}
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._gauges: Dict[str, Dict[LabelKey, float]] = {}
+        self._help: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(labels: Optional[Dict[str, str]]) -> LabelKey:
+        return tuple(sorted((labels or {}).items()))
+
+    def observe(self, name: str, value: float, labels: Dict[str, str] = None, help_text: str = ""):
+        """记录一次直方图观测"""
+        key = self._key(labels)
+        series = self._histograms.get(name, {}).get(key)
+        if series is None:
+            with self._lock:
+                series = self._histograms.setdefault(name, {}).setdefault(key, Histogram())
+                self._help.setdefault(name, help_text)
+        series.observe(value)
+
+    def inc(self, name: str, value: float = 1.0, labels: Dict[str, str] = None, help_text: str = ""):
+        """计数器累加"""
+        key = self._key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + value
+            self._help.setdefault(name, help_text)
+
+    def set_gauge(self, name: str, value: float, labels: Dict[str, str] = None, help_text: str = ""):
+        """设置仪表盘当前值"""
+        with self._lock:
+            self._gauges.setdefault(name, {})[self._key(labels)] = value
+            self._help.setdefault(name, help_text)
+
+    @staticmethod
+    def _fmt_labels(key: LabelKey, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+        pairs = key + extra
+        if not pairs:
+            return ""
+        body = ",".join(f'{k}="{str(v).replace(chr(34), chr(39))}"' for k, v in pairs)
+        return "{" + body + "}"
+
+    def render(self) -> str:
+        """导出 Prometheus 文本格式 (text/plain; version=0.0.4)"""
+        lines = []
+        with self._lock:
+            counters = {n: dict(s) for n, s in self._counters.items()}
+            gauges = {n: dict(s) for n, s in self._gauges.items()}
+            histograms = {n: dict(s) for n, s in self._histograms.items()}
+
+        for kind, metrics in (("counter", counters), ("gauge", gauges)):
+            for name, series in metrics.items():
+                full = f"{self.namespace}_{name}"
+                lines.append(f"# HELP {full} {self._help.get(name, '')}")
+                lines.append(f"# TYPE {full} {kind}")
+                for key, value in series.items():
+                    lines.append(f"{full}{self._fmt_labels(key)} {value}")
+
+        for name, series in histograms.items():
+            full = f"{self.namespace}_{name}"
+            lines.append(f"# HELP {full} {self._help.get(name, '')}")
+            lines.append(f"# TYPE {full} histogram")
+            for key, hist in series.items():
+                counts, total, count = hist.snapshot()
+                cumulative = 0
+                for bound, c in zip(hist.buckets, counts):
+                    cumulative += c
+                    lines.append(f"{full}_bucket{self._fmt_labels(key, (('le', str(bound)),))} {cumulative}")
+                lines.append(f"{full}_bucket{self._fmt_labels(key, (('le', '+Inf'),))} {count}")
+                lines.append(f"{full}_sum{self._fmt_labels(key)} {total}")
+                lines.append(f"{full}_count{self._fmt_labels(key)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+class RequestTrace:
+    """单次请求的调用链耗时记录"""
+
+    def __init__(self, request_id: Optional[str] = None):
+        self.request_id = request_id or uuid.uuid4().hex
+        self.started = time.perf_counter()
+        self.spans: List[Dict] = []
+        self.profiling = False  # 开启后记录参与该请求的线程，供采样剖析（evaluation/profiler.py）
+        self._threads: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def add_span(self, stage: str, name: str, start: float, duration: float, error: bool = False,
+                 span_id: Optional[int] = None, parent_id: Optional[int] = None):
+        with self._lock:
+            self.spans.append({
+                "id": span_id,
+                "parent": parent_id,
+                "stage": stage,
+                "name": name,
+                "offset_ms": round((start - self.started) * 1000, 2),
+                "duration_ms": round(duration * 1000, 2),
+                "error": error
+            })
+
+    def enter_thread(self):
+        """当前线程开始为该请求工作（可嵌套）"""
+        ident = threading.get_ident()
+        with self._lock:
+            self._threads[ident] = self._threads.get(ident, 0) + 1
+
+    def exit_thread(self):
+        ident = threading.get_ident()
+        with self._lock:
+            depth = self._threads.get(ident, 0) - 1
+            if depth > 0:
+                self._threads[ident] = depth
+            else:
+                self._threads.pop(ident, None)
+
+    def active_threads(self) -> List[int]:
+        with self._lock:
+            return list(self._threads)
+
+    def summary(self) -> Dict:
+        """按阶段汇总耗时，附带明细"""
+        stages: Dict[str, Dict] = {}
+        with self._lock:
+            spans = list(self.spans)
+        for span in spans:
+            stat = stages.setdefault(span["stage"], {"count": 0, "total_ms": 0.0})
+            stat["count"] += 1
+            stat["total_ms"] = round(stat["total_ms"] + span["duration_ms"], 2)
+        return {
+            "request_id": self.request_id,
+            "total_ms": round((time.perf_counter() - self.started) * 1000, 2),
+            "stages": stages,
+            "spans": spans
+        }
+
+
+_current_trace: ContextVar[Optional[RequestTrace]] = ContextVar("request_trace", default=None)
+_current_span: ContextVar[Optional[int]] = ContextVar("trace_span", default=None)
+_span_ids = itertools.count(1)
+
+
+def current_trace() -> Optional[RequestTrace]:
+    """获取当前请求的调用链（无请求上下文时为 None）"""
+    return _current_trace.get()
+
+
+@contextmanager
+def start_trace(trace: Optional[RequestTrace] = None):
+    """在当前上下文中开启请求级调用链记录"""
+    trace = trace or RequestTrace()
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+class timed:
+    """
+    阶段耗时埋点（可作装饰器或上下文管理器）
+    用法:
+        @timed("llm")
+        def _call(...): ...
+
+        with timed("tool", "query_knowledge_base"):
+            ...
+    """
+
+    def __init__(self, stage: str, name: Optional[str] = None):
+        self.stage = stage
+        self.name = name or stage
+        self._start = 0.0
+        self._trace: Optional[RequestTrace] = None
+        self._span_id: Optional[int] = None
+        self._parent_id: Optional[int] = None
+        self._token = None
+
+    def __enter__(self):
+        self._trace = _current_trace.get()
+        if self._trace is not None:  # 记录嵌套关系，构成调用链时间树
+            self._span_id = next(_span_ids)
+            self._parent_id = _current_span.get()
+            self._token = _current_span.set(self._span_id)
+            if self._trace.profiling:
+                self._trace.enter_thread()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self._start
+        if self._token is not None:
+            _current_span.reset(self._token)
+            if self._trace.profiling:
+                self._trace.exit_thread()
+        record_stage(self.stage, self.name, self._start, duration, error=exc_type is not None,
+                     span_id=self._span_id, parent_id=self._parent_id)
+        return False
+
+    def __call__(self, func):
+        name = self.name if self.name != self.stage else func.__qualname__
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with timed(self.stage, name):  # 每次调用独立实例（装饰器实例被多线程共享）
+                return func(*args, **kwargs)
+
+        return wrapper
+
+
+def record_stage(stage: str, name: str, start: float, duration: float, error: bool = False,
+                 span_id: Optional[int] = None, parent_id: Optional[int] = None):
+    """记录阶段耗时到全局直方图与当前请求调用链"""
+    registry.observe(
+        "stage_duration_seconds", duration,
+        {"stage": stage, "name": name},
+        help_text="热点阶段耗时（秒）"
+    )
+    if error:
+        registry.inc("stage_errors_total", labels={"stage": stage, "name": name}, help_text="阶段异常次数")
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add_span(stage, name, start, duration, error, span_id, parent_id)
+
+
+# 单例模式
+registry = MetricsRegistry()
@@ -1,15 +1,41 @@
-from typing import Dict, List
+from typing import Dict, List, Optional
 import numpy as np
-from sklearn.metrics import precision_score
+from config.settings import Settings
+
+
+def cosine_rows(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """逐行余弦相似度（单次矩阵运算）"""
+    a = a / np.clip(np.linalg.norm(a, axis=1, keepdims=True), 1e-12, None)
+    b = b / np.clip(np.linalg.norm(b, axis=1, keepdims=True), 1e-12, None)
+    return np.einsum("ij,ij->i", a, b)
 
 
 class EvaluationMetrics:
-    @staticmethod
-    def correctness(ground_truth: str, prediction: str) -> float:
+    _embedding_model = None
+
+    @classmethod
+    def embedding_model(cls):
+        """复用同一个embedding模型实例"""
+        if cls._embedding_model is None:
+            cls._embedding_model = Settings.get_embedding_model()
+        return cls._embedding_model
+
+    @classmethod
+    def correctness(cls, ground_truth: str, prediction: str) -> float:
         """内容准确性评估（基于文本相似度）"""
-        from sentence_transformers import util
-        embeddings = Settings.embedding_model.encode([ground_truth, prediction])
-        return util.cos_sim(embeddings[0], embeddings[1]).item()
+        return float(cls.batch_correctness([ground_truth], [prediction])[0])
+
+    @classmethod
+    def batch_correctness(cls, truths: List[str], predictions: List[str],
+                          embeddings: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        批量准确性评估：一次前向编码全部文本，逐行计算余弦相似度
+        :param embeddings: 预先计算好的向量（前半为truths，后半为predictions）
+        """
+        if embeddings is None:
+            embeddings = np.asarray(cls.embedding_model().embed_documents(list(truths) + list(predictions)))
+        n = len(truths)
+        return cosine_rows(embeddings[:n], embeddings[n:])
 
     @staticmethod
     def safety_score(output: str, banned_phrases: List[str]) -> float:
@@ -35,7 +61,9 @@ class EvaluationMetrics:
     def composite_score(cls, test_cases: List[Dict]) -> Dict:
         """综合评分（加权平均）"""
         scores = {
-            "correctness": np.mean([cls.correctness(tc["truth"], tc["pred"]) for tc in test_cases]),
+            "correctness": float(np.mean(cls.batch_correctness(
+                [tc["truth"] for tc in test_cases], [tc["pred"] for tc in test_cases]
+            ))),
             "safety": np.mean([cls.safety_score(tc["pred"], tc.get("banned", [])) for tc in test_cases]),
             "consistency": np.mean([cls.financial_consistency(tc.get("data", {})) for tc in test_cases])
         }
@@ -1,17 +1,23 @@
-from langsmith import Client
 from config.settings import Settings
 import logging
-from datetime import datetime
+from datetime import datetime, timedelta
+
+try:
+    from langsmith import Client
+except ImportError:  # LangSmith为可选依赖，本地监控见 evaluation/collector.py
+    Client = None
 
 logger = logging.getLogger(__name__)
 
 class AgentMonitor:
     def __init__(self):
-        self.client = Client(api_key=Settings.LANGSMITH_API_KEY)
+        self.client = Client(api_key=Settings.LANGSMITH_API_KEY) if Client and Settings.LANGSMITH_API_KEY else None
         self.project_name = f"financial_agent_{datetime.now().strftime('%Y%m')}"
 
     def log_run(self, agent_name: str, inputs: dict, outputs: dict, tags: list = None):
         """记录Agent运行轨迹到LangSmith"""
+        if self.client is None:
+            return
         try:
             self.client.create_run(
                 project_name=self.project_name,
@@ -29,6 +35,8 @@ class AgentMonitor:
 
     def get_agent_stats(self, agent_name: str, days: int = 7):
         """获取Agent历史运行指标"""
+        if self.client is None:
+            return {"total_runs": 0, "avg_latency": 0}
         runs = self.client.list_runs(
             project_name=self.project_name,
             execution_order=1,
@@ -0,0 +1,154 @@
+"""
+分析请求性能剖析（按需开启：X-Profile 请求头或 PROFILE_ANALYSIS）：
+1. 后台线程定时采样参与该请求的线程调用栈，汇总为 folded stacks（flamegraph.pl / speedscope 可直接加载）
+2. 同时保存调用链时间树：LLM、检索、向量化、万得、工具调用等埋点阶段的嵌套关系与墙钟耗时
+3. 结果按请求ID保存在 PROFILE_DIR，通过 /profiles/{request_id} 获取
+"""
+import json
+import logging
+import os
+import re
+import sys
+import sysconfig
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from config.settings import Settings
+from evaluation.instrumentation import RequestTrace
+
+logger = logging.getLogger(__name__)
+
+_REQUEST_ID_RE = re.compile(r"[\w-]{1,64}")
+_PROJECT_ROOT = str(Path(__file__).resolve().parent.parent) + os.sep
+_STDLIB = sysconfig.get_paths()["stdlib"] + os.sep
+PROFILE_FILES = {"flamegraph": ".folded", "spans": ".json"}
+
+
+class SamplingProfiler:
+    def __init__(self, trace: RequestTrace, interval_ms: float = Settings.PROFILE_INTERVAL_MS):
+        self.trace = trace
+        self.interval = interval_ms / 1000
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._labels: Dict[object, str] = {}  # code 对象 → 帧标签
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            path = code.co_filename
+            if "site-packages" + os.sep in path:
+                path = path.split("site-packages" + os.sep, 1)[1]
+            elif path.startswith(_PROJECT_ROOT):
+                path = path[len(_PROJECT_ROOT):]
+            elif path.startswith(_STDLIB):
+                path = path[len(_STDLIB):]
+            label = f"{code.co_name} ({path}:{code.co_firstlineno})".replace(";", ",")
+            self._labels[code] = label
+        return label
+
+    def _fold(self, frame) -> str:
+        labels = []
+        while frame is not None:
+            labels.append(self._label(frame.f_code))
+            frame = frame.f_back
+        return ";".join(reversed(labels))
+
+    def _sample(self):
+        frames = sys._current_frames()
+        for ident in self.trace.active_threads():
+            frame = frames.get(ident)
+            if frame is not None:
+                self.stacks[self._fold(frame)] += 1
+        self.samples += 1
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+def span_tree(spans: List[Dict]) -> List[Dict]:
+    """按父子关系组织埋点阶段，附带自身耗时（扣除子阶段）"""
+    nodes = {span["id"]: {**span, "children": []} for span in spans if span.get("id") is not None}
+    roots = []
+    for node in sorted(nodes.values(), key=lambda n: n["offset_ms"]):
+        parent = nodes.get(node["parent"])
+        (parent["children"] if parent else roots).append(node)
+    for node in nodes.values():
+        child_ms = sum(child["duration_ms"] for child in node["children"])
+        node["self_ms"] = round(max(node["duration_ms"] - child_ms, 0.0), 2)  # 子阶段并行时可能超过父阶段
+    return roots
+
+
+class ProfileStore:
+    def __init__(self, root: str = Settings.PROFILE_DIR, keep: int = Settings.PROFILE_KEEP):
+        self.root = Path(root)
+        self.keep = keep
+
+    def path(self, request_id: str, view: str = "flamegraph") -> Optional[Path]:
+        if not _REQUEST_ID_RE.fullmatch(request_id) or view not in PROFILE_FILES:
+            return None
+        path = self.root / f"{request_id}{PROFILE_FILES[view]}"
+        return path if path.exists() else None
+
+    def save(self, trace: RequestTrace, profiler: SamplingProfiler) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        summary = trace.summary()
+        (self.root / f"{trace.request_id}.folded").write_text(profiler.folded(), encoding="utf-8")
+        (self.root / f"{trace.request_id}.json").write_text(json.dumps({
+            "request_id": trace.request_id,
+            "total_ms": summary["total_ms"],
+            "samples": profiler.samples,
+            "interval_ms": profiler.interval * 1000,
+            "stages": summary["stages"],
+            "spans": span_tree(summary["spans"])
+        }, ensure_ascii=False, indent=2), encoding="utf-8")
+        logger.info(f"剖析结果已保存: {trace.request_id} (采样 {profiler.samples} 次)")
+        self._prune()
+
+    def _prune(self):
+        files = sorted(self.root.glob("*.json"), key=lambda p: p.stat().st_mtime)
+        for old in files[:-self.keep]:
+            for suffix in PROFILE_FILES.values():
+                old.with_suffix(suffix).unlink(missing_ok=True)
+
+
+@contextmanager
+def profiling(trace: RequestTrace, enabled: bool = True):
+    """在请求范围内采样调用栈，结束时保存剖析结果"""
+    if not enabled:
+        yield None
+        return
+    profiler = SamplingProfiler(trace)
+    trace.profiling = True
+    trace.enter_thread()
+    profiler.start()
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
+        trace.exit_thread()
+        try:
+            profile_store.save(trace, profiler)
+        except OSError as e:
+            logger.error(f"剖析结果保存失败: {e}")
+
+
+# 单例模式
+profile_store = ProfileStore()
@@ -0,0 +1,187 @@
+"""
+离线评估工具：
+1. 读取JSONL评估集与各版本（提示词/模型）的预测结果
+2. 一次批量编码全部文本，向量按文本哈希缓存，未变化的文本跨运行复用
+3. 矩阵运算计算相似度；安全性/一致性检查为轻量的字符串与算术运算，直接在主进程计算
+4. 输出各版本对比表
+
+评估集格式（每行一个JSON）:
+    {"id": "case-001", "question": "...", "truth": "...", "banned": [...], "data": {...}}
+预测文件格式:
+    {"id": "case-001", "pred": "..."}
+
+用法:
+    python -m evaluation.runner --golden data/eval/golden.jsonl \\
+        --pred v1=data/eval/pred_v1.jsonl --pred v2=data/eval/pred_v2.jsonl
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from config.log_config import setup_logging
+from config.settings import Settings
+from evaluation.metrics import EvaluationMetrics, cosine_rows
+
+logger = logging.getLogger(__name__)
+
+
+def load_jsonl(path: str) -> List[Dict]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+class EmbeddingCache:
+    """按 (模型, 文本) 哈希缓存向量，持久化为 npz"""
+
+    def __init__(self, cache_dir: str, model_name: str):
+        self.model_name = model_name
+        self.path = Path(cache_dir) / f"{hashlib.sha1(model_name.encode()).hexdigest()[:12]}.npz"
+        self.vectors: Dict[str, np.ndarray] = {}
+        self._dirty = False
+        if self.path.exists():
+            data = np.load(self.path)
+            self.vectors = dict(zip(data["keys"].tolist(), data["vectors"]))
+
+    def key(self, text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def encode(self, texts: List[str], model) -> np.ndarray:
+        """返回全部文本的向量，仅对未缓存文本执行一次批量编码"""
+        keys = [self.key(t) for t in texts]
+        missing = {}
+        for k, t in zip(keys, texts):
+            if k not in self.vectors:
+                missing.setdefault(k, t)
+        if missing:
+            logger.info("批量编码 %d 条文本（缓存命中 %d 条）", len(missing), len(texts) - len(missing))
+            encoded = model.embed_documents(list(missing.values()))
+            for k, vec in zip(missing.keys(), encoded):
+                self.vectors[k] = np.asarray(vec, dtype=np.float32)
+            self._dirty = True
+        return np.stack([self.vectors[k] for k in keys])
+
+    def save(self):
+        if not self._dirty:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        keys = list(self.vectors.keys())
+        np.savez(self.path, keys=np.array(keys), vectors=np.stack([self.vectors[k] for k in keys]))
+        self._dirty = False
+
+
+def _score_case(case: Tuple[str, List[str], Dict]) -> Tuple[float, float]:
+    """单条用例的安全性与一致性评分"""
+    pred, banned, data = case
+    safety = EvaluationMetrics.safety_score(pred, banned)
+    try:
+        consistency = EvaluationMetrics.financial_consistency(data) if data else float("nan")
+    except (KeyError, TypeError, ZeroDivisionError):
+        consistency = 0.0
+    return safety, consistency
+
+
+class EvaluationRunner:
+    def __init__(self, golden_path: str, cache_dir: str = None):
+        self.golden = load_jsonl(golden_path)
+        self.cache = EmbeddingCache(cache_dir or os.path.join(Settings.EVAL_DIR, "cache"),
+                                    f"{Settings.LOCAL_EMBEDDING_MODEL}:{Settings.EMBEDDING_BACKEND}")
+
+    def evaluate(self, predictions: Dict[str, str]) -> Dict[str, Dict]:
+        """
+        评估多个版本
+        :param predictions: {版本名: 预测文件路径}
+        :return: {版本名: {"n", "correctness", "safety", "consistency", "overall"}}
+        """
+        by_id = {case["id"]: case for case in self.golden}
+        version_cases = {}
+        for version, path in predictions.items():
+            preds = {p["id"]: p["pred"] for p in load_jsonl(path)}
+            version_cases[version] = [(by_id[i], preds[i]) for i in by_id if i in preds]
+
+        # 全部版本的真值与预测一次批量编码
+        texts = []
+        for cases in version_cases.values():
+            texts.extend(case["truth"] for case, _ in cases)
+            texts.extend(pred for _, pred in cases)
+        embeddings = self.cache.encode(texts, EvaluationMetrics.embedding_model()) if texts else None
+        self.cache.save()
+
+        results, offset = {}, 0
+        for version, cases in version_cases.items():
+            n = len(cases)
+            if not n:
+                results[version] = {"n": 0}
+                continue
+            correctness = cosine_rows(embeddings[offset:offset + n], embeddings[offset + n:offset + 2 * n])
+            offset += 2 * n
+
+            # 逐条检查开销远小于进程间序列化，直接在主进程计算
+            scored = [_score_case((pred, case.get("banned", []), case.get("data", {}))) for case, pred in cases]
+            safety = np.array([s for s, _ in scored])
+            consistency = np.array([c for _, c in scored])
+            summary = {
+                "n": n,
+                "correctness": float(np.mean(correctness)),
+                "safety": float(np.mean(safety)),
+                "consistency": float(np.nanmean(consistency)) if not np.all(np.isnan(consistency)) else None
+            }
+            consistency_score = summary["consistency"] if summary["consistency"] is not None else 1.0
+            summary["overall"] = (0.5 * summary["correctness"] + 0.3 * consistency_score
+                                  + 0.2 * summary["safety"])
+            results[version] = summary
+        return results
+
+
+def format_table(results: Dict[str, Dict]) -> str:
+    """生成Markdown对比表（以第一个版本为基线）"""
+    lines = [
+        "| 版本 | 用例数 | 准确性 | 安全性 | 一致性 | 综合 | 综合Δ |",
+        "|------|--------|--------|--------|--------|------|-------|"
+    ]
+    baseline = None
+
+    def fmt(value):
+        return "-" if value is None else f"{value:.4f}"
+
+    for version, r in results.items():
+        if not r.get("n"):
+            lines.append(f"| {version} | 0 | - | - | - | - | - |")
+            continue
+        if baseline is None:
+            baseline = r["overall"]
+        delta = r["overall"] - baseline
+        lines.append(
+            f"| {version} | {r['n']} | {fmt(r['correctness'])} | {fmt(r['safety'])} | "
+            f"{fmt(r['consistency'])} | {fmt(r['overall'])} | {delta:+.4f} |"
+        )
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    setup_logging()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--golden", default=os.path.join(Settings.EVAL_DIR, "golden.jsonl"), help="评估集路径")
+    parser.add_argument("--pred", action="append", required=True, help="版本名=预测文件路径，可重复")
+    parser.add_argument("--output", default=os.path.join(Settings.EVAL_DIR, "reports"), help="报告输出目录")
+    args = parser.parse_args()
+
+    predictions = dict(item.split("=", 1) for item in args.pred)
+    runner = EvaluationRunner(args.golden)
+    results = runner.evaluate(predictions)
+    table = format_table(results)
+    print(table)
+
+    out_dir = Path(args.output)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    (out_dir / f"compare_{stamp}.md").write_text(table + "\n", encoding="utf-8")
+    (out_dir / f"compare_{stamp}.json").write_text(
+        json.dumps(results, ensure_ascii=False, indent=2), encoding="utf-8"
+    )
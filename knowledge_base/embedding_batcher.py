@@ -0,0 +1,101 @@
+"""
+查询向量动态微批：
+1. 并发请求的查询在极短窗口内（max_wait_ms）汇聚，最多 max_batch 条合并为一次前向计算
+2. 后台线程计算后将结果分发回各等待方
+3. 记录批大小与单批耗时指标，便于调整窗口与批大小
+4. 返回条数不符或批处理异常时该批全部等待方收到异常，后台线程不会因单批失败退出
+"""
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List, Tuple
+
+from langchain_core.embeddings import Embeddings
+
+from config.settings import Settings
+from evaluation.instrumentation import registry
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingBatcher:
+    def __init__(
+            self,
+            embed_fn: Callable[[List[str]], List[List[float]]],
+            max_batch: int = Settings.EMBEDDING_BATCH_MAX_SIZE,
+            max_wait_ms: float = Settings.EMBEDDING_BATCH_MAX_WAIT_MS
+    ):
+        self.embed_fn = embed_fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._queue: "queue.Queue[Tuple[str, Future]]" = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._loop, name="embedding-batcher", daemon=True)
+                    self._thread.start()
+
+    def submit(self, text: str) -> Future:
+        self._ensure_started()
+        future = Future()
+        self._queue.put((text, future))
+        return future
+
+    def _collect(self) -> List[Tuple[str, Future]]:
+        """取第一条后在窗口期内继续收集，直到达到批大小"""
+        items = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(items) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                items.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return items
+
+    def _run_batch(self, items: List[Tuple[str, Future]]):
+        texts = [text for text, _ in items]
+        start = time.perf_counter()
+        vectors = self.embed_fn(texts)
+        if len(vectors) != len(items):
+            raise RuntimeError(f"向量化返回 {len(vectors)} 条结果，期望 {len(items)} 条")
+        registry.observe("embedding_batch_size", len(texts), help_text="查询向量化单批条数")
+        registry.observe("embedding_batch_duration_seconds", time.perf_counter() - start,
+                         help_text="查询向量化单批前向耗时（秒）")
+        for (_, future), vector in zip(items, vectors):
+            if not future.done():
+                future.set_result(vector)
+
+    def _loop(self):
+        while True:
+            items = []
+            try:
+                items = self._collect()
+                self._run_batch(items)
+            except Exception as e:  # 后台线程不能退出，否则之后的查询全部挂起
+                logger.error(f"批量向量化失败: {e}")
+                for _, future in items:
+                    if not future.done():
+                        future.set_exception(e)
+
+
+class BatchingEmbeddings(Embeddings):
+    """查询走微批，文档向量化（本身已批量）直接透传"""
+
+    def __init__(self, embeddings: Embeddings, timeout: float = Settings.EMBEDDING_QUERY_TIMEOUT_SEC,
+                 **batcher_kwargs):
+        self.embeddings = embeddings
+        self.timeout = timeout
+        self.batcher = EmbeddingBatcher(embeddings.embed_documents, **batcher_kwargs)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.batcher.submit(text).result(timeout=self.timeout)
@@ -0,0 +1,203 @@
+"""
+本地 embedding 微服务：
+1. 单进程加载 bge 模型，多个 uvicorn worker 通过 Unix socket 调用，模型只占一份内存
+2. 请求排队，窗口期内（及上一批前向计算期间）到达的请求合并为一批（单次前向）
+3. 协议：4字节长度 + JSON 请求 {"texts": [...]}；响应 4字节长度 + 状态字节 + (n, dim) + float32 向量
+
+用法:
+    python -m knowledge_base.embedding_service --socket data/run/embedding.sock
+"""
+import asyncio
+import logging
+import socket
+import struct
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+import orjson
+from langchain_core.embeddings import Embeddings
+
+from config.log_config import setup_logging
+from config.settings import Settings
+from evaluation.instrumentation import registry
+
+logger = logging.getLogger(__name__)
+
+_LENGTH = struct.Struct(">I")
+_SHAPE = struct.Struct(">II")
+STATUS_OK, STATUS_ERROR = 0, 1
+
+
+def encode_vectors(vectors: List[List[float]]) -> bytes:
+    array = np.asarray(vectors, dtype=np.float32)
+    n, dim = array.shape if array.ndim == 2 else (0, 0)
+    return bytes([STATUS_OK]) + _SHAPE.pack(n, dim) + array.tobytes()
+
+
+def decode_vectors(body: bytes) -> List[List[float]]:
+    if body[0] != STATUS_OK:
+        raise RuntimeError(f"embedding服务错误: {body[1:].decode('utf-8', 'replace')}")
+    n, dim = _SHAPE.unpack_from(body, 1)
+    return np.frombuffer(body, dtype=np.float32, offset=1 + _SHAPE.size).reshape(n, dim).tolist()
+
+
+class EmbeddingServer:
+    def __init__(self, model: Embeddings, max_batch: int = Settings.EMBEDDING_SERVICE_MAX_BATCH,
+                 max_wait_ms: float = Settings.EMBEDDING_BATCH_MAX_WAIT_MS):
+        self.model = model
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.queue: Optional[asyncio.Queue] = None
+
+    async def _batch_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            items = [await self.queue.get()]
+            size = len(items[0][0])
+            deadline = loop.time() + self.max_wait
+            while size < self.max_batch:
+                remaining = deadline - loop.time()
+                try:
+                    item = (await asyncio.wait_for(self.queue.get(), remaining) if remaining > 0
+                            else self.queue.get_nowait())
+                except (asyncio.TimeoutError, asyncio.QueueEmpty):
+                    break
+                items.append(item)
+                size += len(item[0])
+
+            texts = [text for batch, _ in items for text in batch]
+            try:
+                vectors = await loop.run_in_executor(None, self.model.embed_documents, texts)
+            except Exception as e:
+                logger.error(f"embedding计算失败: {e}")
+                for _, future in items:
+                    future.set_exception(e)
+                continue
+
+            registry.observe("embedding_service_batch_size", len(texts), help_text="embedding服务单批文本数")
+            offset = 0
+            for batch, future in items:
+                future.set_result(vectors[offset:offset + len(batch)])
+                offset += len(batch)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                try:
+                    header = await reader.readexactly(_LENGTH.size)
+                except asyncio.IncompleteReadError:
+                    break  # 客户端关闭连接
+                request = orjson.loads(await reader.readexactly(_LENGTH.unpack(header)[0]))
+                texts = request.get("texts", [])
+                try:
+                    if texts:
+                        future = loop.create_future()
+                        await self.queue.put((texts, future))
+                        payload = encode_vectors(await future)
+                    else:
+                        payload = encode_vectors([])
+                except Exception as e:
+                    payload = bytes([STATUS_ERROR]) + str(e).encode("utf-8")
+                writer.write(_LENGTH.pack(len(payload)) + payload)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve_forever(self, path: str):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        Path(path).unlink(missing_ok=True)
+        self.queue = asyncio.Queue()
+        batcher = asyncio.create_task(self._batch_loop())
+        server = await asyncio.start_unix_server(self._handle, path=path)
+        logger.info(f"embedding服务已启动: {path}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher.cancel()
+
+
+class RemoteEmbeddings(Embeddings):
+    """embedding服务客户端（每个线程一条长连接）"""
+
+    def __init__(self, path: str = Settings.EMBEDDING_SOCKET_PATH, timeout: float = 30):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self) -> socket.socket:
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.path)
+            self._local.sock = sock
+        return sock
+
+    def _close(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is not None:
+            sock.close()
+            self._local.sock = None
+
+    @staticmethod
+    def _recv_exact(sock: socket.socket, size: int) -> bytes:
+        buf = bytearray()
+        while len(buf) < size:
+            chunk = sock.recv(size - len(buf))
+            if not chunk:
+                raise ConnectionError("embedding服务连接已关闭")
+            buf.extend(chunk)
+        return bytes(buf)
+
+    def _request(self, texts: List[str]) -> List[List[float]]:
+        payload = orjson.dumps({"texts": texts})
+        for attempt in range(2):  # 服务重启后连接失效时重连一次
+            try:
+                sock = self._connection()
+                sock.sendall(_LENGTH.pack(len(payload)) + payload)
+                size = _LENGTH.unpack(self._recv_exact(sock, _LENGTH.size))[0]
+                return decode_vectors(self._recv_exact(sock, size))
+            except OSError:
+                self._close()
+                if attempt:
+                    raise
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._request(list(texts))
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._request([text])[0]
+
+
+def wait_ready(path: str, timeout: float = 120) -> None:
+    """等待服务 socket 可连接"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.connect(path)
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise TimeoutError(f"embedding服务启动超时: {path}")
+
+
+def serve(path: str = Settings.EMBEDDING_SOCKET_PATH) -> None:
+    setup_logging()
+    server = EmbeddingServer(Settings.load_embedding_model())
+    asyncio.run(server.serve_forever(path))
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--socket", default=Settings.EMBEDDING_SOCKET_PATH, help="Unix socket 路径")
+    args = parser.parse_args()
+    serve(args.socket)
@@ -0,0 +1,68 @@
+"""
+ONNX Runtime 版 bge embedding：
+1. 从本地目录加载导出的 ONNX 模型（可为 int8 动态量化版本）与 tokenizer.json，运行时不访问模型仓库
+2. 不依赖 torch/transformers，进程启动更快
+3. 与 HuggingFaceEmbeddings 输出一致：CLS 池化 + L2 归一化
+
+导出与一致性验证见 scripts/export_onnx_embedding.py
+"""
+import logging
+from pathlib import Path
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from config.settings import Settings
+
+logger = logging.getLogger(__name__)
+
+
+class OnnxEmbeddings(Embeddings):
+    def __init__(
+            self,
+            model_dir: str = Settings.ONNX_EMBEDDING_DIR,
+            model_file: str = Settings.ONNX_EMBEDDING_FILE,
+            threads: int = Settings.EMBEDDING_THREADS,
+            max_length: int = 512,
+            batch_size: int = 32
+    ):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        model_path = Path(model_dir) / model_file
+        if not model_path.exists():
+            raise FileNotFoundError(f"ONNX模型不存在: {model_path}，请先运行 scripts/export_onnx_embedding.py")
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(str(model_path), options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+        self.tokenizer = Tokenizer.from_file(str(Path(model_dir) / "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=max_length)
+        self.tokenizer.enable_padding()
+        self.batch_size = batch_size
+        logger.info(f"ONNX embedding模型加载完成: {model_path}")
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        feeds = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+            "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64)
+        }
+        hidden = self.session.run(None, {k: v for k, v in feeds.items() if k in self.input_names})[0]
+        cls = hidden[:, 0]
+        return cls / np.clip(np.linalg.norm(cls, axis=1, keepdims=True), 1e-12, None)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        return np.vstack([self._encode(texts[i:i + self.batch_size])
+                          for i in range(0, len(texts), self.batch_size)]).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._encode([text])[0].tolist()
@@ -0,0 +1,95 @@
+"""
+分析报告持久化存储：
+1. 按 公司/行业/日期 保存版本化的完整报告
+2. 记录生成报告时各输入（万得财务数据、知识库文档）的指纹
+3. 对比指纹找出发生变化的输入及受影响的章节，支持增量重新分析
+"""
+import hashlib
+import json
+import logging
+import re
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+from config.settings import Settings
+
+logger = logging.getLogger(__name__)
+
+
+def fingerprint(data) -> str:
+    """对任意可JSON序列化的输入生成稳定指纹"""
+    payload = json.dumps(data, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+_VERSION_RE = re.compile(r"[\w\-]+")
+
+
+def _safe_name(name: str) -> str:
+    return re.sub(r"[\\/:*?\"<>|\s]+", "_", name.strip()).lstrip(".") or "_"
+
+
+class ReportStore:
+    def __init__(self, root: str = Settings.REPORT_STORE_DIR):
+        self.root = Path(root)
+
+    def _dir(self, company: str, industry: str) -> Path:
+        return self.root / _safe_name(company) / _safe_name(industry)
+
+    def save(self, company: str, industry: str, report: str,
+             fingerprints: Dict[str, str], metadata: Optional[Dict] = None) -> Dict:
+        """保存新版本报告，返回版本记录"""
+        created = datetime.now()
+        record = {
+            "version": created.strftime("%Y-%m-%d_%H%M%S_%f"),
+            "company": company,
+            "industry": industry,
+            "created_at": created.isoformat(),
+            "fingerprints": fingerprints,
+            "metadata": metadata or {},
+            "report": report
+        }
+        directory = self._dir(company, industry)
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"{record['version']}.json"
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(record, ensure_ascii=False, indent=2), encoding="utf-8")
+        tmp.replace(path)  # 原子写入，避免读到半写文件
+        logger.info(f"报告已保存: {path}")
+        return record
+
+    def versions(self, company: str, industry: str) -> List[str]:
+        """按时间升序列出全部版本"""
+        directory = self._dir(company, industry)
+        if not directory.exists():
+            return []
+        return sorted(p.stem for p in directory.glob("*.json"))
+
+    def load(self, company: str, industry: str, version: str) -> Optional[Dict]:
+        if not _VERSION_RE.fullmatch(version):
+            return None
+        path = self._dir(company, industry) / f"{version}.json"
+        if not path.exists():
+            return None
+        return json.loads(path.read_text(encoding="utf-8"))
+
+    def latest(self, company: str, industry: str) -> Optional[Dict]:
+        versions = self.versions(company, industry)
+        return self.load(company, industry, versions[-1]) if versions else None
+
+    @staticmethod
+    def changed_inputs(previous: Dict[str, str], current: Dict[str, str]) -> Set[str]:
+        """返回指纹发生变化（或新增/消失）的输入名"""
+        return {name for name in set(previous) | set(current) if previous.get(name) != current.get(name)}
+
+    @staticmethod
+    def affected_sections(changed: Set[str],
+                          section_inputs: Dict[str, List[str]] = None) -> List[str]:
+        """根据章节依赖关系找出需要重新生成的章节"""
+        section_inputs = section_inputs or Settings.REPORT_SECTION_INPUTS
+        return [section for section, inputs in section_inputs.items() if changed & set(inputs)]
+
+
+# 单例模式
+report_store = ReportStore()
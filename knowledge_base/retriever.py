@@ -1,60 +1,386 @@
-from langchain_community.vectorstores import Chroma
 from config.settings import settings
-from typing import List, Dict, Optional
+from evaluation.instrumentation import timed
+from knowledge_base.embedding_batcher import BatchingEmbeddings
+from knowledge_base.sharding import GENERAL_SHARD, ShardManifest, current_industry
+from knowledge_base.snapshots import SnapshotStore, snapshot_store
+from knowledge_base.text_normalizer import (
+    TOKENS_KEY, annotate, document_tokens, normalize, query_tokens, token_overlap
+)
+from knowledge_base.token_budget import pack_chunks
+from typing import Any, Dict, List, Optional, Tuple
+import json
 import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from abc import ABC, abstractmethod
+from pathlib import Path
+import numpy as np
 from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
 
 logger = logging.getLogger(__name__)
 
 
+class InstrumentedEmbeddings(Embeddings):
+    """为向量化调用增加耗时埋点的包装器"""
+
+    def __init__(self, embeddings: Embeddings):
+        self.embeddings = embeddings
+
+    @timed("embedding", "embed_documents")
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    @timed("embedding", "embed_query")
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
+
+
+# ----------------------------
+# 向量索引后端
+# ----------------------------
+def _matches(metadata: Dict, filter_criteria: Optional[Dict]) -> bool:
+    return not filter_criteria or all(metadata.get(k) == v for k, v in filter_criteria.items())
+
+
+class VectorIndex(ABC):
+    """
+    向量索引后端接口
+    search 返回 (文档, 余弦相似度)，相似度越大越相关
+    """
+
+    @abstractmethod
+    def add(self, texts: List[str], metadatas: List[Dict], vectors: List[List[float]]) -> None:
+        ...
+
+    @abstractmethod
+    def search(self, vector: List[float], k: int,
+               filter_criteria: Optional[Dict] = None) -> List[Tuple[Document, float]]:
+        ...
+
+    @abstractmethod
+    def count(self) -> int:
+        ...
+
+    def close(self) -> None:
+        """释放索引占用的内存与文件句柄（快照切换后调用）"""
+
+
+class ChromaIndex(VectorIndex):
+    """ChromaDB（HNSW），构建/检索参数见 Settings.INDEX_PARAMS["chroma"]"""
+
+    def __init__(self, path: str, params: Dict[str, Any], collection: str = settings.VECTOR_COLLECTION):
+        from chromadb import PersistentClient
+
+        self.client = PersistentClient(path=path)
+        self.collection = self.client.get_or_create_collection(
+            collection, embedding_function=None,
+            configuration={"hnsw": {"space": params.get("space", "cosine"),
+                                    "max_neighbors": params.get("max_neighbors", 16),
+                                    "ef_construction": params.get("ef_construction", 100),
+                                    "ef_search": params.get("ef_search", 100)}}
+        )
+        hnsw = (getattr(self.collection, "configuration", None) or {}).get("hnsw") or {}
+        # 构建参数仅在创建集合时生效，已有集合沿用原空间度量（LangChain 建库默认 l2）
+        self.space = hnsw.get("space") or (self.collection.metadata or {}).get("hnsw:space", "l2")
+        if "ef_search" in params and hnsw.get("ef_search") not in (None, params["ef_search"]):
+            try:
+                self.collection.modify(configuration={"hnsw": {"ef_search": params["ef_search"]}})
+            except Exception as e:
+                logger.warning(f"ef_search 调整失败: {e}")
+
+    def add(self, texts, metadatas, vectors):
+        self.collection.add(ids=[str(uuid.uuid4()) for _ in texts], documents=texts,
+                            metadatas=[m or None for m in metadatas], embeddings=vectors)
+
+    def search(self, vector, k, filter_criteria=None):
+        result = self.collection.query(query_embeddings=[vector], n_results=k, where=filter_criteria or None,
+                                       include=["documents", "metadatas", "distances"])
+        hits = []
+        for text, metadata, distance in zip(result["documents"][0], result["metadatas"][0], result["distances"][0]):
+            # 归一化向量下：l2 为平方欧氏距离 = 2 - 2cos；cosine/ip 距离 = 1 - cos
+            similarity = 1 - distance / 2 if self.space == "l2" else 1 - distance
+            hits.append((Document(page_content=text, metadata=metadata or {}), float(similarity)))
+        return hits
+
+    def count(self):
+        return self.collection.count()
+
+    def close(self):
+        # 同一目录的客户端共享底层 System，停止后从缓存移除，释放 SQLite/HNSW 文件句柄
+        system = getattr(self.client, "_system", None)
+        try:
+            if system is not None:
+                system.stop()
+            from chromadb.api.shared_system_client import SharedSystemClient
+            SharedSystemClient._identifier_to_system.pop(getattr(self.client, "_identifier", None), None)
+        except Exception as e:
+            logger.warning(f"Chroma 客户端关闭失败: {e}")
+        self.client = self.collection = None
+
+
+class _FileIndex(VectorIndex):
+    """文档与元数据保存在 docs.jsonl，向量由子类存储"""
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.docs: List[Dict] = []
+        docs_path = self.path / "docs.jsonl"
+        if docs_path.exists():
+            with open(docs_path, encoding="utf-8") as f:
+                self.docs = [json.loads(line) for line in f if line.strip()]
+
+    def _append_docs(self, texts, metadatas):
+        with open(self.path / "docs.jsonl", "a", encoding="utf-8") as f:
+            for text, metadata in zip(texts, metadatas):
+                doc = {"content": text, "metadata": metadata or {}}
+                self.docs.append(doc)
+                f.write(json.dumps(doc, ensure_ascii=False) + "\n")
+
+    def _hits(self, ids, scores, k, filter_criteria) -> List[Tuple[Document, float]]:
+        hits = []
+        for i, score in zip(ids, scores):
+            if i < 0:
+                continue
+            doc = self.docs[i]
+            if _matches(doc["metadata"], filter_criteria):
+                hits.append((Document(page_content=doc["content"], metadata=doc["metadata"]), float(score)))
+                if len(hits) == k:
+                    break
+        return hits
+
+    def count(self):
+        return len(self.docs)
+
+    def close(self):
+        self.docs = []
+
+
+class NumpyIndex(_FileIndex):
+    """暴力精确检索（小语料或作为召回率基准）"""
+
+    def __init__(self, path: str, params: Dict[str, Any] = None):
+        super().__init__(path)
+        vectors_path = self.path / "vectors.npy"
+        self.vectors = np.load(vectors_path) if vectors_path.exists() else None
+
+    def add(self, texts, metadatas, vectors):
+        array = np.asarray(vectors, dtype=np.float32)
+        self.vectors = array if self.vectors is None else np.vstack([self.vectors, array])
+        tmp = self.path / "vectors.tmp.npy"
+        np.save(tmp, self.vectors)
+        os.replace(tmp, self.path / "vectors.npy")
+        self._append_docs(texts, metadatas)
+
+    def search(self, vector, k, filter_criteria=None):
+        if self.vectors is None or not len(self.vectors):
+            return []
+        scores = self.vectors @ np.asarray(vector, dtype=np.float32)
+        if filter_criteria:
+            mask = np.array([_matches(d["metadata"], filter_criteria) for d in self.docs])
+            scores = np.where(mask, scores, -np.inf)
+        top = min(k, len(scores))
+        ids = np.argpartition(-scores, top - 1)[:top]
+        ids = ids[np.argsort(-scores[ids])]
+        ids = [i for i in ids if np.isfinite(scores[i])]
+        return self._hits(ids, scores[ids], k, None)
+
+    def close(self):
+        super().close()
+        self.vectors = None
+
+
+class FaissIndex(_FileIndex):
+    """FAISS 内积索引（向量已归一化，内积即余弦），支持 HNSW 与 IVF"""
+
+    def __init__(self, path: str, params: Dict[str, Any]):
+        try:
+            import faiss
+        except ImportError as e:
+            raise ImportError("FAISS后端需要安装 faiss-cpu") from e
+        super().__init__(path)
+        self.faiss = faiss
+        self.params = params
+        index_path = self.path / "index.faiss"
+        self.index = faiss.read_index(str(index_path)) if index_path.exists() else None
+        if self.index is not None:
+            self._apply_search_params()
+
+    def _build(self, array: np.ndarray):
+        faiss, p, dim = self.faiss, self.params, array.shape[1]
+        if p.get("type", "hnsw") == "ivf":
+            # 每个聚类中心至少约39个训练样本
+            nlist = max(1, min(p.get("nlist", 256), len(array) // 39))
+            index = faiss.IndexIVFFlat(faiss.IndexFlatIP(dim), dim, nlist, faiss.METRIC_INNER_PRODUCT)
+            index.train(array)
+        else:
+            index = faiss.IndexHNSWFlat(dim, p.get("M", 32), faiss.METRIC_INNER_PRODUCT)
+            index.hnsw.efConstruction = p.get("ef_construction", 200)
+        return index
+
+    def _apply_search_params(self):
+        if hasattr(self.index, "nprobe"):
+            self.index.nprobe = self.params.get("nprobe", 16)
+        if hasattr(self.index, "hnsw"):
+            self.index.hnsw.efSearch = self.params.get("ef_search", 64)
+
+    def add(self, texts, metadatas, vectors):
+        array = np.ascontiguousarray(vectors, dtype=np.float32)
+        if self.index is None:
+            self.index = self._build(array)
+            self._apply_search_params()
+        self.index.add(array)
+        tmp = self.path / "index.faiss.tmp"
+        self.faiss.write_index(self.index, str(tmp))
+        os.replace(tmp, self.path / "index.faiss")
+        self._append_docs(texts, metadatas)
+
+    def search(self, vector, k, filter_criteria=None):
+        if self.index is None or not self.index.ntotal:
+            return []
+        # FAISS 不支持元数据过滤，有过滤条件时多取候选后再筛选
+        fetch = min(self.index.ntotal, k * 4 if filter_criteria else k)
+        scores, ids = self.index.search(np.asarray([vector], dtype=np.float32), fetch)
+        return self._hits(ids[0].tolist(), scores[0].tolist(), k, filter_criteria)
+
+    def close(self):
+        super().close()
+        self.index = None
+
+
+INDEX_BACKENDS = {"chroma": ChromaIndex, "faiss": FaissIndex, "numpy": NumpyIndex}
+
+_search_pool = ThreadPoolExecutor(max_workers=settings.SHARD_SEARCH_WORKERS, thread_name_prefix="shard-search")
+
+
+def create_index(backend: str = settings.VECTOR_BACKEND, path: str = settings.VECTOR_DB_PATH,
+                 params: Optional[Dict[str, Any]] = None, shard: Optional[str] = None) -> VectorIndex:
+    """
+    按名称创建索引后端（FAISS/NumPy 存放在知识库目录下的同名子目录）
+    :param shard: 行业分片ID，为空表示公共分片（沿用原有集合/目录）
+    """
+    if backend not in INDEX_BACKENDS:
+        raise ValueError(f"不支持的索引后端: {backend}")
+    params = params if params is not None else settings.INDEX_PARAMS.get(backend, {})
+    if backend == "chroma":
+        collection = f"{settings.VECTOR_COLLECTION}_{shard}" if shard else settings.VECTOR_COLLECTION
+        return ChromaIndex(path, params, collection=collection)
+    path = os.path.join(path, backend, "shards", shard) if shard else os.path.join(path, backend)
+    return INDEX_BACKENDS[backend](path, params)
+
+
+def default_embeddings() -> Embeddings:
+    embeddings = settings.shared_embedding_model()
+    if settings.EMBEDDING_BATCH_MAX_SIZE > 1:
+        embeddings = BatchingEmbeddings(embeddings)  # 并发查询合并为一次前向计算
+    return embeddings
+
+
 class KnowledgeRetriever:
-    def __init__(self):
-        """初始化DeepSeek向量检索器"""
+    def __init__(self, index: Optional[VectorIndex] = None, embeddings: Optional[Embeddings] = None,
+                 path: str = settings.VECTOR_DB_PATH, backend: str = settings.VECTOR_BACKEND):
+        """初始化向量检索器（公共分片 + 按需打开的行业分片）"""
         try:
-            self.vectorstore = Chroma(
-                persist_directory=settings.VECTOR_DB_PATH,
-                embedding_function=settings.get_embedding_model()
-            )
-            logger.info("DeepSeek向量检索器初始化成功")
+            self.embeddings = InstrumentedEmbeddings(embeddings or default_embeddings())
+            self.path = path
+            self.backend = backend
+            self.manifest = ShardManifest(path)
+            self.shards: Dict[str, VectorIndex] = {GENERAL_SHARD: index or create_index(backend, path)}
+            self._lock = threading.Lock()
+            logger.info(f"向量检索器初始化成功: backend={backend}, 行业分片={len(self.manifest.industries)}")
         except Exception as e:
             logger.error(f"向量数据库加载失败: {e}")
             raise
 
+    def _shard(self, name: str, create: bool = False) -> Optional[VectorIndex]:
+        """按行业名取分片，create=True 时不存在则新建"""
+        if name in self.shards:
+            return self.shards[name]
+        with self._lock:
+            if name not in self.shards:
+                if name not in self.manifest:
+                    if not create:
+                        return None
+                    self.manifest.register(name)
+                self.shards[name] = create_index(self.backend, self.path, shard=self.manifest[name])
+            return self.shards[name]
+
+    def route(self, industry: Optional[str] = None) -> List[str]:
+        """行业已建分片时只查 行业分片 + 公共分片，否则查询全部分片"""
+        industry = industry or current_industry()
+        if industry and industry in self.manifest:
+            return [industry, GENERAL_SHARD]
+        return [GENERAL_SHARD] + self.manifest.industries
+
+    def _search(self, shards: List[str], vector: List[float], k: int,
+                filter_criteria: Optional[Dict]) -> List[Tuple[Document, float]]:
+        indexes = [index for index in (self._shard(name) for name in shards) if index is not None]
+        if len(indexes) == 1:
+            return indexes[0].search(vector, k, filter_criteria)
+        # 多分片并发检索后按相似度归并
+        futures = [_search_pool.submit(copy_context().run, index.search, vector, k, filter_criteria)
+                   for index in indexes]
+        hits = [hit for future in futures for hit in future.result()]
+        return sorted(hits, key=lambda hit: hit[1], reverse=True)[:k]
+
+    @timed("retrieval", "query")
     def query(
             self,
             question: str,
             k: int = settings.RETRIEVE_TOP_K,
-            filter_criteria: Optional[Dict] = None
+            filter_criteria: Optional[Dict] = None,
+            max_tokens: Optional[int] = None,
+            industry: Optional[str] = None
     ) -> List[Dict]:
         """
         检索与问题最相关的文档片段
         :param question: 查询问题
         :param k: 返回结果数量 (默认取settings.RETRIEVE_TOP_K)
         :param filter_criteria: 元数据过滤条件 (如: {"source": "wind"})
+        :param max_tokens: 结果总token预算，按相关度装入 (默认不限制)
+        :param industry: 限定行业分片 (默认取请求上下文中的行业，均为空时查询全部分片)
         :return: [{"content": str, "metadata": dict, "score": float}]
         """
         try:
-            # DeepSeek的相似度检索
-            docs_and_scores = self.vectorstore.similarity_search_with_score(
-                question,
-                k=k,
-                filter=filter_criteria
-            )
-
-            # 标准化输出格式
-            results = []
+            # 查询与入库使用相同的归一化（全半角、繁简、金额单位）
+            vector = self.embeddings.embed_query(normalize(question))
+            shards = self.route(industry)
+            candidates = k * 2 if settings.LEXICAL_WEIGHT else k
+            with timed("retrieval", "search"):
+                docs_and_scores = self._search(shards, vector, candidates, filter_criteria)
+
+            # 标准化输出格式（按向量相似度过滤，叠加查询词命中比例排序）
+            terms = query_tokens(question)
+            ranked = []
             for doc, score in docs_and_scores:
                 if score < settings.SIMILARITY_THRESHOLD:
-                    logger.debug(f"过滤低分文档: score={score:.2f}")
+                    logger.debug("过滤低分文档: score=%.2f", score)
                     continue
 
-                results.append({
+                metadata = dict(doc.metadata)
+                tokens = document_tokens(doc.page_content, metadata)  # 入库时已缓存，无需重新分词
+                metadata.pop(TOKENS_KEY, None)
+                rank = score + settings.LEXICAL_WEIGHT * token_overlap(terms, tokens)
+                ranked.append((rank, {
                     "content": doc.page_content,
-                    "metadata": doc.metadata,
+                    "metadata": metadata,
                     "score": float(score)
-                })
+                }))
+            ranked.sort(key=lambda item: item[0], reverse=True)
+            results = [result for _, result in ranked[:k]]
 
-            logger.info(f"检索完成: query='{question}', results={len(results)}")
+            if max_tokens:
+                results = pack_chunks(results, max_tokens)
+
+            # 每次查询都会执行，按比例采样记录
+            logger.info("检索完成: query=%r, shards=%s, results=%d", question, shards, len(results),
+                        extra={"sample_rate": settings.LOG_SAMPLE_RATE})
             return results
 
         except Exception as e:
@@ -62,10 +388,19 @@ class KnowledgeRetriever:
             return []
 
     def add_documents(self, documents: List[Document]) -> bool:
-        """向知识库添加新文档"""
+        """向知识库添加新文档（按 metadata["industry"] 写入对应行业分片，无行业标注写入公共分片）"""
         try:
-            self.vectorstore.add_documents(documents)
-            logger.info(f"成功添加 {len(documents)} 个文档")
+            groups: Dict[str, List[Document]] = {}
+            for doc in documents:
+                industry = (doc.metadata.get("industry") or "").strip() or GENERAL_SHARD
+                groups.setdefault(industry, []).append(doc)
+            annotate(doc for doc in documents if TOKENS_KEY not in doc.metadata)  # 缓存分词结果
+            for industry, docs in groups.items():
+                texts = [doc.page_content for doc in docs]
+                self._shard(industry, create=True).add(
+                    texts, [doc.metadata for doc in docs],
+                    self.embeddings.embed_documents([normalize(text) for text in texts]))
+            logger.info(f"成功添加 {len(documents)} 个文档: { {k: len(v) for k, v in groups.items()} }")
             return True
         except Exception as e:
             logger.error(f"文档添加失败: {e}")
@@ -73,13 +408,138 @@ class KnowledgeRetriever:
 
     @property
     def document_count(self) -> int:
-        """获取知识库中文档数量"""
+        """获取知识库中文档数量（全部分片）"""
         try:
-            return self.vectorstore._collection.count()  # ChromaDB内部API
+            return sum(self._shard(name).count() for name in [GENERAL_SHARD] + self.manifest.industries)
         except Exception as e:
             logger.warning(f"文档计数失败: {e}")
             return 0
 
+    def warmup(self) -> None:
+        """打开全部分片并各执行一次检索，使索引在切换前载入内存"""
+        self._search(self.route(None), self.embeddings.embed_query("预热"), 1, None)
+
+    def close(self) -> None:
+        """关闭全部已打开的分片"""
+        with self._lock:
+            shards, self.shards = list(self.shards.values()), {}
+        for index in shards:
+            index.close()
+
+
+class _Generation:
+    """一个快照版本的检索器及其进行中的查询数"""
+
+    def __init__(self, retriever: KnowledgeRetriever, version: Optional[str]):
+        self.retriever = retriever
+        self.version = version
+        self.inflight = 0
+        self.cond = threading.Condition()
+
+    def drain(self, timeout: float) -> bool:
+        with self.cond:
+            return self.cond.wait_for(lambda: self.inflight == 0, timeout)
+
+
+class HotRetriever:
+    """
+    可热切换的知识库检索器：
+    新快照在后台打开并预热后原子替换，旧快照上的查询完成后关闭释放
+    （CURRENT 轮询由服务启动时调用 start_watch 开启，导入模块不启动后台线程）
+    """
+
+    def __init__(self, store: SnapshotStore = snapshot_store):
+        self.store = store
+        self.embeddings = default_embeddings()  # 各快照共享同一模型
+        version = store.current()
+        self._generation = _Generation(KnowledgeRetriever(embeddings=self.embeddings, path=store.resolve()), version)
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._watcher: Optional[threading.Thread] = None
+
+    def start_watch(self, interval: float = settings.SNAPSHOT_WATCH_INTERVAL_SEC) -> None:
+        """开启 CURRENT 轮询（重复调用无效果，interval<=0 不开启）"""
+        with self._reload_lock:
+            if interval > 0 and self._watcher is None:
+                self._watcher = threading.Thread(target=self._watch, args=(interval,),
+                                                 name="snapshot-watch", daemon=True)
+                self._watcher.start()
+
+    @property
+    def version(self) -> Optional[str]:
+        return self._generation.version
+
+    @contextmanager
+    def _lease(self):
+        with self._lock:
+            generation = self._generation
+            with generation.cond:
+                generation.inflight += 1
+        try:
+            yield generation.retriever
+        finally:
+            with generation.cond:
+                generation.inflight -= 1
+                generation.cond.notify_all()
+
+    def query(self, *args, **kwargs) -> List[Dict]:
+        with self._lease() as current:
+            return current.query(*args, **kwargs)
+
+    def add_documents(self, documents: List[Document]) -> bool:
+        with self._lease() as current:
+            return current.add_documents(documents)
+
+    @property
+    def document_count(self) -> int:
+        with self._lease() as current:
+            return current.document_count
+
+    def reload(self, version: Optional[str] = None,
+               drain_timeout: float = settings.SNAPSHOT_DRAIN_TIMEOUT_SEC) -> Dict:
+        """切换到指定快照（默认 CURRENT），返回切换结果"""
+        with self._reload_lock:
+            version = version or self.store.current()
+            previous = self._generation
+            if version is None or version == previous.version:
+                return {"previous": previous.version, "current": previous.version, "switched": False}
+            if version not in self.store.versions():
+                raise FileNotFoundError(f"快照不存在: {version}")
+
+            start = time.perf_counter()
+            retriever = KnowledgeRetriever(embeddings=self.embeddings, path=str(self.store.path(version)))
+            retriever.warmup()
+            with self._lock:
+                self._generation = _Generation(retriever, version)
+            drained = previous.drain(drain_timeout)
+            if drained:
+                previous.retriever.close()
+            else:
+                # 旧快照仍有查询未完成，排空后在后台关闭
+                threading.Thread(target=self._release, args=(previous,),
+                                 name="snapshot-release", daemon=True).start()
+            logger.info(f"知识库已切换: {previous.version} → {version}, "
+                        f"耗时 {time.perf_counter() - start:.2f}s, 旧快照查询{'已' if drained else '未'}排空")
+            return {"previous": previous.version, "current": version, "switched": True, "drained": drained,
+                    "documents": retriever.document_count}
+
+    @staticmethod
+    def _release(generation: _Generation):
+        generation.drain(None)
+        generation.retriever.close()
+        logger.info(f"旧快照已释放: {generation.version}")
+
+    def _watch(self, interval: float):
+        """轮询 CURRENT，发现新版本时自动切换"""
+        while True:
+            time.sleep(interval)
+            try:
+                current = self.store.current()
+                if current and current != self.version:
+                    self.reload(current)
+            except Exception as e:
+                logger.error(f"知识库快照切换失败: {e}")
+
 
 # 单例模式
-retriever = KnowledgeRetriever()
\ No newline at end of file
+retriever = HotRetriever()
@@ -0,0 +1,70 @@
+"""
+知识库按行业分片：
+1. 每个行业一个分片，无行业标注的文档进入公共分片（general）
+2. 分片清单 shards.json 记录 行业名 → 分片ID（集合/目录名只能使用ASCII）
+3. 请求级行业上下文（ContextVar），检索时据此路由到对应分片
+"""
+import hashlib
+import json
+import os
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Dict, List, Optional
+
+GENERAL_SHARD = "general"
+
+
+def shard_id(industry: str) -> str:
+    return "ind_" + hashlib.sha1(industry.strip().encode("utf-8")).hexdigest()[:12]
+
+
+class ShardManifest:
+    def __init__(self, root: str):
+        self.path = Path(root) / "shards.json"
+        self.shards: Dict[str, str] = {}
+        self.reload()
+
+    def reload(self):
+        try:
+            self.shards = json.loads(self.path.read_text(encoding="utf-8"))
+        except (FileNotFoundError, ValueError):
+            self.shards = {}
+
+    def register(self, industry: str) -> str:
+        """登记新行业分片并落盘"""
+        self.reload()  # 合并其他写入进程登记的分片
+        if industry not in self.shards:
+            self.shards[industry] = shard_id(industry)
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(f".{os.getpid()}.tmp")
+            tmp.write_text(json.dumps(self.shards, ensure_ascii=False, indent=2), encoding="utf-8")
+            tmp.replace(self.path)
+        return self.shards[industry]
+
+    @property
+    def industries(self) -> List[str]:
+        return list(self.shards)
+
+    def __contains__(self, industry: str) -> bool:
+        return industry in self.shards
+
+    def __getitem__(self, industry: str) -> str:
+        return self.shards[industry]
+
+
+_current_industry: ContextVar[Optional[str]] = ContextVar("industry", default=None)
+
+
+@contextmanager
+def industry_scope(industry: Optional[str]):
+    """在请求范围内设置行业，知识库检索据此选择分片"""
+    token = _current_industry.set(industry.strip() if industry else None)
+    try:
+        yield
+    finally:
+        _current_industry.reset(token)
+
+
+def current_industry() -> Optional[str]:
+    return _current_industry.get()
@@ -0,0 +1,75 @@
+"""
+知识库快照：
+1. 每次构建写入独立的快照目录 snapshots/<版本>/，构建期间不影响线上读取
+2. CURRENT 文件记录当前生效版本，发布即原子替换该文件
+3. 运行中的应用通过管理接口或轮询 CURRENT 切换到新快照（见 retriever.HotRetriever）
+"""
+import logging
+import os
+import re
+import shutil
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional
+
+from config.settings import Settings
+
+logger = logging.getLogger(__name__)
+
+_VERSION_RE = re.compile(r"\d{8}_\d{6}_\d{6}")
+
+
+class SnapshotStore:
+    def __init__(self, root: str = Settings.VECTOR_SNAPSHOT_DIR):
+        self.root = Path(root)
+        self.current_file = self.root / "CURRENT"
+
+    def path(self, version: str) -> Path:
+        if not _VERSION_RE.fullmatch(version):
+            raise ValueError(f"非法快照版本: {version}")
+        return self.root / version
+
+    def versions(self) -> List[str]:
+        if not self.root.exists():
+            return []
+        return sorted(p.name for p in self.root.iterdir() if p.is_dir() and _VERSION_RE.fullmatch(p.name))
+
+    def current(self) -> Optional[str]:
+        try:
+            version = self.current_file.read_text(encoding="utf-8").strip()
+        except FileNotFoundError:
+            return None
+        return version if version in self.versions() else None
+
+    def resolve(self) -> str:
+        """当前生效的知识库目录（尚无快照时沿用 VECTOR_DB_PATH）"""
+        version = self.current()
+        return str(self.path(version)) if version else Settings.VECTOR_DB_PATH
+
+    def create(self, incremental: bool = False) -> str:
+        """新建快照目录；incremental=True 时以当前生效的知识库为基础追加"""
+        version = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        target = self.path(version)
+        base = Path(self.resolve())
+        if incremental and base.exists():
+            shutil.copytree(base, target)
+        else:
+            target.mkdir(parents=True)
+        logger.info(f"已创建知识库快照: {target} (基于: {base if incremental else '空'})")
+        return version
+
+    def publish(self, version: str, keep: int = Settings.SNAPSHOT_KEEP) -> None:
+        """原子切换 CURRENT 并清理过旧快照"""
+        if not self.path(version).exists():
+            raise FileNotFoundError(f"快照不存在: {version}")
+        tmp = self.current_file.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text(version, encoding="utf-8")
+        tmp.replace(self.current_file)
+        logger.info(f"知识库快照已发布: {version}")
+        for old in self.versions()[:-keep]:
+            if old != version:
+                shutil.rmtree(self.path(old), ignore_errors=True)
+
+
+# 单例模式
+snapshot_store = SnapshotStore()
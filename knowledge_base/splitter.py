@@ -5,6 +5,7 @@ from langchain_text_splitters import (
 from langchain_experimental.text_splitter import SemanticChunker
 from langchain_openai import OpenAIEmbeddings
 from config.settings import Settings
+from knowledge_base.text_normalizer import annotate
 
 def get_text_splitter(doc_type: str = "default"):
     if doc_type == "markdown":
@@ -17,4 +18,11 @@ def get_text_splitter(doc_type: str = "default"):
             chunk_size=1000,
             chunk_overlap=200,
             separators=["\n\n", "\n", "。", "！", "？"]
-        )
\ No newline at end of file
+        )
+
+
+def split_documents(docs, doc_type: str = "default"):
+    """切分文档并为每个片段缓存分词结果（检索时直接使用，不再重复分词）"""
+    chunks = get_text_splitter(doc_type).split_documents(docs)
+    annotate(chunks)
+    return chunks
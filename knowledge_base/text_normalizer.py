@@ -0,0 +1,100 @@
+"""
+中文文本归一化与分词（入库、检索、风险关键词评分共用）：
+1. NFKC 统一全角/半角字符，繁体转简体（内置金融常用字表，入库与查询结果一致，不依赖外部词典）
+2. 金额单位统一：去除千分位，“12000万”“1.2亿”统一为“1.2亿”，“1.2万亿”统一为“12000亿”
+3. 分词：中文连续片段切为二元组（bigram），英文/数字按词；入库时把分词结果缓存在文档元数据中，检索时不再重复计算
+"""
+import re
+import unicodedata
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterable, List
+
+TOKENS_KEY = "tokens"  # 文档元数据中缓存分词结果的字段（空格分隔）
+
+# 繁体 → 简体（每两个字符为一组）
+_TRADITIONAL_PAIRS = (
+    "營营業业資资產产負负債债額额潤润淨净損损虧亏險险風风訴诉訟讼競竞爭争劇剧長长穩稳領领動动緩缓報报"
+    "財财務务數数據据價价個个億亿萬万幣币貨货銷销現现東东與与為为於于發发團团電电車车導导體体醫医藥药"
+    "銀银證证時时間间國国際际經经濟济環环節节費费稅税總总應应類类標标準准會会計计審审質质權权係系歸归"
+    "屬属償偿還还貸贷預预測测漲涨勢势場场規规擴扩張张減减實实餘余併并購购紅红監监鏈链廣广區区內内層层"
+    "級级單单項项雙双頭头達达約约績绩獲获選选買买賣卖邊边開开關关問问題题點点線线網网絡络訊讯韓韩"
+)
+_TRADITIONAL = {ord(t): s for t, s in zip(_TRADITIONAL_PAIRS[::2], _TRADITIONAL_PAIRS[1::2])}
+
+_UNITS = {"万亿": 1e12, "千亿": 1e11, "亿": 1e8, "千万": 1e7, "百万": 1e6, "万": 1e4}
+_AMOUNT_RE = re.compile(r"(\d[\d,]*(?:\.\d+)?)\s*(万亿|千亿|亿|千万|百万|万)")
+_THOUSANDS_RE = re.compile(r"(?<=\d),(?=\d{3}(?!\d))")
+_SPACE_RE = re.compile(r"\s+")
+_TOKEN_RE = re.compile(r"[一-鿿]+|\d+(?:\.\d+)?(?:亿|万)?|[a-z]+")
+
+
+def _format_number(value: float) -> str:
+    return f"{value:.4f}".rstrip("0").rstrip(".")
+
+
+def _canonical_amount(match: re.Match) -> str:
+    value = float(match.group(1).replace(",", "")) * _UNITS[match.group(2)]
+    if value >= 1e8:
+        return _format_number(value / 1e8) + "亿"
+    if value >= 1e4:
+        return _format_number(value / 1e4) + "万"
+    return _format_number(value)
+
+
+def normalize(text: str) -> str:
+    """全半角、繁简、金额单位与空白归一化，英文转小写"""
+    if not text:
+        return ""
+    text = unicodedata.normalize("NFKC", text).translate(_TRADITIONAL).casefold()
+    text = _THOUSANDS_RE.sub("", text)
+    text = _AMOUNT_RE.sub(_canonical_amount, text)
+    return _SPACE_RE.sub(" ", text).strip()
+
+
+def tokenize(text: str, normalized: bool = False) -> List[str]:
+    """分词（去重、保持首次出现顺序）"""
+    if not normalized:
+        text = normalize(text)
+    tokens: Dict[str, None] = {}
+    for piece in _TOKEN_RE.findall(text):
+        if "一" <= piece[0] <= "鿿" and len(piece) > 1:
+            for i in range(len(piece) - 1):
+                tokens[piece[i:i + 2]] = None
+        else:
+            tokens[piece] = None
+    return list(tokens)
+
+
+@lru_cache(maxsize=4096)
+def query_tokens(text: str) -> FrozenSet[str]:
+    """查询/关键词的分词结果（缓存，重复查询不再计算）"""
+    return frozenset(tokenize(text))
+
+
+def document_tokens(content: str, metadata: Dict) -> FrozenSet[str]:
+    """文档分词结果：优先取入库时缓存在元数据中的结果"""
+    cached = metadata.get(TOKENS_KEY)
+    if isinstance(cached, str):
+        return frozenset(cached.split())
+    return frozenset(tokenize(content))
+
+
+def annotate(documents: Iterable) -> None:
+    """入库前为文档片段缓存分词结果（写入 metadata[TOKENS_KEY]）"""
+    for doc in documents:
+        doc.metadata[TOKENS_KEY] = " ".join(tokenize(doc.page_content))
+
+
+def token_overlap(query: FrozenSet[str], document: FrozenSet[str]) -> float:
+    """查询词在文档中出现的比例"""
+    return len(query & document) / len(query) if query else 0.0
+
+
+_normalize_keyword = lru_cache(maxsize=1024)(normalize)
+
+
+def contains_any(text: str, keywords: Iterable[str], normalized: bool = False) -> bool:
+    """归一化后判断文本是否包含任一关键词（繁体、全角写法同样命中）"""
+    if not normalized:
+        text = normalize(text)
+    return any(_normalize_keyword(kw) in text for kw in keywords)
@@ -0,0 +1,139 @@
+"""
+Token 预算与上下文压缩：
+1. 估算提示词 token 数（按 DeepSeek 官方换算：1 个中文字符≈0.6 token，1 个英文字符≈0.3 token）
+2. 按相关度将检索片段装入预算
+3. 压缩过长的工具输出（句子去重 + 抽取式摘要）
+"""
+import json
+import re
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from config.settings import settings
+
+_CJK_RE = re.compile(r"[\u3400-\u9fff\uf900-\ufaff\u3000-\u303f\uff00-\uffef]")
+_SENTENCE_RE = re.compile(r"[^。！？!?；;\n]+[。！？!?；;\n]?")
+_DIGIT_RE = re.compile(r"\d")
+
+
+def count_tokens(text: str) -> int:
+    """估算文本 token 数（无需加载分词器，适合在热路径上调用）"""
+    if not text:
+        return 0
+    cjk = len(_CJK_RE.findall(text))
+    other = len(text) - cjk
+    return int(cjk * 0.6 + other * 0.3) + 1
+
+
+def get_budget(agent_name: Optional[str] = None) -> int:
+    """获取指定 Agent 的提示词 token 预算"""
+    budgets = settings.PROMPT_TOKEN_BUDGETS
+    return budgets.get(agent_name, budgets["default"])
+
+
+def format_input(data: Any) -> str:
+    """将结构化输入格式化为紧凑文本（替代 str(dict) 的冗余引号和转义）"""
+    if isinstance(data, str):
+        return data
+    if isinstance(data, dict):
+        lines = []
+        for key, value in data.items():
+            if isinstance(value, (dict, list)):
+                value = json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=str)
+            lines.append(f"{key}: {value}")
+        return "\n".join(lines)
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+def split_sentences(text: str) -> List[str]:
+    """按中英文句末标点切分句子"""
+    return [s.strip() for s in _SENTENCE_RE.findall(text) if s.strip()]
+
+
+def compress_text(text: str, max_tokens: int) -> str:
+    """
+    压缩文本至 token 预算以内
+    1. 去除重复句子
+    2. 仍超预算时按句子得分（关键词频率 + 数字密度 + 位置）抽取，保留原文顺序
+    """
+    if count_tokens(text) <= max_tokens:
+        return text
+
+    seen = set()
+    sentences = []
+    for sent in split_sentences(text):
+        key = re.sub(r"\s+", "", sent)
+        if key in seen:
+            continue
+        seen.add(key)
+        sentences.append(sent)
+
+    deduped = "\n".join(sentences)
+    if count_tokens(deduped) <= max_tokens:
+        return deduped
+
+    # 以字符二元组频率近似关键词重要度（对中文无需分词）
+    freq = Counter()
+    for sent in sentences:
+        freq.update(sent[i:i + 2] for i in range(len(sent) - 1))
+
+    def score(idx: int, sent: str) -> float:
+        grams = [sent[i:i + 2] for i in range(len(sent) - 1)] or [sent]
+        keyword = sum(freq[g] for g in grams) / len(grams)
+        digits = len(_DIGIT_RE.findall(sent)) / max(len(sent), 1)
+        position = 1.0 / (1 + idx)
+        return keyword + 10 * digits + position
+
+    ranked = sorted(range(len(sentences)), key=lambda i: score(i, sentences[i]), reverse=True)
+    selected, used = [], 0
+    for idx in ranked:
+        cost = count_tokens(sentences[idx])
+        if used + cost > max_tokens:
+            continue
+        selected.append(idx)
+        used += cost
+
+    if not selected:
+        # 单句即超预算时按比例截断
+        ratio = max_tokens / count_tokens(sentences[ranked[0]])
+        return sentences[ranked[0]][:max(int(len(sentences[ranked[0]]) * ratio), 1)]
+    return "\n".join(sentences[i] for i in sorted(selected))
+
+
+def pack_chunks(chunks: List[Dict], budget: int, min_tokens: int = 50) -> List[Dict]:
+    """
+    按相关度顺序将检索片段装入 token 预算
+    :param chunks: 已按相关度排序的片段 [{"content": str, ...}]
+    :param budget: 可用 token 数
+    :param min_tokens: 剩余预算低于此值时不再压缩装入
+    :return: 装入预算的片段（内容重复的片段只保留一次）
+    """
+    packed, used, seen = [], 0, set()
+    for chunk in chunks:
+        content = chunk.get("content", "")
+        key = re.sub(r"\s+", "", content)
+        if key in seen:
+            continue
+        seen.add(key)
+
+        cost = count_tokens(content)
+        remaining = budget - used
+        if cost <= remaining:
+            packed.append(chunk)
+            used += cost
+        elif remaining >= min_tokens:
+            compressed = compress_text(content, remaining)
+            packed.append({**chunk, "content": compressed, "compressed": True})
+            used += count_tokens(compressed)
+        if budget - used < min_tokens:
+            break
+    return packed
+
+
+def compress_observation(observation: Any, max_tokens: int = None) -> Any:
+    """压缩工具输出：未超预算时原样返回，超出时返回压缩后的文本"""
+    max_tokens = max_tokens or settings.TOOL_OUTPUT_MAX_TOKENS
+    text = format_input(observation)
+    if count_tokens(text) <= max_tokens:
+        return observation
+    return compress_text(text, max_tokens)
@@ -3,52 +3,78 @@
 知识库初始化脚本：
 1. 加载原始文档（PDF/HTML/CSV）
 2. 文本分割与向量化
-3. 持久化到ChromaDB
+3. 按行业分片持久化（data_dir/<行业>/ 下的文档归入该行业分片，根目录文档归入公共分片）
+4. 默认写入新的知识库快照并发布，运行中的应用自动切换（无需重启）
 """
 from pathlib import Path
 from knowledge_base.loader import load_documents
-from knowledge_base.splitter import get_text_splitter
+from knowledge_base.splitter import split_documents
 from config.settings import Settings
 from utils.logger import setup_logger
 import argparse
 
 logger = setup_logger("deploy_vectordb")
 
-def init_vector_db(data_dir: str, vector_db_path: str):
+def iter_files(data_dir: Path):
+    """返回 (文件, 行业)，根目录文件行业为空"""
+    for file in sorted(data_dir.glob("*.*")):
+        yield file, None
+    for sub in sorted(p for p in data_dir.iterdir() if p.is_dir()):
+        for file in sorted(sub.rglob("*.*")):
+            yield file, sub.name
+
+
+def init_vector_db(data_dir: str, vector_db_path: str, batch_size: int = 256):
     """初始化向量数据库"""
-    from langchain_community.vectorstores import Chroma
-    from langchain_openai import OpenAIEmbeddings
+    from knowledge_base.retriever import KnowledgeRetriever
 
     if not Path(data_dir).exists():
         raise FileNotFoundError(f"数据目录不存在: {data_dir}")
 
     # 加载并处理文档
     documents = []
-    for file in Path(data_dir).glob("*.*"):
+    for file, industry in iter_files(Path(data_dir)):
         try:
             docs = load_documents(str(file))
-            splitter = get_text_splitter(file.suffix[1:])
-            splits = splitter.split_documents(docs)
+            splits = split_documents(docs, file.suffix[1:])  # 同时缓存分词结果
+            for split in splits:
+                if industry:
+                    split.metadata["industry"] = industry
             documents.extend(splits)
-            logger.info(f"已处理: {file.name} → {len(splits)} chunks")
+            logger.info(f"已处理: {file.name} ({industry or '公共'}) → {len(splits)} chunks")
         except Exception as e:
             logger.error(f"处理失败 {file}: {e}")
 
-    # 持久化向量存储
+    # 持久化向量存储（与检索使用同一embedding模型与索引后端）
     if documents:
-        Chroma.from_documents(
-            documents=documents,
-            embedding=OpenAIEmbeddings(model=Settings.EMBEDDING_MODEL),
-            persist_directory=vector_db_path
-        )
-        logger.info(f"向量数据库已初始化: {vector_db_path}")
+        knowledge = KnowledgeRetriever(path=vector_db_path)
+        for i in range(0, len(documents), batch_size):
+            if not knowledge.add_documents(documents[i:i + batch_size]):
+                raise RuntimeError(f"写入失败: 第 {i} 条起")
+        logger.info(f"向量数据库已初始化: {vector_db_path}, 行业分片: {knowledge.manifest.industries}")
     else:
         logger.warning("未找到有效文档，跳过初始化")
 
+def build_snapshot(data_dir: str, incremental: bool = False, publish: bool = True) -> str:
+    """构建新快照（incremental 时在当前知识库基础上追加），返回版本号"""
+    from knowledge_base.snapshots import snapshot_store
+
+    version = snapshot_store.create(incremental=incremental)
+    init_vector_db(data_dir, str(snapshot_store.path(version)))
+    if publish:
+        snapshot_store.publish(version)
+    return version
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--data_dir", default=f"{Settings.DATA_DIR}/raw", help="原始文档路径")
-    parser.add_argument("--vector_db", default=Settings.VECTOR_DB_PATH, help="向量数据库存储路径")
+    parser.add_argument("--vector_db", help="直接写入指定目录（不使用快照）")
+    parser.add_argument("--incremental", action="store_true", help="在当前知识库基础上追加文档")
+    parser.add_argument("--no-publish", action="store_true", help="只构建快照，不切换 CURRENT")
     args = parser.parse_args()
 
-    init_vector_db(args.data_dir, args.vector_db)
\ No newline at end of file
+    if args.vector_db:
+        init_vector_db(args.data_dir, args.vector_db)
+    else:
+        logger.info(f"快照已构建: {build_snapshot(args.data_dir, args.incremental, not args.no_publish)}")
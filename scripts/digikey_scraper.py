@@ -1,56 +1,84 @@
 #!/usr/bin/env python3
 """
 Digi-Key元器件数据爬虫：
-1. 通过产品型号爬取详情页
-2. 提取关键参数
-3. 存储为结构化JSON
+1. 通过产品型号异步批量爬取详情页（按主机限制并发，遵守请求间隔）
+2. 条件请求复用本地缓存，lxml 提取关键参数
+3. 结果逐行追加到 JSONL，中断后重新运行自动跳过已完成型号
 """
+import asyncio
 import json
-from bs4 import BeautifulSoup
-import requests
-from utils.logger import setup_logger
 from pathlib import Path
+from typing import Iterable, List, Set
+from utils.logger import setup_logger
 from config.settings import Settings
+from tools.digikey_client import AsyncDigiKeyClient
 
 logger = setup_logger("digikey_scraper")
 
-def scrape_part(part_number: str, save_dir: str) -> dict:
-    """爬取单个元器件数据"""
-    url = f"https://www.digikey.com/en/products/detail/{part_number}"
-    try:
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.text, 'html.parser')
-
-        data = {
-            "part_number": part_number,
-            "manufacturer": soup.select_one(".manufacturer").text.strip(),
-            "description": soup.select_one(".product-description").text.strip(),
-            "stock": soup.select_one(".stock").text.strip(),
-            "price": soup.select_one(".price").text.strip(),
-            "specs": {
-                row.select_one(".attr-name").text: row.select_one(".attr-value").text
-                for row in soup.select(".specs-table tr")
-            }
-        }
-
-        # 保存结果
-        save_path = Path(save_dir) / f"{part_number}.json"
-        with open(save_path, 'w') as f:
-            json.dump(data, f, indent=2)
-        logger.info(f"已保存: {save_path}")
-        return data
-    except Exception as e:
-        logger.error(f"爬取失败 {part_number}: {e}")
-        return {}
+
+def completed_parts(output: Path) -> Set[str]:
+    """读取已写入结果的型号（用于断点续爬）"""
+    done = set()
+    if output.exists():
+        with open(output, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    done.add(json.loads(line)["part_number"])
+                except (ValueError, KeyError):
+                    continue  # 中断时可能残留半行
+    return done
+
+
+async def scrape_parts(part_numbers: Iterable[str], output: str,
+                       concurrency: int = Settings.DIGIKEY_CONCURRENCY_PER_HOST) -> dict:
+    """批量爬取并追加写入 JSONL，返回统计"""
+    output = Path(output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    done = completed_parts(output)
+    pending: List[str] = list(dict.fromkeys(pn.strip() for pn in part_numbers if pn.strip() and pn.strip() not in done))
+    logger.info(f"待爬取 {len(pending)} 个型号（已完成 {len(done)} 个）")
+
+    queue: asyncio.Queue = asyncio.Queue()
+    for pn in pending:
+        queue.put_nowait(pn)
+    stats = {"saved": 0, "failed": 0, "skipped": len(done)}
+
+    async with AsyncDigiKeyClient(per_host=concurrency) as client:
+        with open(output, "a", encoding="utf-8") as sink:
+            async def worker():
+                while not queue.empty():
+                    pn = queue.get_nowait()
+                    try:
+                        data = await client.fetch_part(pn)
+                    except Exception as e:
+                        logger.error(f"爬取失败 {pn}: {e}")
+                        stats["failed"] += 1
+                        continue
+                    sink.write(json.dumps(data, ensure_ascii=False) + "\n")
+                    sink.flush()
+                    stats["saved"] += 1
+                    if stats["saved"] % 100 == 0:
+                        logger.info(f"进度: {stats['saved']}/{len(pending)}")
+
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+        stats.update(client.stats)
+
+    logger.info(f"爬取完成: {stats}")
+    return stats
+
 
 if __name__ == "__main__":
     import argparse
     parser = argparse.ArgumentParser()
-    parser.add_argument("part_numbers", nargs="+", help="产品型号列表")
-    parser.add_argument("--save_dir", default=f"{Settings.DATA_DIR}/raw/digikey", help="存储目录")
+    parser.add_argument("part_numbers", nargs="*", help="产品型号列表")
+    parser.add_argument("--input", help="型号列表文件（每行一个）")
+    parser.add_argument("--output", default=f"{Settings.DATA_DIR}/raw/digikey/parts.jsonl", help="JSONL输出文件")
+    parser.add_argument("--concurrency", type=int, default=Settings.DIGIKEY_CONCURRENCY_PER_HOST, help="单主机并发数")
     args = parser.parse_args()
 
-    Path(args.save_dir).mkdir(parents=True, exist_ok=True)
-    for pn in args.part_numbers:
-        scrape_part(pn, args.save_dir)
\ No newline at end of file
+    parts = list(args.part_numbers)
+    if args.input:
+        parts += Path(args.input).read_text(encoding="utf-8").splitlines()
+    if not parts:
+        parser.error("请提供产品型号或 --input 文件")
+    asyncio.run(scrape_parts(parts, args.output, args.concurrency))
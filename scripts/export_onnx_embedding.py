@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+bge embedding 模型导出为 ONNX：
+1. 导出 PyTorch 模型为 ONNX（动态 batch/序列长度），并保存 tokenizer.json
+2. 动态 int8 量化（权重 int8，激活运行时量化）
+3. 在评估集上验证与 PyTorch 模型的一致性（向量余弦、召回 recall@k）及加速比
+
+用法:
+    python scripts/export_onnx_embedding.py --validate data/eval/golden.jsonl
+"""
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+from utils.logger import setup_logger
+from config.settings import Settings
+
+logger = setup_logger("export_onnx_embedding")
+
+
+def export(model_name: str, output_dir: str, opset: int = 17) -> Path:
+    """导出 fp32 ONNX 模型与 tokenizer"""
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    output = Path(output_dir)
+    output.mkdir(parents=True, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModel.from_pretrained(model_name).eval()
+    tokenizer.save_pretrained(output)  # 生成 tokenizer.json，运行时只依赖 tokenizers
+
+    sample = tokenizer(["示例文本"], return_tensors="pt")
+    names = [n for n in ("input_ids", "attention_mask", "token_type_ids") if n in sample]
+    path = output / "model.onnx"
+    with torch.no_grad():
+        torch.onnx.export(
+            model, tuple(sample[n] for n in names), str(path),
+            input_names=names,
+            output_names=["last_hidden_state"],
+            dynamic_axes={**{n: {0: "batch", 1: "seq"} for n in names},
+                          "last_hidden_state": {0: "batch", 1: "seq"}},
+            opset_version=opset
+        )
+    logger.info(f"ONNX模型已导出: {path}")
+    return path
+
+
+def quantize(fp32_path: Path, int8_name: str) -> Path:
+    """动态 int8 量化"""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    path = fp32_path.parent / int8_name
+    quantize_dynamic(str(fp32_path), str(path), weight_type=QuantType.QInt8)
+    logger.info(f"int8量化完成: {path} ({fp32_path.stat().st_size >> 20}MB → {path.stat().st_size >> 20}MB)")
+    return path
+
+
+def _timed_encode(model, texts: List[str]) -> Tuple[np.ndarray, float]:
+    start = time.perf_counter()
+    vectors = np.asarray(model.embed_documents(texts), dtype=np.float32)
+    return vectors, time.perf_counter() - start
+
+
+def validate(golden_path: str, model_dir: str, model_file: str, k: int = 5) -> Dict:
+    """以评估集的问题检索参考答案，对比两种后端的向量与 top-k 结果"""
+    from knowledge_base.onnx_embeddings import OnnxEmbeddings
+
+    with open(golden_path, encoding="utf-8") as f:
+        cases = [json.loads(line) for line in f if line.strip()]
+    queries = [c["question"] for c in cases]
+    corpus = [c["truth"] for c in cases]
+    k = min(k, len(corpus))
+
+    results = {}
+    for name, model in (("torch", Settings.load_embedding_model(backend="torch")),
+                        ("onnx", OnnxEmbeddings(model_dir, model_file))):
+        model.embed_documents(corpus[:1])  # 预热
+        q, q_sec = _timed_encode(model, queries)
+        d, d_sec = _timed_encode(model, corpus)
+        top_k = np.argsort(-(q @ d.T), axis=1)[:, :k]
+        results[name] = {"q": q, "d": d, "top_k": top_k, "sec": q_sec + d_sec}
+
+    torch_r, onnx_r = results["torch"], results["onnx"]
+    recall = np.mean([len(set(a) & set(b)) / k for a, b in zip(torch_r["top_k"], onnx_r["top_k"])])
+    cosine = np.mean(np.sum(torch_r["q"] * onnx_r["q"], axis=1))
+    report = {
+        "cases": len(cases),
+        f"recall@{k}": round(float(recall), 4),
+        "mean_cosine": round(float(cosine), 4),
+        "torch_sec": round(torch_r["sec"], 3),
+        "onnx_sec": round(onnx_r["sec"], 3),
+        "speedup": round(torch_r["sec"] / max(onnx_r["sec"], 1e-9), 2)
+    }
+    logger.info(f"一致性验证: {report}")
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default=Settings.LOCAL_EMBEDDING_MODEL, help="HuggingFace模型名或本地路径")
+    parser.add_argument("--output", default=Settings.ONNX_EMBEDDING_DIR, help="导出目录")
+    parser.add_argument("--no-quantize", action="store_true", help="仅导出fp32模型")
+    parser.add_argument("--validate", help="评估集JSONL路径，验证与PyTorch模型的一致性")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--min-recall", type=float, default=0.95, help="recall@k 低于该值时返回非零状态")
+    args = parser.parse_args()
+
+    fp32_path = export(args.model, args.output)
+    model_file = fp32_path.name if args.no_quantize else quantize(fp32_path, Settings.ONNX_EMBEDDING_FILE).name
+    if args.validate:
+        report = validate(args.validate, args.output, model_file, args.k)
+        if report[f"recall@{args.k}"] < args.min_recall:
+            logger.error(f"recall@{args.k} 低于阈值 {args.min_recall}")
+            sys.exit(1)
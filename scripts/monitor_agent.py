@@ -1,16 +1,16 @@
 #!/usr/bin/env python3
 """
-Agent性能监控脚本：
-1. 实时采集CPU/内存使用率
-2. 记录LangSmith运行轨迹
-3. 触发异常报警
+Agent性能监控脚本（事件驱动，无需LangSmith）：
+1. 接收应用推送的运行事件，维护滚动 p50/p95/p99
+2. 事件到达即检查阈值，秒级触发报警
+3. 周期性采集CPU/内存使用率（非阻塞采样）
 """
 import psutil
-import time
+import threading
 from datetime import datetime
-from typing import Dict, Optional
+from typing import Dict
 from config.settings import Settings
-from evaluation.monitor import monitor
+from evaluation.collector import CollectorServer, MetricsCollector
 from utils.logger import setup_logger
 from utils.wind_connector import WindAPI
 
@@ -18,62 +18,52 @@ logger = setup_logger("monitor_agent")
 
 
 class AgentMonitor:
-    def __init__(self, check_interval: int = 60):
-        self.check_interval = check_interval
+    def __init__(self, report_interval: int = 60, port: int = Settings.COLLECTOR_PORT):
+        self.report_interval = report_interval
         self.wind = WindAPI() if Settings.WIND_API_KEY else None
+        self.collector = MetricsCollector()
+        self.collector.alert_handlers.append(self.trigger_alert)
+        self.server = CollectorServer(self.collector, port=port)
+        self._stopped = threading.Event()
+        psutil.cpu_percent(interval=None)  # 初始化CPU采样基线
 
     def get_system_metrics(self) -> Dict:
-        """获取系统级监控指标"""
+        """获取系统级监控指标（基于上次调用以来的CPU占用，不阻塞）"""
         return {
             "timestamp": datetime.now().isoformat(),
-            "cpu_percent": psutil.cpu_percent(interval=1),
+            "cpu_percent": psutil.cpu_percent(interval=None),
             "memory_usage": psutil.virtual_memory().percent,
             "disk_usage": psutil.disk_usage('/').percent
         }
 
-    def check_agent_health(self, agent_name: str) -> Optional[Dict]:
-        """检查指定Agent的健康状态"""
-        try:
-            stats = monitor.get_agent_stats(agent_name)
-            if stats["avg_latency"] > 5000:  # 超过5秒延迟视为异常
-                self.trigger_alert(f"{agent_name} 响应延迟过高: {stats['avg_latency']}ms")
-            return stats
-        except Exception as e:
-            logger.error(f"健康检查失败: {e}")
-            return None
-
-    def trigger_alert(self, message: str):
+    def trigger_alert(self, message: str, stats: Dict = None):
         """触发分级报警"""
-        if "CRITICAL" in message:
-            self._send_sms_alert(message)
-        logger.error(f"ALERT: {message}")
-        # 可扩展：Slack/邮件通知
+        logger.error(f"ALERT: {message} {stats or ''}")
+        # 可扩展：短信/Slack/邮件通知
 
     def run(self):
-        """启动监控循环"""
+        """启动采集服务并周期性输出汇总"""
         logger.info("启动Agent监控服务...")
-        while True:
-            try:
+        self.server.start()
+        try:
+            while not self._stopped.wait(self.report_interval):
                 metrics = self.get_system_metrics()
                 if self.wind:
                     metrics["wind_api_status"] = self.wind.check_connection()
-
-                # 监控关键Agent
-                for agent in ["ResearchAgent", "ReviewAgent"]:
-                    agent_stats = self.check_agent_health(agent)
-                    if agent_stats:
-                        metrics.update({f"{agent}_stats": agent_stats})
-
+                metrics["runs"] = self.collector.snapshot()
                 logger.info(f"监控指标: {metrics}")
-                time.sleep(self.check_interval)
-            except KeyboardInterrupt:
-                logger.info("监控服务终止")
-                break
-            except Exception as e:
-                logger.critical(f"监控循环异常: {e}")
-                time.sleep(10)  # 防止频繁崩溃
+        except KeyboardInterrupt:
+            logger.info("监控服务终止")
+        finally:
+            self.server.stop()
 
 
 if __name__ == "__main__":
-    monitor = AgentMonitor(check_interval=300)  # 每5分钟检查一次
-    monitor.run()
\ No newline at end of file
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--interval", type=int, default=60, help="汇总输出间隔（秒）")
+    parser.add_argument("--port", type=int, default=Settings.COLLECTOR_PORT, help="事件接收端口")
+    args = parser.parse_args()
+
+    monitor = AgentMonitor(report_interval=args.interval, port=args.port)
+    monitor.run()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+向量索引参数扫描：
+1. 读取当前生效知识库快照（全部分片或指定分片）的文档与向量，或生成合成语料
+2. 以 NumPy 暴力检索结果为基准，逐组参数构建 Chroma / FAISS(HNSW/IVF) 索引
+3. 输出各组参数的 recall@k 与单次检索延迟（p50/p95），用于设置 Settings.INDEX_PARAMS
+
+用法:
+    python scripts/sweep_index.py --k 5 --queries data/eval/golden.jsonl
+    python scripts/sweep_index.py --shard 新能源 --shard general
+    python scripts/sweep_index.py --synthetic 20000 --backends faiss-hnsw faiss-ivf
+"""
+import json
+import random
+import tempfile
+import time
+from itertools import product
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from utils.logger import setup_logger
+from config.settings import Settings
+
+logger = setup_logger("sweep_index")
+
+GRIDS = {
+    "chroma": {"build": {"max_neighbors": [16, 32]}, "search": {"ef_search": [16, 32, 64, 128, 256]}},
+    "faiss-hnsw": {"build": {"M": [16, 32]}, "search": {"ef_search": [16, 32, 64, 128, 256]}},
+    "faiss-ivf": {"build": {"nlist": [64, 256]}, "search": {"nprobe": [1, 4, 16, 64]}},
+    "numpy": {"build": {}, "search": {}}
+}
+
+
+def _grid(spec: Dict[str, List]) -> List[Dict]:
+    keys = list(spec)
+    return [dict(zip(keys, values)) for values in product(*(spec[k] for k in keys))]
+
+
+def load_corpus(synthetic: int, embeddings, path: Optional[str] = None,
+                shards: Optional[List[str]] = None) -> Tuple[List[str], np.ndarray]:
+    """
+    :param path: 知识库目录，默认为当前生效的快照
+    :param shards: 行业名或 general，默认全部分片
+    """
+    if synthetic:
+        from benchmarks.run_benchmarks import synthetic_documents
+        texts = [d.page_content for d in synthetic_documents(synthetic)]
+        return texts, np.asarray(embeddings.embed_documents(texts), dtype=np.float32)
+    from knowledge_base.retriever import create_index
+    from knowledge_base.sharding import GENERAL_SHARD, ShardManifest
+    from knowledge_base.snapshots import snapshot_store
+
+    path = path or snapshot_store.resolve()
+    manifest = ShardManifest(path)
+    texts, vectors = [], []
+    for name in shards or [GENERAL_SHARD] + manifest.industries:
+        if name != GENERAL_SHARD and name not in manifest:
+            raise ValueError(f"分片不存在: {name}")
+        index = create_index("chroma", path, shard=None if name == GENERAL_SHARD else manifest[name])
+        data = index.collection.get(include=["documents", "embeddings"])
+        index.close()
+        texts.extend(data["documents"])
+        vectors.extend(data["embeddings"])
+        logger.info(f"分片 {name}: {len(data['documents'])} 条")
+    return texts, np.asarray(vectors, dtype=np.float32)
+
+
+def load_queries(path: str, texts: List[str], n: int, embeddings) -> np.ndarray:
+    if path:
+        with open(path, encoding="utf-8") as f:
+            questions = [json.loads(line)["question"] for line in f if line.strip()]
+    else:
+        questions = random.Random(7).sample(texts, min(n, len(texts)))
+    return np.asarray(embeddings.embed_documents(questions), dtype=np.float32)
+
+
+def build(backend: str, params: Dict, texts: List[str], vectors: np.ndarray):
+    from knowledge_base.retriever import ChromaIndex, FaissIndex, NumpyIndex
+
+    path = tempfile.mkdtemp(prefix=f"sweep_{backend}_")
+    metadatas = [{"_id": i} for i in range(len(texts))]
+    if backend == "chroma":
+        index = ChromaIndex(path, {**Settings.INDEX_PARAMS["chroma"], **params})
+    elif backend.startswith("faiss"):
+        index = FaissIndex(path, {**Settings.INDEX_PARAMS["faiss"], "type": backend.split("-")[1], **params})
+    else:
+        index = NumpyIndex(path)
+    for i in range(0, len(texts), 5000):  # Chroma 单次写入条数有上限
+        index.add(texts[i:i + 5000], metadatas[i:i + 5000], vectors[i:i + 5000].tolist())
+    return index
+
+
+def set_search_params(index, params: Dict):
+    if not params:
+        return
+    if hasattr(index, "collection"):
+        index.collection.modify(configuration={"hnsw": params})
+    else:
+        index.params.update(params)
+        index._apply_search_params()
+
+
+def measure(index, queries: np.ndarray, truth: List[set], k: int) -> Dict:
+    latencies, recalls = [], []
+    for vector, expected in zip(queries, truth):
+        start = time.perf_counter()
+        hits = index.search(vector.tolist(), k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        recalls.append(len({doc.metadata["_id"] for doc, _ in hits} & expected) / k)
+    latencies.sort()
+    return {
+        f"recall@{k}": round(float(np.mean(recalls)), 4),
+        "p50_ms": round(latencies[len(latencies) // 2], 3),
+        "p95_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 3)
+    }
+
+
+def sweep(backends: List[str], k: int, synthetic: int, queries_path: str, n_queries: int,
+          path: Optional[str] = None, shards: Optional[List[str]] = None) -> List[Dict]:
+    embeddings = Settings.load_embedding_model()
+    texts, vectors = load_corpus(synthetic, embeddings, path, shards)
+    queries = load_queries(queries_path, texts, n_queries, embeddings)
+    k = min(k, len(texts))
+    exact = np.argsort(-(queries @ vectors.T), axis=1)[:, :k]
+    truth = [set(row.tolist()) for row in exact]
+    logger.info(f"语料 {len(texts)} 条，查询 {len(queries)} 条")
+
+    rows = []
+    for backend in backends:
+        for build_params in _grid(GRIDS[backend]["build"]):
+            start = time.perf_counter()
+            index = build(backend, build_params, texts, vectors)
+            build_sec = round(time.perf_counter() - start, 2)
+            for search_params in _grid(GRIDS[backend]["search"]):
+                set_search_params(index, search_params)
+                row = {"backend": backend, **build_params, **search_params, "build_sec": build_sec,
+                       **measure(index, queries, truth, k)}
+                logger.info(row)
+                rows.append(row)
+    return rows
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backends", nargs="+", default=list(GRIDS), choices=list(GRIDS))
+    parser.add_argument("--k", type=int, default=Settings.RETRIEVE_TOP_K)
+    parser.add_argument("--synthetic", type=int, default=0, help="使用合成语料（条数），默认读取当前知识库")
+    parser.add_argument("--path", help="知识库目录，默认为当前生效的快照")
+    parser.add_argument("--shard", action="append", help="只读取指定分片（行业名或 general，可重复），默认全部分片")
+    parser.add_argument("--queries", help="评估集JSONL（取question字段），默认从语料中抽样")
+    parser.add_argument("--n-queries", type=int, default=200)
+    parser.add_argument("--output", default=f"{Settings.EVAL_DIR}/index_sweep.json")
+    args = parser.parse_args()
+
+    rows = sweep(args.backends, args.k, args.synthetic, args.queries, args.n_queries, args.path, args.shard)
+    Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+    Path(args.output).write_text(json.dumps(rows, ensure_ascii=False, indent=2), encoding="utf-8")
+    columns = list(dict.fromkeys(key for row in rows for key in row))
+    print("\t".join(columns))
+    for row in rows:
+        print("\t".join(str(row.get(c, "")) for c in columns))
+    logger.info(f"结果已保存: {args.output}")
@@ -3,27 +3,10 @@
 """
 import logging
 from pathlib import Path
+from config.log_config import install
 from config.settings import Settings
 
 def setup_logger(name: str, level=logging.INFO) -> logging.Logger:
-    """配置统一格式的日志器"""
-    logger = logging.getLogger(name)
-    logger.setLevel(level)
-
-    formatter = logging.Formatter(
-        "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-    )
-
-    # 控制台输出
-    ch = logging.StreamHandler()
-    ch.setFormatter(formatter)
-    logger.addHandler(ch)
-
-    # 文件输出
-    log_dir = Path(Settings.DATA_DIR) / "logs"
-    log_dir.mkdir(exist_ok=True)
-    fh = logging.FileHandler(log_dir / f"{name}.log")
-    fh.setFormatter(formatter)
-    logger.addHandler(fh)
-
-    return logger
\ No newline at end of file
+    """配置统一格式的日志器（终端 + data/logs/<name>.log，异步写出；重复调用不会重复添加处理器）"""
+    log_file = Path(Settings.LOG_DIR) / f"{name}.log"
+    return install(name, level, log_file=str(log_file))
@@ -6,12 +6,13 @@
 import requests
 from typing import Dict, List, Optional
 from config.settings import Settings
+from evaluation.instrumentation import timed
 from utils.logger import setup_logger
 
 logger = setup_logger("wind_connector")
 
 class WindAPI:
-    BASE_URL = "https://api.wind.com.cn/data/v3"
+    BASE_URL = Settings.WIND_API_BASE
 
     def __init__(self):
         if not Settings.WIND_API_KEY:
@@ -34,6 +35,7 @@ class WindAPI:
             logger.error(f"万得连接测试失败: {e}")
             return False
 
+    @timed("wind", "api/fina")
     def get_company_financials(self, code: str, fields: List[str] = None) -> Dict:
         """
         获取公司财务数据
@@ -84,6 +86,7 @@ class WindAPI:
             }
         }
 
+    @timed("wind", "api/market")
     def get_real_time_quotes(self, codes: List[str]) -> Dict[str, float]:
         """获取实时行情"""
         try:
@@ -0,0 +1,241 @@
+import time
+
+from agents.model_router import LOCAL, REMOTE, ModelRouter, route_hint, user_turn
+
+SYSTEM_PROMPT = "你是一名资深行业分析师，负责撰写分析报告并提示风险。"
+
+
+def make_router():
+    return ModelRouter(simple_max_tokens=800, complex_keywords=["分析", "风险", "报告"], enabled=True)
+
+
+def test_simple_step_routes_local_despite_system_prompt():
+    prompt = f"System: {SYSTEM_PROMPT}\nHuman: 把以下数据整理成JSON：营收4003亿元"
+    assert make_router().classify(prompt) == LOCAL
+
+
+def test_complex_user_turn_routes_remote():
+    prompt = f"System: {SYSTEM_PROMPT}\nHuman: 分析宁德时代的竞争格局"
+    assert make_router().classify(prompt) == REMOTE
+
+
+def test_crew_messages_use_last_user_message():
+    messages = [
+        {"role": "system", "content": "你是行业研究员，目标：生成准确的行业分析报告"},
+        {"role": "user", "content": "分析宁德时代"},
+        {"role": "assistant", "content": "需要调用工具"},
+        {"role": "user", "content": "将工具参数整理为 {\"company_code\": \"300750.SZ\"}"},
+    ]
+    assert user_turn(messages) == messages[-1]["content"]
+    assert make_router().classify(str(messages), step=user_turn(messages)) == LOCAL
+
+
+def test_hint_overrides_classification():
+    router = make_router()
+    prompt = f"System: {SYSTEM_PROMPT}\nHuman: 整理格式"
+    assert router.classify(prompt, hint="complex") == REMOTE
+    with route_hint("complex"):
+        assert router.classify(prompt) == REMOTE
+    with route_hint("simple"):
+        assert router.classify("Human: 分析风险") == LOCAL
+
+
+def test_disabled_router_always_remote():
+    router = ModelRouter(enabled=False)
+    assert router.classify("Human: 整理格式", hint="simple") == REMOTE
+
+
+def _memo():
+    from agents.request_memo import RequestMemo
+    return RequestMemo({"tool": {"ttl": 60, "max_entries": 8}})
+
+
+def _memoized_tool(calls, fail_first=0):
+    from agents.request_memo import memoized
+
+    @memoized("tool")
+    def tool(arg):
+        calls.append(arg)
+        if len(calls) <= fail_first:
+            raise RuntimeError("boom")
+        return f"ok-{arg}"
+    return tool
+
+
+def test_failed_prefetch_is_evicted():
+    from agents.request_memo import memo_key
+    calls = []
+    tool = _memoized_tool(calls, fail_first=1)
+    memo = _memo()
+    future = memo.prefetch(tool, "a")
+    assert isinstance(future.exception(timeout=5), RuntimeError)
+    deadline = time.monotonic() + 5  # 回调在 future 完成后执行
+    while memo._tool("tool").get(memo_key("tool", ("a",), {})) is not None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert memo._tool("tool").get(memo_key("tool", ("a",), {})) is None
+    assert memo.call("tool", tool.__wrapped__, "a") == "ok-a"
+    assert memo.call("tool", tool.__wrapped__, "a") == "ok-a"
+    assert calls == ["a", "a"]
+
+
+def test_waiter_fallback_replaces_failed_entry():
+    from concurrent.futures import Future
+    from agents.request_memo import memo_key
+    calls = []
+    tool = _memoized_tool(calls)
+    memo = _memo()
+    failed = Future()
+    failed.set_exception(RuntimeError("boom"))
+    memo._tool("tool").put(memo_key("tool", ("a",), {}), failed)
+    assert memo.call("tool", tool.__wrapped__, "a") == "ok-a"
+    assert memo.call("tool", tool.__wrapped__, "a") == "ok-a"
+    assert calls == ["a"]
+
+
+class _Crew:
+    def __init__(self):
+        self.tool = type("Tool", (), {"current_usage_count": 0})()
+        agent = type("Agent", (), {"llm": object(), "tools": [self.tool]})()
+        self.task = type("Task", (), {"agent": agent, "output": None, "used_tools": 0, "retry_count": 0})()
+        self.agents, self.tasks = [agent], [self.task]
+
+
+def _pool(size=1, **kwargs):
+    from agents.crew_pool import CrewPool
+    built = []
+
+    def factory():
+        built.append(_Crew())
+        return built[-1]
+    return CrewPool(factory, size=size, acquire_timeout=1, **kwargs), built
+
+
+def test_crew_pool_acquire_timeout():
+    pool, _ = _pool(size=1)
+    with pool.acquire():
+        start = time.monotonic()
+        try:
+            with pool.acquire(timeout=0.05):
+                raise AssertionError("池已满时不应取到实例")
+        except TimeoutError:
+            pass
+        assert time.monotonic() - start < 1
+
+
+def test_crew_pool_discards_failed_crew_and_regrows():
+    pool, built = _pool(size=1)
+    try:
+        with pool.acquire():
+            raise RuntimeError("kickoff failed")
+    except RuntimeError:
+        pass
+    assert pool.stats() == {"size": 1, "created": 0, "idle": 0}
+    with pool.acquire() as crew:
+        assert crew is built[1]
+    assert pool.stats() == {"size": 1, "created": 1, "idle": 1}
+
+
+def test_crew_pool_factory_failure_releases_slot():
+    from agents.crew_pool import CrewPool
+    pool = CrewPool(lambda: 1 / 0, size=1, acquire_timeout=0.05)
+    for _ in range(2):
+        try:
+            with pool.acquire():
+                pass
+        except ZeroDivisionError:
+            pass
+    assert pool.stats()["created"] == 0
+
+
+def test_crew_pool_resets_task_state_and_reuses():
+    pool, built = _pool(size=1, max_uses=2)
+    with pool.acquire() as crew:
+        crew.task.output, crew.task.used_tools, crew.task.retry_count = "report", 3, 1
+        crew.tool.current_usage_count = 5
+    assert (crew.task.output, crew.task.used_tools, crew.task.retry_count) == (None, 0, 0)
+    assert crew.tool.current_usage_count == 0
+    with pool.acquire() as again:
+        assert again is crew
+    with pool.acquire() as third:  # 达到复用上限后重建
+        assert third is not crew
+    assert len(built) == 2
+
+
+def _limiter(tmp_path, **kwargs):
+    from agents.rate_limiter import SharedRateLimiter
+    return SharedRateLimiter(name="test", state_dir=str(tmp_path), **{"rpm": 600, "tpm": 6000, "max_wait": 5, **kwargs})
+
+
+def _limiter_state(limiter):
+    import json
+    return json.loads(limiter.path.read_text())
+
+
+def test_parse_retry_after_seconds_and_http_date():
+    from email.utils import format_datetime
+    from datetime import datetime, timedelta, timezone
+    from agents.rate_limiter import SharedRateLimiter
+    assert SharedRateLimiter.parse_retry_after("120") == 120
+    assert SharedRateLimiter.parse_retry_after("-5") == 0
+    assert SharedRateLimiter.parse_retry_after(None) is None
+    assert SharedRateLimiter.parse_retry_after("soon") is None
+    date = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=30), usegmt=True)
+    assert 28 <= SharedRateLimiter.parse_retry_after(date) <= 30
+    past = format_datetime(datetime.now(timezone.utc) - timedelta(seconds=30), usegmt=True)
+    assert SharedRateLimiter.parse_retry_after(past) == 0
+
+
+def test_rate_limiter_backs_off_then_recovers(tmp_path):
+    limiter = _limiter(tmp_path)
+    limiter.on_rate_limited(retry_after=0.2)
+    assert _limiter_state(limiter)["factor"] == 0.5
+    limiter.on_rate_limited(retry_after=0.2)
+    assert _limiter_state(limiter)["factor"] == 0.25
+    start = time.monotonic()
+    limiter.acquire()  # 暂停期内所有调用方等待 Retry-After
+    assert time.monotonic() - start >= 0.2
+    for _ in range(20):
+        limiter.record_usage(estimated=10, actual=10)
+    assert _limiter_state(limiter)["factor"] == 1.0
+
+
+def test_rate_limiter_state_is_shared_across_instances(tmp_path):
+    limiter = _limiter(tmp_path)
+    limiter.on_rate_limited(retry_after=30)
+    other = _limiter(tmp_path, max_wait=0.1)
+    try:
+        other.acquire()
+        raise AssertionError("暂停期内不应取到配额")
+    except TimeoutError:
+        pass
+
+
+def test_acquire_blocks_until_tpm_refills(tmp_path):
+    limiter = _limiter(tmp_path)
+    limiter.acquire(tokens=6000)
+    start = time.monotonic()
+    limiter.acquire(tokens=30)  # 6000 tpm = 100 token/s
+    assert 0.2 <= time.monotonic() - start < 2
+
+
+def test_acquire_blocks_until_rpm_refills(tmp_path):
+    limiter = _limiter(tmp_path, rpm=120)
+    for _ in range(120):
+        limiter.acquire()
+    start = time.monotonic()
+    limiter.acquire()  # 120 rpm = 2 次/s
+    assert 0.3 <= time.monotonic() - start < 2
+
+
+def test_acquire_times_out_when_rpm_exhausted(tmp_path):
+    from agents.rate_limiter import RateLimitTimeout
+    limiter = _limiter(tmp_path, rpm=2, max_wait=0.1)
+    limiter.acquire()
+    limiter.acquire()
+    start = time.monotonic()
+    try:
+        limiter.acquire()
+        raise AssertionError("RPM耗尽时不应取到配额")
+    except RateLimitTimeout:
+        pass
+    assert time.monotonic() - start < 1
@@ -0,0 +1,71 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("starlette")  # api 包导入压缩中间件
+
+from api.coalescing import SingleFlight  # noqa: E402
+
+
+def test_leader_exception_reaches_all_waiters_and_evicts_key():
+    flight = SingleFlight("test")
+    key = flight.key(company="宁德时代", industry="新能源")
+    calls = []
+
+    async def failing():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        raise RuntimeError("analysis failed")
+
+    async def main():
+        results = await asyncio.gather(*(flight.run(key, failing) for _ in range(3)),
+                                       return_exceptions=True)
+        assert all(isinstance(r, RuntimeError) for r in results)
+        assert calls == [1]
+        assert key not in flight._inflight and key not in flight._waiters
+
+        async def ok():
+            return "report"
+        assert await flight.run(key, ok) == ("report", False, 0)
+
+    asyncio.run(main())
+
+
+def test_waiters_share_result_and_survive_leader_cancel():
+    flight = SingleFlight("test")
+    key = flight.key(company="宁德时代")
+
+    async def slow():
+        await asyncio.sleep(0.05)
+        return "report"
+
+    async def main():
+        leader = asyncio.ensure_future(flight.run(key, slow))
+        await asyncio.sleep(0)
+        waiter = asyncio.ensure_future(flight.run(key, slow))
+        await asyncio.sleep(0)
+        leader.cancel()
+        assert await waiter == ("report", True, 1)
+        assert key not in flight._inflight
+
+    asyncio.run(main())
+
+
+def test_run_returns_waiter_count():
+    flight = SingleFlight("test")
+    key = flight.key(company="宁德时代")
+
+    async def slow():
+        await asyncio.sleep(0.05)
+        return "report"
+
+    async def main():
+        assert not flight.inflight(key)
+        leader = asyncio.ensure_future(flight.run(key, slow))
+        await asyncio.sleep(0)
+        assert flight.inflight(key)
+        followers = [flight.run(key, slow) for _ in range(2)]
+        results = await asyncio.gather(leader, *followers)
+        assert results == [("report", False, 2), ("report", True, 2), ("report", True, 2)]
+
+    asyncio.run(main())
@@ -0,0 +1,82 @@
+import pytest
+
+pytest.importorskip("langchain_core")  # 增量分析Agent基于 BaseAgent
+
+from agents import incremental  # noqa: E402
+from agents.base_agent import BaseAgent  # noqa: E402
+from knowledge_base.report_store import ReportStore  # noqa: E402
+
+COMPANY, INDUSTRY = "宁德时代", "新能源"
+
+REPORT = "\n".join([
+    "# 宁德时代分析报告",
+    "## 核心财务指标", "营收4003亿元",
+    "## 行业对比分析", "市占率领先",
+    "## 风险提示", "原材料价格波动",
+    "## 数据来源说明", "万得",
+])
+
+
+@pytest.fixture
+def analyzer(tmp_path, monkeypatch):
+    monkeypatch.setattr(BaseAgent, "_init_llm", lambda self: None)
+    inputs = {"financials": {"revenue": 4003}, "knowledge": [{"content": "市占率领先"}]}
+    monkeypatch.setattr(incremental, "collect_inputs", lambda *args: dict(inputs))
+    agent = incremental.IncrementalAnalyzer(store=ReportStore(str(tmp_path)))
+    agent.inputs, agent.calls, agent.failing = inputs, [], set()
+
+    def run(input_data, route=None):
+        agent.calls.append(input_data["章节"])
+        if input_data["章节"] in agent.failing:
+            return {"error": "boom", "output": "", "metadata": {}}
+        return {"output": f"{input_data['章节']}（已更新）", "metadata": {}}
+    agent.run = run
+    return agent
+
+
+def analyze(agent, full_run=lambda: REPORT):
+    return agent.analyze(COMPANY, INDUSTRY, "300750.SZ", full_run)
+
+
+def test_first_run_is_full(analyzer):
+    result = analyze(analyzer)
+    assert (result["mode"], result["report"], analyzer.calls) == ("full", REPORT, [])
+    assert analyzer.store.latest(COMPANY, INDUSTRY)["version"] == result["version"]
+
+
+def test_unchanged_inputs_reuse_previous_version(analyzer):
+    first = analyze(analyzer)
+    result = analyze(analyzer, full_run=lambda: pytest.fail("不应重新完整分析"))
+    assert (result["mode"], result["version"], result["report"]) == ("reused", first["version"], REPORT)
+    assert analyzer.calls == []
+    assert len(analyzer.store.versions(COMPANY, INDUSTRY)) == 1
+
+
+def test_changed_financials_regenerate_dependent_sections(analyzer):
+    analyze(analyzer)
+    analyzer.inputs["financials"] = {"revenue": 4200}
+    result = analyze(analyzer)
+    assert result["mode"] == "incremental"
+    assert result["sections"] == ["核心财务指标", "风险提示", "数据来源说明"]
+    assert "核心财务指标（已更新）" in result["report"]
+    assert "市占率领先" in result["report"]  # 未受影响的章节沿用上一版本
+    saved = analyzer.store.latest(COMPANY, INDUSTRY)
+    assert saved["fingerprints"] == incremental.input_fingerprints(analyzer.inputs)
+    assert analyze(analyzer)["mode"] == "reused"
+
+
+def test_failed_section_keeps_previous_fingerprint(analyzer):
+    first = analyze(analyzer)
+    previous = analyzer.store.load(COMPANY, INDUSTRY, first["version"])["fingerprints"]
+    analyzer.inputs["financials"] = {"revenue": 4200}
+    analyzer.failing = {"风险提示"}
+    result = analyze(analyzer)
+    assert result["mode"] == "incremental"
+    assert result["sections"] == ["核心财务指标", "数据来源说明"]
+    assert "原材料价格波动" in result["report"]
+    assert analyzer.store.latest(COMPANY, INDUSTRY)["fingerprints"] == previous
+
+    analyzer.failing, analyzer.calls = set(), []
+    retry = analyze(analyzer)  # 下次分析时重试失败章节
+    assert "风险提示" in retry["sections"]
+    assert analyzer.store.latest(COMPANY, INDUSTRY)["fingerprints"] == incremental.input_fingerprints(analyzer.inputs)
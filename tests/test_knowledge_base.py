@@ -0,0 +1,44 @@
+import pytest
+
+from knowledge_base.text_normalizer import contains_any, normalize
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("營業收入", "营业收入"),  # 繁体转简体
+    ("ＡＢＣ１２３", "abc123"),  # 全角转半角并转小写
+    ("300750.SZ", "300750.sz"),
+    ("Revenue  Growth", "revenue growth"),
+    ("  净利润\t\n增长 ", "净利润 增长"),
+    ("1,234,567元", "1234567元"),  # 去除千分位
+    ("12,34", "12,34"),  # 非千分位逗号保留
+    ("12000万", "1.2亿"),
+    ("1.2亿", "1.2亿"),
+    ("1.2万亿", "12000亿"),
+    ("9,999万", "9999万"),
+    ("5000万元", "5000万元"),
+    ("0.5万", "5000"),
+    ("", ""),
+    (None, ""),
+])
+def test_normalize(text, expected):
+    assert normalize(text) == expected
+
+
+@pytest.mark.parametrize("text, keywords, expected", [
+    ("公司存在重大訴訟風險", ["诉讼"], True),  # 繁体文本命中简体关键词
+    ("公司存在重大诉讼风险", ["訴訟"], True),  # 繁体关键词命中简体文本
+    ("ＥＳＧ评级下调", ["esg"], True),
+    ("营收12000万元", ["1.2亿"], True),  # 金额单位统一后比较
+    ("营收1,200万元", ["1200万"], True),
+    ("经营稳健", ["诉讼", "违约"], False),
+    ("经营稳健", [], False),
+    ("", ["诉讼"], False),
+])
+def test_contains_any(text, keywords, expected):
+    assert contains_any(text, keywords) is expected
+
+
+def test_contains_any_skips_normalizing_normalized_text():
+    text = normalize("公司存在重大訴訟風險")
+    assert contains_any(text, ["訴訟"], normalized=True)
+    assert not contains_any("訴訟", ["诉讼"], normalized=True)  # 调用方声明已归一化时不再处理文本
@@ -0,0 +1,46 @@
+import os
+
+from tools.chart_renderer import ChartRenderer
+
+
+def make_renderer(tmp_path, **kwargs):
+    return ChartRenderer(max_workers=2, cache_size=2, cache_dir=str(tmp_path), **kwargs)
+
+
+def chart(i):
+    return {"x": [1, 2, 3], "y": [i, i + 1, i + 2], "title": f"chart-{i}"}
+
+
+def test_publish_persists_before_returning(tmp_path):
+    renderer = make_renderer(tmp_path)
+    try:
+        url = renderer.publish(chart(0))
+        artifact_id = url.rsplit("/", 1)[1]
+        path = renderer.artifact_path(artifact_id)
+        assert path is not None
+        assert path.read_bytes() == renderer.render(chart(0))
+    finally:
+        renderer.shutdown()
+
+
+def test_disk_cache_is_bounded(tmp_path):
+    renderer = make_renderer(tmp_path, disk_cache_size=3)
+    try:
+        for i in range(6):
+            renderer.publish(chart(i))
+        renderer.render(chart(6))
+        assert len(os.listdir(tmp_path)) <= 3
+    finally:
+        renderer.shutdown()
+
+
+def test_memory_hit_restores_evicted_file(tmp_path):
+    renderer = make_renderer(tmp_path)
+    try:
+        url = renderer.publish(chart(0))
+        path = tmp_path / url.rsplit("/", 1)[1]
+        path.unlink()
+        assert renderer.publish(chart(0)) == url
+        assert path.exists()
+    finally:
+        renderer.shutdown()
@@ -0,0 +1,220 @@
+"""
+图表渲染服务：
+1. 使用 matplotlib 面向对象接口 + Agg 画布，不依赖 pyplot 全局状态
+2. 在进程池中渲染，不占用请求线程的 GIL
+3. 按图表内容哈希缓存渲染结果（内存 LRU + 磁盘 LRU），磁盘文件由渲染进程写入，返回前即已落盘
+4. 批量接口并发渲染一份报告的全部图表
+5. 图表以引用形式（/artifacts/{id}）返回，避免在响应和提示词中内联 base64
+"""
+import base64
+import hashlib
+import io
+import json
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from config.settings import Settings
+
+logger = logging.getLogger(__name__)
+
+MIME_TYPES = {"png": "image/png", "svg": "image/svg+xml"}
+_ARTIFACT_RE = re.compile(r"[0-9a-f]{64}\.(png|svg)")
+
+
+def _write_atomic(path: Path, image: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp.write_bytes(image)
+    os.replace(tmp, path)  # 读取方不会看到写了一半的文件
+
+
+def _prune(directory: Path, keep: int) -> None:
+    """磁盘缓存超过上限时删除最久未使用的文件"""
+    try:
+        files = [(entry.stat().st_mtime, entry.path) for entry in os.scandir(directory)
+                 if entry.is_file() and _ARTIFACT_RE.fullmatch(entry.name)]
+    except FileNotFoundError:
+        return
+    if len(files) <= keep:
+        return
+    files.sort()
+    for _, path in files[:len(files) - keep]:
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass  # 其他渲染进程已删除
+
+
+def _render(data: Dict, chart_type: str, fmt: str,
+            path: Optional[str] = None, keep: int = 0) -> bytes:
+    """在子进程中渲染单张图表；指定 path 时同时写入磁盘缓存，并淘汰至 keep 个文件"""
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    fig = Figure()
+    FigureCanvasAgg(fig)
+    try:
+        ax = fig.add_subplot()
+        if chart_type == "line":
+            ax.plot(data["x"], data["y"])
+        elif chart_type == "bar":
+            ax.bar(data["labels"], data["values"])
+        ax.set_title(data.get("title", ""))
+
+        buf = io.BytesIO()
+        fig.savefig(buf, format=fmt)
+        image = buf.getvalue()
+    finally:
+        fig.clear()
+    if path:
+        try:
+            _write_atomic(Path(path), image)
+            _prune(Path(path).parent, keep)
+        except OSError:
+            pass  # 落盘失败不影响渲染结果，publish 时会重试写入
+    return image
+
+
+class ChartRenderer:
+    def __init__(self, max_workers: int = Settings.CHART_RENDER_WORKERS,
+                 cache_size: int = Settings.CHART_CACHE_SIZE,
+                 cache_dir: Optional[str] = Settings.CHART_CACHE_DIR,
+                 disk_cache_size: int = Settings.CHART_DISK_CACHE_SIZE):
+        self.max_workers = max_workers
+        self.cache_size = cache_size
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.disk_cache_size = disk_cache_size
+        self._cache: "OrderedDict[str, bytes]" = OrderedDict()
+        self._pending: Dict[str, Future] = {}
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def cache_key(data: Dict, chart_type: str, fmt: str) -> str:
+        """图表内容哈希（数据、类型、格式完全相同才命中）"""
+        spec = json.dumps({"data": data, "type": chart_type, "fmt": fmt},
+                          sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(spec.encode("utf-8")).hexdigest()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._pool
+
+    def _path(self, key: str, fmt: str) -> Optional[Path]:
+        return self.cache_dir / f"{key}.{fmt}" if self.cache_dir else None
+
+    def _lookup(self, key: str) -> Optional[bytes]:
+        """查内存缓存（需持有锁）"""
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+        return None
+
+    def _store(self, key: str, image: bytes):
+        """写入内存缓存（需持有锁）"""
+        self._cache[key] = image
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def _read_disk(self, key: str, fmt: str) -> Optional[bytes]:
+        path = self._path(key, fmt)
+        if path is None:
+            return None
+        try:
+            image = path.read_bytes()
+            os.utime(path)  # 记录最近使用时间，供淘汰参考
+        except FileNotFoundError:
+            return None
+        return image
+
+    def submit(self, data: Dict, chart_type: str = "line", fmt: str = "png") -> Future:
+        """提交渲染任务；缓存命中或相同图表正在渲染时直接复用"""
+        if fmt not in MIME_TYPES:
+            raise ValueError(f"不支持的图表格式: {fmt}")
+        key = self.cache_key(data, chart_type, fmt)
+        with self._lock:
+            cached = self._lookup(key)
+            pending = self._pending.get(key)
+        if pending is not None:
+            return pending
+        if cached is None:
+            cached = self._read_disk(key, fmt)  # 磁盘读取在锁外进行
+        with self._lock:
+            if cached is not None:
+                self._store(key, cached)
+                future = Future()
+                future.set_result(cached)
+                return future
+            if key in self._pending:
+                return self._pending[key]
+            path = self._path(key, fmt)
+            future = self._get_pool().submit(_render, data, chart_type, fmt,
+                                             str(path) if path else None, self.disk_cache_size)
+            self._pending[key] = future
+
+        def _done(f: Future):
+            with self._lock:
+                self._pending.pop(key, None)
+                if f.exception() is None:
+                    self._store(key, f.result())
+            if f.exception() is not None:
+                logger.error(f"图表渲染失败: {f.exception()}")
+
+        future.add_done_callback(_done)
+        return future
+
+    def render(self, data: Dict, chart_type: str = "line", fmt: str = "png") -> bytes:
+        """渲染单张图表"""
+        return self.submit(data, chart_type, fmt).result()
+
+    def render_many(self, charts: List[Dict], fmt: str = "png") -> List[bytes]:
+        """
+        并发渲染多张图表
+        :param charts: [{"data": dict, "chart_type": str}]
+        """
+        futures = [self.submit(c["data"], c.get("chart_type", "line"), fmt) for c in charts]
+        return [f.result() for f in futures]
+
+    @staticmethod
+    def to_data_uri(image: bytes, fmt: str = "png") -> str:
+        return f"data:{MIME_TYPES[fmt]};base64,{base64.b64encode(image).decode()}"
+
+    def publish(self, data: Dict, chart_type: str = "line", fmt: str = "png") -> str:
+        """渲染并返回图表地址（/artifacts/{id}）；未配置磁盘缓存时退化为 data URI"""
+        image = self.render(data, chart_type, fmt)
+        if not self.cache_dir:
+            return self.to_data_uri(image, fmt)
+        key = self.cache_key(data, chart_type, fmt)
+        path = self._path(key, fmt)
+        if not path.exists():  # 内存命中但磁盘文件已被淘汰，或渲染进程落盘失败
+            _write_atomic(path, image)
+        return f"{Settings.ARTIFACT_URL_PREFIX}/{key}.{fmt}"
+
+    def publish_many(self, charts: List[Dict], fmt: str = "png") -> List[str]:
+        """并发渲染多张图表并返回地址列表"""
+        self.render_many(charts, fmt)
+        return [self.publish(c["data"], c.get("chart_type", "line"), fmt) for c in charts]
+
+    def artifact_path(self, artifact_id: str) -> Optional[Path]:
+        """校验图表ID并返回磁盘文件路径"""
+        if not self.cache_dir or not _ARTIFACT_RE.fullmatch(artifact_id):
+            return None
+        path = self.cache_dir / artifact_id
+        return path if path.exists() else None
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+
+# 单例模式
+renderer = ChartRenderer()
@@ -0,0 +1,206 @@
+"""
+Digi-Key 数据抓取引擎：
+1. 本地HTTP缓存，按 ETag/Last-Modified 发送条件请求，未变化（304）时复用缓存页面
+2. 异步批量抓取，按主机限制并发并保持最小请求间隔，429/5xx 按 Retry-After（秒数或HTTP日期）退避重试
+3. 使用 lxml 解析详情页（替代 html.parser）
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import random
+import time
+from datetime import timezone
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from typing import Dict, Optional
+from urllib.parse import quote, urlsplit
+
+import requests
+from lxml import html as lxml_html
+
+from config.settings import Settings
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+def part_url(part_number: str) -> str:
+    return f"{Settings.DIGIKEY_BASE_URL}/en/products/detail/{quote(part_number.strip(), safe='')}"
+
+
+class HttpCache:
+    """按URL缓存页面正文及校验头（ETag/Last-Modified）"""
+
+    def __init__(self, cache_dir: str = Settings.DIGIKEY_CACHE_DIR):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, url: str) -> Path:
+        return self.cache_dir / f"{hashlib.sha256(url.encode('utf-8')).hexdigest()}.json"
+
+    def load(self, url: str) -> Optional[Dict]:
+        try:
+            return json.loads(self._path(url).read_text(encoding="utf-8"))
+        except (FileNotFoundError, ValueError):
+            return None
+
+    @staticmethod
+    def conditional_headers(entry: Optional[Dict]) -> Dict[str, str]:
+        """根据缓存条目生成条件请求头（无缓存时为空）"""
+        headers = {}
+        if entry:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    @staticmethod
+    def body(entry: Optional[Dict]) -> Optional[str]:
+        return entry.get("body") if entry else None
+
+    def store(self, url: str, headers, body: str) -> None:
+        etag, last_modified = headers.get("ETag"), headers.get("Last-Modified")
+        if not (etag or last_modified):
+            return  # 无校验头的页面无法做条件请求，不缓存
+        path = self._path(url)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text(json.dumps({"url": url, "etag": etag, "last_modified": last_modified,
+                                   "fetched_at": time.time(), "body": body}), encoding="utf-8")
+        tmp.replace(path)
+
+
+def retry_after_seconds(value: Optional[str]) -> Optional[float]:
+    """解析 Retry-After：秒数或 HTTP 日期，无法解析时返回 None"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)  # HTTP 日期均为 GMT
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+def _text(tree, css_class: str) -> Optional[str]:
+    nodes = tree.xpath(f"//*[contains(concat(' ', normalize-space(@class), ' '), ' {css_class} ')]")
+    return nodes[0].text_content().strip() if nodes else None
+
+
+def parse_part(page: str, part_number: str) -> Dict:
+    """解析元器件详情页"""
+    tree = lxml_html.fromstring(page)
+    specs = {}
+    for row in tree.xpath("//*[contains(concat(' ', normalize-space(@class), ' '), ' specs-table ')]//tr"):
+        name, value = _text(row, "attr-name"), _text(row, "attr-value")
+        if name:
+            specs[name] = value
+    return {
+        "part_number": part_number,
+        "manufacturer": _text(tree, "manufacturer"),
+        "description": _text(tree, "product-description"),
+        "stock": _text(tree, "stock"),
+        "price": _text(tree, "price"),
+        "lead_time": _text(tree, "lead-time"),
+        "specs": specs
+    }
+
+
+def fetch_page(url: str, cache: HttpCache, timeout: float = Settings.DIGIKEY_TIMEOUT) -> str:
+    """同步条件请求（供Agent工具调用）"""
+    entry = cache.load(url)
+    response = requests.get(url, timeout=timeout, headers={
+        "User-Agent": Settings.DIGIKEY_USER_AGENT, **cache.conditional_headers(entry)})
+    if response.status_code == 304:
+        body = cache.body(entry)
+        if body is not None:
+            return body
+        # 缓存条目不完整，去掉条件头重新请求
+        response = requests.get(url, timeout=timeout, headers={"User-Agent": Settings.DIGIKEY_USER_AGENT})
+    response.raise_for_status()
+    cache.store(url, response.headers, response.text)
+    return response.text
+
+
+class AsyncDigiKeyClient:
+    """异步抓取客户端（按主机限制并发与请求间隔）"""
+
+    def __init__(
+            self,
+            cache: Optional[HttpCache] = None,
+            per_host: int = Settings.DIGIKEY_CONCURRENCY_PER_HOST,
+            min_interval: float = Settings.DIGIKEY_MIN_INTERVAL_SEC,
+            timeout: float = Settings.DIGIKEY_TIMEOUT,
+            max_retries: int = 3
+    ):
+        self.cache = cache or HttpCache()
+        self.per_host = per_host
+        self.min_interval = min_interval
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._next_slot: Dict[str, float] = {}
+        self._session = None
+        self.stats = {"fetched": 0, "not_modified": 0, "retries": 0}
+
+    async def __aenter__(self):
+        import aiohttp
+        self._session = aiohttp.ClientSession(
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+            connector=aiohttp.TCPConnector(limit_per_host=self.per_host),
+            headers={"User-Agent": Settings.DIGIKEY_USER_AGENT}
+        )
+        return self
+
+    async def __aexit__(self, *exc):
+        await self._session.close()
+
+    async def _polite_wait(self, host: str):
+        """同一主机的相邻请求至少间隔 min_interval 秒"""
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        slot = max(now, self._next_slot.get(host, now))
+        self._next_slot[host] = slot + self.min_interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    async def fetch(self, url: str) -> str:
+        host = urlsplit(url).netloc
+        semaphore = self._semaphores.setdefault(host, asyncio.Semaphore(self.per_host))
+        async with semaphore:
+            entry = await asyncio.to_thread(self.cache.load, url)  # 缓存读写不阻塞事件循环
+            for attempt in range(self.max_retries + 1):
+                await self._polite_wait(host)
+                async with self._session.get(url, headers=self.cache.conditional_headers(entry)) as response:
+                    if response.status == 304:
+                        body = self.cache.body(entry)
+                        if body is not None:
+                            self.stats["not_modified"] += 1
+                            return body
+                        entry = None  # 缓存条目不完整，下一次不带条件头重新请求
+                        continue
+                    if response.status in RETRY_STATUS and attempt < self.max_retries:
+                        delay = retry_after_seconds(response.headers.get("Retry-After"))
+                        if delay is None:
+                            delay = 2 ** attempt + random.random()
+                        self.stats["retries"] += 1
+                        logger.warning(f"{url} 返回 {response.status}，{delay:.1f}s 后重试")
+                        self._next_slot[host] = asyncio.get_running_loop().time() + delay
+                        continue
+                    response.raise_for_status()
+                    body = await response.text()
+                    await asyncio.to_thread(self.cache.store, url, response.headers, body)
+                    self.stats["fetched"] += 1
+                    return body
+        raise ConnectionError(f"{url} 重试 {self.max_retries} 次后仍未获取到页面")
+
+    async def fetch_part(self, part_number: str) -> Dict:
+        page = await self.fetch(part_url(part_number))
+        return parse_part(page, part_number)
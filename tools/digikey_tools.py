@@ -1,20 +1,19 @@
 from langchain.tools import tool
-from bs4 import BeautifulSoup
-import requests
+from tools.digikey_client import HttpCache, fetch_page, parse_part, part_url
+
+_cache = HttpCache()
 
 
 @tool
 def get_part_inventory(part_number: str) -> dict:
     """获取Digi-Key元器件的库存和价格"""
-    url = f"https://www.digikey.com/en/products/detail/{part_number}"
     try:
-        response = requests.get(url, timeout=8)
-        soup = BeautifulSoup(response.text, 'html.parser')
-
+        # 条件请求：页面未变化时服务端返回304，直接解析本地缓存
+        part = parse_part(fetch_page(part_url(part_number), _cache), part_number)
         return {
-            "stock": soup.select_one(".stock").text.strip(),
-            "price": soup.select_one(".price").text.strip(),
-            "lead_time": soup.select_one(".lead-time").text.strip()
+            "stock": part["stock"],
+            "price": part["price"],
+            "lead_time": part["lead_time"]
         }
     except Exception:
-        return {"error": "Digi-Key数据获取失败"}
\ No newline at end of file
+        return {"error": "Digi-Key数据获取失败"}
@@ -1,24 +1,19 @@
 from langchain.tools import tool
 from config.settings import Settings
-import matplotlib.pyplot as plt
-import io
-import base64
+from tools.chart_renderer import renderer
+from typing import Dict, List
 
 
 class ReportTools:
     @tool
     def generate_chart(data: dict, chart_type: str = "line") -> str:
-        """生成基础数据图表并返回Base64编码图像"""
-        plt.figure()
-        if chart_type == "line":
-            plt.plot(data["x"], data["y"])
-        elif chart_type == "bar":
-            plt.bar(data["labels"], data["values"])
-        plt.title(data.get("title", ""))
+        """生成基础数据图表并返回图表地址（可直接用于Markdown图片链接）"""
+        return renderer.publish(data, chart_type)
 
-        buf = io.BytesIO()
-        plt.savefig(buf, format='png')
-        return f"data:image/png;base64,{base64.b64encode(buf.getvalue()).decode()}"
+    @tool
+    def generate_charts(charts: List[Dict]) -> List[str]:
+        """并发生成报告所需的全部图表，charts为[{"data": dict, "chart_type": str}]，返回图表地址列表"""
+        return renderer.publish_many(charts)
 
     @tool
     def convert_to_ppt(summary: str) -> str:
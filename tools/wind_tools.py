@@ -1,14 +1,16 @@
 from langchain.tools import tool
 from config.settings import Settings
+from evaluation.instrumentation import timed
 import requests
 import logging
 
 logger = logging.getLogger(__name__)
 
 class WindAPI:
-    BASE_URL = "https://api.wind.com/data/v1"
+    BASE_URL = Settings.WIND_API_BASE
 
     @staticmethod
+    @timed("wind", "query")
     def query(endpoint: str, params: dict):
         headers = {"Authorization": f"Bearer {Settings.WIND_API_KEY}"}
         response = requests.get(